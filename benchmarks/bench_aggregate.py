@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Local aggregation throughput, vectorized against plain Python loops.
+
+Builds synthetic report units with a handful of judgments each and times
+loading them to :class:`~crowdflower.aggregate.Judgments`, and trust
+weighted voting with confidence and agreement, against the equivalent
+loop over the judgments of each unit::
+
+    PYTHONPATH=. python benchmarks/bench_aggregate.py --units 200000
+"""
+from __future__ import print_function, division, absolute_import
+from bench_codec import make_unit
+from collections import defaultdict
+from crowdflower.aggregate import Judgments
+import argparse
+import random
+import time
+
+
+def loop_aggregate(units, field):
+    """
+    Trust weighted vote, confidence and pairwise agreement per unit.
+    """
+    results = {}
+    for unit in units:
+        votes = defaultdict(float)
+        counts = defaultdict(int)
+        for judgment in unit['results']['judgments']:
+            if judgment.get('tainted'):
+                continue
+
+            value = judgment['data'].get(field)
+            if value is None:
+                continue
+
+            votes[value] += judgment['trust']
+            counts[value] += 1
+
+        if not votes:
+            continue
+
+        answer = max(votes, key=votes.get)
+        n = sum(counts.values())
+        agreement = sum(c * (c - 1) for c in counts.values()) / \
+            (n * (n - 1)) if n > 1 else None
+        results[unit['id']] = (answer, votes[answer] / sum(votes.values()),
+                               agreement)
+
+    return results
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--units', type=int, default=200000)
+    parser.add_argument('--judgments', type=int, default=5,
+                        help="judgments per unit")
+    args = parser.parse_args()
+
+    random.seed(0)
+    units = [make_unit(i, args.judgments) for i in range(1, args.units + 1)]
+    total = args.units * args.judgments
+    print("{} units, {} judgments".format(args.units, total))
+
+    _, loop = timed(loop_aggregate, units, 'sentiment')
+    judgments, load = timed(Judgments.from_units, units, ['sentiment'])
+
+    def vectorized():
+        judgments.weighted_vote('sentiment')
+        judgments.agreement('sentiment')
+
+    _, compute = timed(vectorized)
+
+    print("{:>22}: {:.3f} s, {:.0f} judgments/s".format(
+        'python loop', loop, total / loop))
+    print("{:>22}: {:.3f} s, {:.0f} judgments/s".format(
+        'load to arrays', load, total / load))
+    print("{:>22}: {:.3f} s, {:.0f} judgments/s".format(
+        'vectorized aggregate', compute, total / compute))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Throughput and memory of client operations against a local fake API.
+
+Starts ``fake_api.py`` in a subprocess, so that the server does not share
+the GIL or the traced memory of the client, and runs each benchmark case
+twice: once for timing and once under :mod:`tracemalloc` for peak memory.
+Results are written as JSON for tracking regressions::
+
+    PYTHONPATH=. python benchmarks/bench_api.py --units 5000 \\
+        --latency 0.005 --output results.json
+
+"""
+from __future__ import print_function, division, absolute_import
+from crowdflower.client import Client
+from crowdflower.job import Job
+from crowdflower.transport import RequestsTransport, Urllib3Transport
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def start_server(args, *options):
+    """
+    Start the fake API with the dataset and ``options`` given, returning
+    the process and the API URL template.
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [HERE, os.path.dirname(HERE), env.get('PYTHONPATH', '')])
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, 'fake_api.py'),
+         '--latency', str(args.latency), '--page-size', str(args.page_size),
+         '--jobs', str(args.jobs), '--units', str(args.units),
+         '--judgments', str(args.judgments)] + list(options),
+        stdout=subprocess.PIPE, env=env)
+    url = server.stdout.readline().decode('utf-8').strip()
+    if not url:
+        server.kill()
+        raise RuntimeError("fake API server failed to start")
+
+    return server, url
+
+
+def cases(args):
+    """
+    Benchmark cases as ``(name, fn)``, where ``fn`` takes a client and
+    returns the number of items processed.
+    """
+    job = lambda client: Job(client=client, id=1)
+    rows = [{'text': 'Row {}'.format(i), 'id': i}
+            for i in range(args.upload_rows)]
+    concurrency = args.concurrency
+
+    def get_units(client):
+        return sum(1 for _ in client.get_units(job(client)))
+
+    def get_units_concurrent(client):
+        return sum(1 for _ in client.get_units(job(client),
+                                               concurrency=concurrency))
+
+    def resolve_units(client):
+        promises = list(client.get_units(job(client)))[:args.resolve]
+        return len(client.resolve_units(job(client), promises,
+                                        concurrency=concurrency))
+
+    def get_judgmentaggregates(client):
+        return sum(1 for _ in client.get_judgmentaggregates(job(client)))
+
+    def get_judgmentaggregates_concurrent(client):
+        return sum(1 for _ in client.get_judgmentaggregates(
+            job(client), concurrency=concurrency))
+
+    def upload_job(client):
+        client.upload_job(rows, 1)
+        return len(rows)
+
+    def upload_job_batched(client):
+        client.upload_job(rows, 1, batch_size=max(len(rows) // 10, 1),
+                          concurrency=concurrency)
+        return len(rows)
+
+    def get_report(client):
+        return len(client.get_report(job(client)))
+
+    def iter_report_compact(client):
+        return sum(1 for _ in client.iter_report(job(client), compact=True))
+
+    def bulk_ping(client):
+        jobs = list(range(1, args.jobs + 1)) * 10
+        results = client.bulk(jobs, concurrency=concurrency).ping()
+        return len(results)
+
+    def bulk_bonus(client):
+        workers = [job(client).get_worker(i) for i in range(args.resolve)]
+        results = client.bulk_workers(
+            [(w, 'bonus', (10,)) for w in workers], concurrency=concurrency)
+        return len(results)
+
+    return [(f.__name__, f) for f in [
+        get_units, get_units_concurrent, resolve_units,
+        get_judgmentaggregates, get_judgmentaggregates_concurrent,
+        upload_job, upload_job_batched, get_report, iter_report_compact,
+        bulk_ping, bulk_bonus]]
+
+
+TRANSPORTS = {
+    'requests': lambda maxsize: RequestsTransport(pool_maxsize=maxsize),
+    'urllib3': lambda maxsize: Urllib3Transport(maxsize=maxsize),
+}
+
+
+def run_case(fn, url, pool_maxsize, repeat, transport='requests'):
+    def make_client():
+        client = Client('KEY',
+                        transport=TRANSPORTS[transport](pool_maxsize))
+        client.API_URL = url
+        return client
+
+    seconds = []
+    for _ in range(repeat):
+        with make_client() as client:
+            gc.collect()
+            start = time.perf_counter()
+            items = fn(client)
+            seconds.append(time.perf_counter() - start)
+
+    with make_client() as client:
+        gc.collect()
+        tracemalloc.start()
+        fn(client)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    best = min(seconds)
+    return dict(items=items, seconds=best, seconds_all=seconds,
+                items_per_second=items / best if best else None,
+                peak_memory_bytes=peak)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--jobs', type=int, default=10)
+    parser.add_argument('--units', type=int, default=2000)
+    parser.add_argument('--judgments', type=int, default=3)
+    parser.add_argument('--upload-rows', type=int, default=20000)
+    parser.add_argument('--resolve', type=int, default=200,
+                        help="units to resolve and workers to bonus")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--transport', choices=sorted(TRANSPORTS),
+                        default='requests')
+    parser.add_argument('--case', action='append',
+                        help="run only the named cases")
+    parser.add_argument('--output', help="write JSON results to a file")
+    args = parser.parse_args()
+
+    server, url = start_server(args)
+    try:
+        results = {}
+        for name, fn in cases(args):
+            if args.case and name not in args.case:
+                continue
+
+            result = results[name] = run_case(
+                fn, url, max(args.concurrency, 10), args.repeat,
+                args.transport)
+            print("{:>34}: {:>7} items, {:.3f} s, {:>9.0f} items/s, "
+                  "{:>7.1f} MB peak".format(
+                      name, result['items'], result['seconds'],
+                      result['items_per_second'] or 0,
+                      result['peak_memory_bytes'] / 2 ** 20),
+                  file=sys.stderr)
+
+    finally:
+        server.kill()
+        server.wait()
+
+    report = dict(
+        timestamp=datetime.datetime.utcnow().isoformat() + 'Z',
+        python=platform.python_version(),
+        implementation=platform.python_implementation(),
+        platform=platform.platform(),
+        config={k: v for k, v in vars(args).items() if k != 'output'},
+        results=results,
+    )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Attribute access speed of model objects.
+
+Times reading and writing model attributes, which is what consumers of
+large reports mostly do, and compares against the original generic
+descriptor implementation, which looked up its storage by name and always
+evaluated the default::
+
+    PYTHONPATH=. python benchmarks/bench_attributes.py --number 1000000
+"""
+from __future__ import print_function, division, absolute_import
+from bench_codec import make_unit
+from crowdflower.base import Base
+from crowdflower.job import Job
+from crowdflower.judgment import Judgment, CompactJudgment
+from crowdflower.unit import Unit, CompactUnit
+import argparse
+import timeit
+
+
+class LegacyAttribute(object):
+
+    def __init__(self, name=None, get_attr='_json', set_attr='_changes'):
+        self.name = name
+        self.get_attr = get_attr
+        self.set_attr = set_attr
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        return getattr(instance, self.set_attr).get(
+            self.name, getattr(instance, self.get_attr)[self.name])
+
+    def __set__(self, instance, value):
+        getattr(instance, self.set_attr)[self.name] = value
+
+
+class LegacyUnit(Base):
+
+    state = LegacyAttribute('state')
+    job_id = LegacyAttribute('job_id')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--number', type=int, default=1000000)
+    args = parser.parse_args()
+
+    job = Job(id=1)
+    data = make_unit(1, judgments=1)
+    judgment_data = data['results']['judgments'][0]
+
+    unit = Unit(job, **data)
+    changed_unit = Unit(job, **data)
+    changed_unit.state = 'judgable'
+    compact_unit = CompactUnit.from_json(job, data)
+    legacy_unit = LegacyUnit(data)
+    changed_legacy_unit = LegacyUnit(data)
+    changed_legacy_unit.state = 'judgable'
+    judgment = Judgment(job, **judgment_data)
+    compact_judgment = CompactJudgment.from_json(job, judgment_data)
+
+    cases = [
+        ('legacy Unit.state', lambda: legacy_unit.state),
+        ('legacy changed Unit.state', lambda: changed_legacy_unit.state),
+        ('Unit.state', lambda: unit.state),
+        ('changed Unit.state', lambda: changed_unit.state),
+        ('CompactUnit.state', lambda: compact_unit.state),
+        ("unit['state']", lambda: unit['state']),
+        ('Judgment.worker_trust', lambda: judgment.worker_trust),
+        ('CompactJudgment.worker_trust',
+         lambda: compact_judgment.worker_trust),
+        ('legacy Unit.job_id = 1',
+         lambda: setattr(legacy_unit, 'job_id', 1)),
+        ('Unit.job_id = 1', lambda: setattr(unit, 'job_id', 1)),
+    ]
+
+    for name, fn in cases:
+        elapsed = min(timeit.repeat(fn, number=args.number, repeat=3))
+        print("{:>30}: {:.3f} s, {:.0f} ns/op".format(
+            name, elapsed, elapsed / args.number * 1e9))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Report parsing throughput with each installed JSON codec.
+
+Builds a zipped JSON report of synthetic units, each with a handful of
+judgments, and times parsing it to :class:`~crowdflower.unit.Unit`
+instances::
+
+    PYTHONPATH=. python benchmarks/bench_codec.py --units 20000
+"""
+from __future__ import print_function, division, absolute_import
+from crowdflower.client import Client
+from crowdflower.codec import CODECS, get_codec
+from crowdflower.job import Job
+from zipfile import ZipFile, ZIP_DEFLATED
+import argparse
+import io
+import json
+import random
+import timeit
+
+
+def make_unit(id_, judgments=5):
+    return {
+        'id': id_,
+        'job_id': 1,
+        'state': 'finalized',
+        'agreement': random.random(),
+        'judgments_count': judgments,
+        'updated_at': '2015-06-27T09:06:16+00:00',
+        'created_at': '2015-06-24T12:44:51+00:00',
+        'data': {'text': u'Lorem ipsum dolor sit amet {} äö'.format(id_)},
+        'results': {
+            'judgments': [{
+                'id': id_ * 100 + i,
+                'unit_id': id_,
+                'worker_id': random.randint(1, 10 ** 6),
+                'worker_trust': random.random(),
+                'trust': random.random(),
+                'country': 'FIN',
+                'city': 'Helsinki',
+                'created_at': '2015-06-24T12:50:00+00:00',
+                'data': {'sentiment': random.choice(['pos', 'neg', 'neu'])},
+                'tainted': False,
+                'golden': False,
+                'rejected': None,
+            } for i in range(judgments)],
+            'sentiment': {'agg': 'pos', 'confidence': random.random()},
+        },
+    }
+
+
+def make_report(units):
+    buf = io.BytesIO()
+    with ZipFile(buf, 'w', ZIP_DEFLATED) as zf:
+        zf.writestr('job_1.json', '\n'.join(
+            json.dumps(make_unit(i)) for i in range(units)))
+
+    return buf.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--units', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    report = make_report(args.units)
+    job = Job(id=1)
+    print("report: {} units, {:.1f} MB compressed".format(
+        args.units, len(report) / 2 ** 20))
+
+    baseline = None
+    for name in CODECS:
+        try:
+            client = Client('KEY', codec=get_codec(name))
+
+        except ValueError:
+            print("{:>10}: not installed".format(name))
+            continue
+
+        seconds = min(timeit.repeat(
+            lambda: list(client._iter_report_units(job, io.BytesIO(report))),
+            number=1, repeat=args.repeat))
+        if name == 'json':
+            baseline = seconds
+
+        print("{:>10}: {:.3f} s, {:.0f} units/s".format(
+            name, seconds, args.units / seconds))
+
+    if baseline:
+        print("(json is the standard library baseline)")
+
+
+if __name__ == '__main__':
+    main()
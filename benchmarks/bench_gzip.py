@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Bandwidth and time saved by gzip compression of uploads and responses.
+
+Runs typical unit and judgment payloads against the local fake API, once
+uncompressed and once compressed, over a link throttled to ``--bandwidth``
+bytes per second. Bytes are counted as sent over the wire::
+
+    PYTHONPATH=. python benchmarks/bench_gzip.py --bandwidth 1e6 \\
+        --output results.json
+
+"""
+from __future__ import print_function, division, absolute_import
+from bench_api import start_server
+from crowdflower.client import Client
+from crowdflower.job import Job
+from crowdflower.transport import RequestsTransport
+import argparse
+import datetime
+import json
+import platform
+import random
+import sys
+import time
+
+
+class CountingTransport(RequestsTransport):
+    """
+    Transport counting request and response body bytes as sent.
+    """
+
+    def __init__(self):
+        super(CountingTransport, self).__init__()
+        self.sent = 0
+        self.received = 0
+
+    def request(self, method, url, **kwgs):
+        resp = super(CountingTransport, self).request(method, url, **kwgs)
+        self.sent += int(resp.headers.get('X-Received-Length', 0))
+        self.received += int(resp.headers.get('Content-Length', 0))
+        return resp
+
+
+def cases(args):
+    """
+    Benchmark cases as ``(name, fn)``, where ``fn`` takes a client.
+    """
+    random.seed(0)
+    rows = [{'id': i,
+             'text': u'Lorem ipsum dolor sit amet {} äö'.format(i),
+             'url': 'https://example.com/items/{}'.format(i),
+             'category': random.choice(['news', 'blog', 'forum']),
+             'score': random.random()}
+            for i in range(args.upload_rows)]
+    job = lambda client: Job(client=client, id=1)
+
+    def upload_job(client):
+        client.upload_job(rows, 1)
+
+    def get_units(client):
+        for _ in client.get_units(job(client)):
+            pass
+
+    def get_judgmentaggregates(client):
+        for _ in client.get_judgmentaggregates(job(client)):
+            pass
+
+    def get_judgments(client):
+        aggregates = list(client.get_judgmentaggregates(job(client)))
+        for aggregate in aggregates[:args.judgments_fetched]:
+            for judgment_id in aggregate.ids:
+                client.get_judgment(job(client), judgment_id)
+
+    return [(f.__name__, f) for f in [
+        upload_job, get_units, get_judgmentaggregates, get_judgments]]
+
+
+def run_case(fn, url, compress, repeat):
+    result = None
+    for _ in range(repeat):
+        transport = CountingTransport()
+        if not compress:
+            transport.headers['Accept-Encoding'] = 'identity'
+
+        with Client('KEY', transport=transport, compress=compress) as client:
+            client.API_URL = url
+            start = time.perf_counter()
+            fn(client)
+            seconds = time.perf_counter() - start
+
+        if result is None or seconds < result['seconds']:
+            result = dict(seconds=seconds, bytes_sent=transport.sent,
+                          bytes_received=transport.received)
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--bandwidth', type=float, default=1e6,
+                        help="bytes per second of each transfer")
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--level', type=int, default=6,
+                        help="gzip compression level")
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--jobs', type=int, default=1)
+    parser.add_argument('--units', type=int, default=2000)
+    parser.add_argument('--judgments', type=int, default=5)
+    parser.add_argument('--judgments-fetched', type=int, default=20,
+                        help="aggregates to fetch judgments of")
+    parser.add_argument('--upload-rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="write JSON results to a file")
+    args = parser.parse_args()
+
+    server, url = start_server(args, '--gzip', str(args.level),
+                               '--bandwidth', str(args.bandwidth))
+    try:
+        results = {}
+        for name, fn in cases(args):
+            plain = run_case(fn, url, False, args.repeat)
+            gzipped = run_case(fn, url, args.level, args.repeat)
+            plain_bytes = plain['bytes_sent'] + plain['bytes_received']
+            gzip_bytes = gzipped['bytes_sent'] + gzipped['bytes_received']
+            results[name] = dict(
+                plain=plain, gzip=gzipped,
+                bytes_saved=1 - gzip_bytes / plain_bytes,
+                time_saved=1 - gzipped['seconds'] / plain['seconds'])
+            print("{:>24}: {:>9} -> {:>9} bytes ({:>4.0%} saved), "
+                  "{:.3f} -> {:.3f} s ({:>4.0%} saved)".format(
+                      name, plain_bytes, gzip_bytes,
+                      results[name]['bytes_saved'], plain['seconds'],
+                      gzipped['seconds'], results[name]['time_saved']),
+                  file=sys.stderr)
+
+    finally:
+        server.kill()
+        server.wait()
+
+    report = dict(
+        timestamp=datetime.datetime.utcnow().isoformat() + 'Z',
+        python=platform.python_version(),
+        implementation=platform.python_implementation(),
+        platform=platform.platform(),
+        config={k: v for k, v in vars(args).items() if k != 'output'},
+        results=results,
+    )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+
+if __name__ == '__main__':
+    main()
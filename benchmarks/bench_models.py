@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Memory use of regular and compact model objects.
+
+Parses synthetic report units to JSON dictionaries first and then measures,
+with :mod:`tracemalloc`, the memory allocated by wrapping them in model
+objects, along with the time it took::
+
+    PYTHONPATH=. python benchmarks/bench_models.py --units 100000
+"""
+from __future__ import print_function, division, absolute_import
+from bench_codec import make_unit
+from crowdflower.job import Job
+from crowdflower.judgment import Judgment, CompactJudgment
+from crowdflower.unit import Unit, CompactUnit
+import argparse
+import gc
+import time
+import tracemalloc
+
+
+def measure(factory, items):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    objects = [factory(item) for item in items]
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--units', type=int, default=100000)
+    args = parser.parse_args()
+
+    job = Job(id=1)
+    units = [make_unit(i, judgments=2) for i in range(args.units)]
+    judgments = [j for u in units for j in u['results']['judgments']]
+
+    cases = [
+        ('Unit', units, lambda d: Unit(job, **d)),
+        ('CompactUnit', units, lambda d: CompactUnit.from_json(job, d)),
+        ('Judgment', judgments, lambda d: Judgment(job, **d)),
+        ('CompactJudgment', judgments,
+         lambda d: CompactJudgment.from_json(job, d)),
+    ]
+
+    for name, items, factory in cases:
+        size, elapsed = measure(factory, items)
+        print("{:>16}: {:>7.1f} MB, {:>5.0f} bytes/object, {:.3f} s".format(
+            name, size / 2 ** 20, size / len(items), elapsed))
+
+
+if __name__ == '__main__':
+    main()
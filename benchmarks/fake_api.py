@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for the CrowdFlower API, for benchmarks.
+
+Serves synthetic jobs, paged units and judgment aggregates, single units
+and judgments, uploads, job commands, worker actions and zipped JSON
+reports from memory, with configurable latency, page size, dataset size
+and bandwidth. JSON responses are gzipped for clients accepting it, if
+enabled. Prints the API URL template on the first line of output::
+
+    PYTHONPATH=. python benchmarks/fake_api.py --units 10000 --latency 0.02
+"""
+from __future__ import print_function, division, absolute_import
+from bench_codec import make_unit
+from zipfile import ZipFile, ZIP_DEFLATED
+import argparse
+import gzip
+import io
+import json
+import random
+import re
+import sys
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlsplit, parse_qs
+
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlsplit, parse_qs
+
+
+class Dataset(object):
+    """
+    Synthetic jobs, each with ``units`` units of ``judgments`` judgments.
+    """
+
+    def __init__(self, jobs=10, units=1000, judgments=3, seed=0):
+        random.seed(seed)
+        self.jobs = {}
+        self.units = {}
+        self.judgments = {}
+        self._reports = {}
+        self._lock = threading.Lock()
+
+        for job_id in range(1, jobs + 1):
+            unit_ids = []
+            for i in range(units):
+                unit = make_unit(job_id * 10 ** 7 + i, judgments)
+                unit['job_id'] = job_id
+                for judgment in unit['results']['judgments']:
+                    judgment['job_id'] = job_id
+                    self.judgments[judgment['id']] = judgment
+
+                self.units[unit['id']] = unit
+                unit_ids.append(unit['id'])
+
+            self.jobs[job_id] = dict(
+                id=job_id, title='Job {}'.format(job_id), state='running',
+                units_count=units, unit_ids=unit_ids)
+
+    def job(self, job_id):
+        job = dict(self.jobs[job_id])
+        del job['unit_ids']
+        return job
+
+    def aggregate(self, unit):
+        results = unit['results']
+        return dict(
+            _ids=[j['id'] for j in results['judgments']],
+            _agreement=unit['agreement'],
+            _state=unit['state'],
+            _updated_at=unit['updated_at'],
+            sentiment=results['sentiment']['agg'],
+        )
+
+    def report(self, job_id):
+        """
+        Zipped JSON lines report of job ``job_id``, built on first use.
+        """
+        with self._lock:
+            report = self._reports.get(job_id)
+            if report is None:
+                buf = io.BytesIO()
+                with ZipFile(buf, 'w', ZIP_DEFLATED) as zf:
+                    zf.writestr('job_{}.json'.format(job_id), '\n'.join(
+                        json.dumps(self.units[id_])
+                        for id_ in self.jobs[job_id]['unit_ids']))
+
+                report = self._reports[job_id] = buf.getvalue()
+
+            return report
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def make_handler(dataset, latency=0.0, page_size=100, gzip_level=None,
+                 bandwidth=None):
+    """
+    Request handler class serving ``dataset``, responding after ``latency``
+    seconds with at most ``page_size`` items per page. JSON responses are
+    compressed with ``gzip_level``, if given and accepted. Transfers of
+    bodies are slowed down to ``bandwidth`` bytes per second, if given.
+    """
+    routes = []
+
+    def transfer(size):
+        if bandwidth:
+            time.sleep(size / bandwidth)
+
+    def route(method, pattern):
+        def decorator(f):
+            routes.append((method, re.compile('^/v1/' + pattern + '$'), f))
+            return f
+
+        return decorator
+
+    def page(query, items):
+        limit = min(int(query.get('limit', ['100'])[0]), page_size)
+        start = (int(query.get('page', ['1'])[0]) - 1) * limit
+        return items[start:start + limit]
+
+    @route('GET', r'jobs\.json')
+    def jobs(handler, query):
+        return [dataset.job(id_) for id_ in page(query, sorted(dataset.jobs))]
+
+    @route('GET', r'jobs/(\d+)\.json')
+    def job(handler, query, job_id):
+        return dataset.job(int(job_id))
+
+    @route('PUT', r'jobs/(\d+)\.json')
+    def update_job(handler, query, job_id):
+        handler.read_body()
+        return dataset.job(int(job_id))
+
+    @route('GET', r'jobs/(\d+)\.csv')
+    def report(handler, query, job_id):
+        return dataset.report(int(job_id)), 'application/zip'
+
+    @route('GET', r'jobs/(\d+)/units\.json')
+    def units(handler, query, job_id):
+        return {str(id_): dataset.units[id_]['data'] for id_ in page(
+            query, dataset.jobs[int(job_id)]['unit_ids'])}
+
+    @route('GET', r'jobs/(\d+)/units/(\d+)\.json')
+    def unit(handler, query, job_id, unit_id):
+        unit = dict(dataset.units[int(unit_id)])
+        del unit['results']
+        return unit
+
+    @route('GET', r'jobs/(\d+)/judgments\.json')
+    def aggregates(handler, query, job_id):
+        return {str(id_): dataset.aggregate(dataset.units[id_])
+                for id_ in page(query, dataset.jobs[int(job_id)]['unit_ids'])}
+
+    @route('GET', r'jobs/(\d+)/judgments/(\d+)\.json')
+    def judgment(handler, query, job_id, judgment_id):
+        return dataset.judgments[int(judgment_id)]
+
+    @route('POST', r'jobs(?:/(\d+))?/upload\.json')
+    def upload(handler, query, job_id=None):
+        rows = handler.read_body().count(b'\n')
+        return dict(id=int(job_id or 1), units_count=rows)
+
+    @route('GET', r'jobs/(\d+)/(ping|pause|resume|cancel|legend)\.json')
+    def command(handler, query, job_id, command):
+        return dict(id=int(job_id), command=command,
+                    all_judgments=0, needed_judgments=0)
+
+    @route('(?:POST|PUT)', r'jobs/(\d+)/workers/(\d+)(?:/(\w+))?\.json')
+    def worker(handler, query, job_id, worker_id, command=None):
+        handler.read_body()
+        return dict(success={'message': 'OK'})
+
+    class Handler(BaseHTTPRequestHandler):
+
+        protocol_version = 'HTTP/1.1'
+        # Headers and body are written separately, avoid delayed ACKs
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        #: Size of the last request body as sent
+        received = 0
+
+        def read_body(self):
+            """
+            Read the request body, plain or chunked and possibly gzipped.
+            """
+            if self.headers.get('Transfer-Encoding') == 'chunked':
+                chunks = []
+                while True:
+                    size = int(self.rfile.readline().split(b';')[0], 16)
+                    if not size:
+                        self.rfile.readline()
+                        break
+
+                    chunks.append(self.rfile.read(size))
+                    self.rfile.readline()
+
+                body = b''.join(chunks)
+
+            else:
+                body = self.rfile.read(
+                    int(self.headers.get('Content-Length') or 0))
+
+            self.received = len(body)
+            transfer(len(body))
+
+            if self.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.GzipFile(fileobj=io.BytesIO(body)).read()
+
+            return body
+
+        def handle_method(self):
+            self.received = 0
+            url = urlsplit(self.path)
+            query = parse_qs(url.query)
+
+            for method, pattern, f in routes:
+                match = re.match(method, self.command) and \
+                    pattern.match(url.path)
+                if match:
+                    break
+
+            else:
+                self.send_error(404)
+                return
+
+            if latency:
+                time.sleep(latency)
+
+            result = f(self, query, *match.groups())
+            if isinstance(result, tuple):
+                body, content_type = result
+
+            else:
+                body = json.dumps(result).encode('utf-8')
+                content_type = 'application/json'
+
+            encoding = None
+            if gzip_level and content_type == 'application/json' and \
+                    'gzip' in self.headers.get('Accept-Encoding', ''):
+                buf = io.BytesIO()
+                with gzip.GzipFile(fileobj=buf, mode='wb',
+                                   compresslevel=gzip_level) as f:
+                    f.write(body)
+
+                body = buf.getvalue()
+                encoding = 'gzip'
+
+            transfer(len(body))
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            if encoding is not None:
+                self.send_header('Content-Encoding', encoding)
+
+            # Body size as sent by the client, for measuring bandwidth
+            self.send_header('X-Received-Length', str(self.received))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST = do_PUT = do_DELETE = handle_method
+
+    return Handler
+
+
+def serve(dataset, host='127.0.0.1', port=0, latency=0.0, page_size=100,
+          gzip_level=None, bandwidth=None):
+    """
+    Create a threaded server for ``dataset``. Call ``serve_forever()`` on
+    the returned server.
+    """
+    return _Server((host, port), make_handler(
+        dataset, latency, page_size, gzip_level, bandwidth))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="seconds added to every response")
+    parser.add_argument('--page-size', type=int, default=100,
+                        help="maximum items per page")
+    parser.add_argument('--gzip', type=int, metavar='LEVEL',
+                        help="gzip JSON responses, if accepted")
+    parser.add_argument('--bandwidth', type=float,
+                        help="bytes per second of each transfer")
+    parser.add_argument('--jobs', type=int, default=10)
+    parser.add_argument('--units', type=int, default=1000,
+                        help="units per job")
+    parser.add_argument('--judgments', type=int, default=3,
+                        help="judgments per unit")
+    args = parser.parse_args()
+
+    dataset = Dataset(args.jobs, args.units, args.judgments)
+    server = serve(dataset, args.host, args.port, args.latency,
+                   args.page_size, args.gzip, args.bandwidth)
+    host, port = server.server_address[:2]
+    print('http://{}:{}/v1/{{path}}'.format(host, port))
+    sys.stdout.flush()
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+"""
+Local aggregation of judgments. Requires `NumPy <https://numpy.org/>`_,
+which can be installed with the ``aggregate`` extra:
+
+.. code-block:: bash
+
+   pip install crowdflower[aggregate]
+
+Judgments are loaded once into arrays, with the answers of each field
+encoded as integer category codes. Votes are then counted per unit and
+category with a single :func:`numpy.bincount`, so that majority votes,
+trust weighted votes, confidences and agreement of millions of judgments
+take milliseconds.
+
+.. code-block:: python
+
+   >>> judgments = Judgments.from_report(client, job)
+   >>> result = judgments.weighted_vote('sentiment')
+   >>> dict(zip(result.unit_ids, result.answers))
+   {123: 'pos', 124: 'neg', ...}
+   >>> judgments.unit_confidence(job.confidence_fields)
+   array([1.  , 0.67, ...])
+
+"""
+from __future__ import print_function, division, absolute_import
+from collections import namedtuple
+import json
+import numpy as np
+
+__author__ = u'Ilja Everilä <ilja.everila@liilak.com>'
+
+#: Aggregated answers of a field per unit: the ``unit_ids``, the winning
+#: ``answers`` as an object array, None for units without answers, their
+#: category ``codes``, -1 for units without answers, and the
+#: ``confidence`` of each answer, its share of the (weighted) votes
+FieldAggregate = namedtuple('FieldAggregate',
+                            'field unit_ids answers codes confidence')
+
+
+def _category(value):
+    """
+    Hashable category of answer ``value``. Lists, such as the answers of
+    checkboxes, are tuples, other unhashable values JSON.
+    """
+    if isinstance(value, list):
+        return tuple(value)
+
+    if isinstance(value, dict):
+        return json.dumps(value, sort_keys=True)
+
+    return value
+
+
+_UNHASHABLE = frozenset([list, dict])
+
+
+def _judgment_json(judgment):
+    if isinstance(judgment, dict):
+        return judgment
+
+    return judgment._json
+
+
+def _unit_json(unit):
+    if isinstance(unit, dict):
+        return unit
+
+    return unit._json
+
+
+class Judgments(object):
+    """
+    Judgments as arrays, one element per judgment. Units are indexed in the
+    order of the unit ids given when loading, followed by units in the
+    order of their first judgment. Units without judgments, or only with
+    tainted ones when those are excluded, have rows only if given, with
+    None answers and -1 codes.
+
+    Use :meth:`from_judgments`, :meth:`from_units` or :meth:`from_report`
+    for loading judgments.
+
+    :param unit_ids: Unit ids
+    :param unit_index: Index to ``unit_ids`` of each judgment
+    :param worker_ids: Worker id of each judgment
+    :param trust: Trust of each judgment
+    :param categories: Dictionary of fields to lists of answers
+    :param codes: Dictionary of fields to arrays of indexes to
+                  ``categories`` of each judgment, -1 if not answered
+    """
+
+    def __init__(self, unit_ids, unit_index, worker_ids, trust, categories,
+                 codes):
+        self.unit_ids = np.asarray(unit_ids, dtype=np.int64)
+        self.unit_index = np.asarray(unit_index, dtype=np.intp)
+        self.worker_ids = np.asarray(worker_ids, dtype=np.int64)
+        self.trust = np.asarray(trust, dtype=np.float64)
+        self.categories = categories
+        self.codes = {field: np.asarray(field_codes, dtype=np.intp)
+                      for field, field_codes in codes.items()}
+
+    def __len__(self):
+        return len(self.unit_index)
+
+    @property
+    def fields(self):
+        return list(self.categories)
+
+    @classmethod
+    def from_judgments(cls, judgments, fields=None, exclude_tainted=True,
+                       unit_ids=None):
+        """
+        Load ``judgments``, given as :class:`~.judgment.Judgment` instances
+        or JSON dictionaries.
+
+        :param judgments: Iterable of judgments
+        :param fields: Names of fields to load, defaults to all fields found
+        :type fields: list
+        :param exclude_tainted: Skip tainted judgments, as CrowdFlower does
+                                when aggregating
+        :type exclude_tainted: bool
+        :param unit_ids: Ids of units to include, also if they have no
+                         judgments, indexed first in the given order
+        :rtype: Judgments
+        """
+        unit_positions = {}
+        for unit_id in () if unit_ids is None else unit_ids:
+            unit_positions.setdefault(unit_id, len(unit_positions))
+
+        return cls._load(judgments, fields, exclude_tainted, unit_positions)
+
+    @classmethod
+    def _load(cls, judgments, fields, exclude_tainted, unit_positions):
+        """
+        Load ``judgments``, adding units to the dictionary of
+        ``unit_positions`` as they are found.
+        """
+        unit_index = []
+        worker_ids = []
+        trust = []
+        # Fields are loaded as they are found, unless given
+        encoders = {} if fields is None else {f: {} for f in fields}
+        codes = {f: [] for f in encoders}
+        field_codes = [(f, encoders[f], codes[f].append) for f in encoders]
+        append_unit = unit_index.append
+        append_worker = worker_ids.append
+        append_trust = trust.append
+
+        for judgment in judgments:
+            judgment = _judgment_json(judgment)
+            if exclude_tainted and judgment.get('tainted'):
+                continue
+
+            unit_id = judgment['unit_id']
+            position = unit_positions.get(unit_id)
+            if position is None:
+                position = unit_positions[unit_id] = len(unit_positions)
+
+            data = judgment.get('data') or {}
+            if fields is None:
+                for field in data:
+                    if field not in encoders:
+                        encoders[field] = {}
+                        codes[field] = [-1] * len(unit_index)
+                        field_codes.append((field, encoders[field],
+                                            codes[field].append))
+
+            append_unit(position)
+            append_worker(judgment.get('worker_id') or 0)
+            judgment_trust = judgment.get('trust')
+            if judgment_trust is None:
+                judgment_trust = judgment.get('worker_trust')
+
+            append_trust(1.0 if judgment_trust is None else judgment_trust)
+
+            for field, encoder, append_code in field_codes:
+                value = data.get(field)
+                if value is None or value == '':
+                    append_code(-1)
+                    continue
+
+                if value.__class__ in _UNHASHABLE:
+                    value = _category(value)
+
+                code = encoder.get(value)
+                if code is None:
+                    code = encoder[value] = len(encoder)
+
+                append_code(code)
+
+        unit_ids = sorted(unit_positions, key=unit_positions.get)
+        categories = {field: sorted(encoder, key=encoder.get)
+                      for field, encoder in encoders.items()}
+        return cls(unit_ids, unit_index, worker_ids, trust, categories,
+                   codes)
+
+    @classmethod
+    def from_units(cls, units, fields=None, exclude_tainted=True):
+        """
+        Load the judgments in the results of report ``units``, given as
+        :class:`~.unit.Unit` instances or JSON dictionaries. All units are
+        included, also those without judgments.
+        """
+        unit_positions = {}
+
+        def judgments():
+            for unit in units:
+                unit = _unit_json(unit)
+                unit_id = unit.get('id')
+                if unit_id is not None:
+                    unit_positions.setdefault(unit_id, len(unit_positions))
+
+                results = unit.get('results') or {}
+                for judgment in results.get('judgments') or ():
+                    yield judgment
+
+        return cls._load(judgments(), fields, exclude_tainted,
+                         unit_positions)
+
+    @classmethod
+    def from_report(cls, client, job, fields=None, exclude_tainted=True):
+        """
+        Load the judgments of the JSON report of ``job``, streamed with
+        :meth:`Client.iter_report <crowdflower.client.Client.iter_report>`.
+        Asynchronous clients are not supported, collect the units of their
+        report and use :meth:`from_units` instead.
+
+        :raises TypeError: if ``client`` is asynchronous
+        """
+        units = client.iter_report(job, compact=True)
+        if hasattr(units, '__aiter__'):
+            raise TypeError(
+                "cannot load an asynchronous report, use "
+                "Judgments.from_units([unit async for unit in "
+                "client.iter_report(job, compact=True)]) instead")
+
+        return cls.from_units(units, fields, exclude_tainted)
+
+    def counts(self, field, weighted=False):
+        """
+        Votes of ``field`` per unit and category, weighted by trust if
+        ``weighted``.
+
+        :returns: array of shape ``(units, categories)``
+        :rtype: numpy.ndarray
+        """
+        codes = self.codes[field]
+        n_units = len(self.unit_ids)
+        n_categories = len(self.categories[field])
+        answered = codes >= 0
+        flat = self.unit_index[answered] * n_categories + codes[answered]
+        weights = self.trust[answered] if weighted else None
+        counts = np.bincount(flat, weights=weights,
+                             minlength=n_units * n_categories)
+        return counts.reshape(n_units, n_categories)
+
+    def _vote(self, field, weighted):
+        counts = self.counts(field, weighted)
+        totals = counts.sum(axis=1)
+        answered = totals > 0
+
+        # Ties are won by the category seen first
+        codes = np.full(len(self.unit_ids), -1, dtype=np.intp)
+        confidence = np.zeros(len(self.unit_ids))
+        if counts.shape[1]:
+            winners = counts.argmax(axis=1)
+            codes[answered] = winners[answered]
+            confidence[answered] = \
+                counts[answered, winners[answered]] / totals[answered]
+
+        # Code -1 indexes the trailing None. Filled one by one, so that
+        # tuples are not broadcast to dimensions.
+        categories = np.empty(len(self.categories[field]) + 1, dtype=object)
+        for i, category in enumerate(self.categories[field]):
+            categories[i] = category
+        return FieldAggregate(field, self.unit_ids, categories[codes], codes,
+                              confidence)
+
+    def majority_vote(self, field):
+        """
+        Most common answer of ``field`` per unit, with its share of the
+        votes as confidence.
+
+        :rtype: FieldAggregate
+        """
+        return self._vote(field, False)
+
+    def weighted_vote(self, field):
+        """
+        Answer of ``field`` with the highest sum of trust per unit, with its
+        share of the trust of all judgments as confidence, as computed by
+        CrowdFlower.
+
+        :rtype: FieldAggregate
+        """
+        return self._vote(field, True)
+
+    def aggregate(self, fields=None, weighted=True):
+        """
+        Votes of ``fields``, defaulting to all fields.
+
+        :returns: dictionary of fields to :class:`FieldAggregate`
+        :rtype: dict
+        """
+        return {field: self._vote(field, weighted)
+                for field in (self.fields if fields is None else fields)}
+
+    def unit_confidence(self, fields=None):
+        """
+        Confidence of units as the lowest trust weighted confidence of
+        ``fields``, which all have to reach the minimum unit confidence of
+        a job. Pass the ``confidence_fields`` of the job as ``fields``.
+
+        :rtype: numpy.ndarray
+        """
+        fields = self.fields if fields is None else fields
+        if not fields:
+            return np.ones(len(self.unit_ids))
+
+        return np.min([self._vote(field, True).confidence
+                       for field in fields], axis=0)
+
+    def agreement(self, field):
+        """
+        Pairwise agreement of answers of ``field`` per unit: the share of
+        pairs of judgments giving the same answer, NaN for units with fewer
+        than two answers.
+
+        :rtype: numpy.ndarray
+        """
+        counts = self.counts(field)
+        n = counts.sum(axis=1)
+        pairs = n * (n - 1)
+        agreeing = (counts * (counts - 1)).sum(axis=1)
+        agreement = np.full(len(n), np.nan)
+        np.divide(agreeing, pairs, out=agreement, where=pairs > 0)
+        return agreement
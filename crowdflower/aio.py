@@ -0,0 +1,787 @@
+# -*- coding: utf-8 -*-
+"""
+Asynchronous CrowdFlower API client for :mod:`asyncio`. Requires
+`aiohttp <https://aiohttp.readthedocs.io/>`_, which can be installed with
+the ``async`` extra:
+
+.. code-block:: bash
+
+   pip install crowdflower[async]
+
+"""
+from __future__ import print_function, division, absolute_import
+from collections import OrderedDict, deque
+from itertools import count, islice
+from .client import (
+    Client, DeadlineExceeded, _api_error, _content_length, _wire_size)
+from .unit import Unit, UnitPromise
+from .job import Job
+from .judgment import JudgmentAggregate, Judgment
+from .bulk import BulkJobs, BulkWorkerActions, JobResult, Journal
+from .coalesce import SingleFlight
+from .compress import GzipBody
+from .order import Order
+from .ratelimit import parse_retry_after, _clock
+import asyncio
+import inspect
+import mimetypes
+import aiohttp
+import six
+import tempfile
+
+__author__ = u'Ilja Everilä <ilja.everila@liilak.com>'
+
+
+def _client_timeout(timeout):
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+
+    return aiohttp.ClientTimeout(sock_connect=timeout, sock_read=timeout)
+
+
+def _key_values(mapping):
+    """
+    Flatten ``mapping`` to a list of string key, value pairs the way
+    :mod:`requests` encodes query parameters and form data: sequence values
+    produce multiple pairs and ``None`` values are dropped.
+    """
+    pairs = []
+    for k, vs in mapping.items():
+        if isinstance(vs, (six.string_types, bytes)) or \
+                not hasattr(vs, '__iter__'):
+            vs = [vs]
+
+        for v in vs:
+            if v is not None:
+                pairs.append((k, v if isinstance(v, bytes) else str(v)))
+
+    return pairs
+
+
+class AsyncSingleFlight(SingleFlight):
+    """
+    Coalesce concurrent calls with equal keys in :mod:`asyncio` code, see
+    :class:`~.coalesce.SingleFlight`. Must be used from a single event
+    loop.
+    """
+
+    async def do(self, key, fn):
+        """
+        Await coroutine function ``fn`` unless a call with ``key`` is
+        already in flight, in which case await its result instead.
+        Cancelling one of the waiters does not cancel the shared call.
+        """
+        future = self._calls.get(key)
+
+        if future is None:
+            future = self._calls[key] = asyncio.ensure_future(fn())
+            future.add_done_callback(lambda _: self._calls.pop(key, None))
+            self.calls += 1
+
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(future)
+
+
+class _StreamBody(object):
+    """
+    Request body iterating over the byte chunks of a blocking iterable
+    ``chunks`` off the event loop, so that encoding, compressing and
+    reading files do not block it. Sent chunked by :mod:`aiohttp`.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        #: Bytes produced so far
+        self.bytes_out = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            chunk = await loop.run_in_executor(None, next, self._chunks,
+                                               None)
+            if chunk is None:
+                raise StopAsyncIteration
+
+            # Empty chunks would end the chunked body
+            if chunk:
+                self.bytes_out += len(chunk)
+                return chunk
+
+
+class AsyncBulkJobs(BulkJobs):
+    """
+    Asynchronous :class:`~.bulk.BulkJobs`: commands return awaitables of
+    the per job results.
+    """
+
+    async def run(self, command, *args, **kwgs):
+        semaphore = asyncio.Semaphore(self.concurrency or
+                                      max(len(self.jobs), 1))
+
+        async def call(job):
+            async with semaphore:
+                try:
+                    return JobResult(
+                        job, await getattr(job, command)(*args, **kwgs), None)
+
+                except Exception as e:
+                    return JobResult(job, None, e)
+
+        return list(await asyncio.gather(*map(call, self.jobs)))
+
+    run.__doc__ = BulkJobs.run.__doc__
+
+
+class AsyncBulkWorkerActions(BulkWorkerActions):
+    """
+    Asynchronous :class:`~.bulk.BulkWorkerActions`: running returns an
+    awaitable of the per action results.
+    """
+
+    async def run(self):
+        pending = self._pending()
+        semaphore = asyncio.Semaphore(self.concurrency or
+                                      max(len(pending), 1))
+
+        async def send(action):
+            async with semaphore:
+                self._start(action)
+                try:
+                    result = await action.command.call(action.worker,
+                                                       action.callargs)
+
+                except Exception as e:
+                    return self._fail(action, e)
+
+                return self._done(action, result)
+
+        await asyncio.gather(*map(send, pending))
+        return [action.result for action in self.actions]
+
+    run.__doc__ = BulkWorkerActions.run.__doc__
+
+
+class AsyncClient(Client):
+    """
+    Asynchronous CrowdFlower API client. Requires API ``key`` for
+    authentication. Offers the same :class:`~.client.PathFactory` syntax and
+    methods as :class:`~.client.Client`, but calls return awaitables and
+    paged results are asynchronous generators.
+
+    .. code-block:: python
+
+       >>> async with AsyncClient('yourapikey') as client:
+       ...     job = await client.get_job(123123)
+       ...     await job.pause()
+       ...     async for unit in client.get_units(job):
+       ...         print(unit.id)
+
+    Models bound to an :class:`AsyncClient` return awaitables from methods
+    and properties that make API calls, for example ``await job.units`` and
+    ``await aggregate.judgments``. Property setters that make API calls
+    (:attr:`Job.tags <crowdflower.job.Job.tags>` and
+    :attr:`Job.channels <crowdflower.job.Job.channels>`) and implicit
+    :class:`~.unit.UnitPromise` attribute resolution require a blocking
+    client; use the corresponding client methods instead.
+
+    :param key: CrowdFlower API key. Required for authentication.
+    :param session: Use a pre configured :class:`aiohttp.ClientSession`
+                    instead of creating one. Pool options are ignored, if
+                    given. The caller remains responsible for closing it.
+    :type session: aiohttp.ClientSession
+    :param limit: Maximum number of simultaneous connections
+    :type limit: int
+    :param limit_per_host: Maximum number of simultaneous connections per
+                           host, 0 for no limit
+    :type limit_per_host: int
+    :param keepalive_timeout: Seconds to keep idle connections alive
+    :type keepalive_timeout: float
+    :param rate_limit: Client wide limit of requests per second, see
+                       :class:`~.client.Client`
+    :param burst: Number of requests allowed in a burst
+    :param retries: Number of retries, or a :class:`~.ratelimit.RetryPolicy`
+    :param timeout: Default connect and read timeouts in seconds
+    :param deadline: Default overall deadline of a call in seconds,
+                     including retries
+    :param coalesce: Coalesce concurrent identical GET calls, see
+                     :class:`~.client.Client`
+    :param codec: JSON codec name or instance, see :mod:`crowdflower.codec`
+    :param metrics: Collect request metrics per endpoint, see
+                    :class:`~.client.Client`
+    :param compress: Gzip compress upload bodies, see
+                     :class:`~.client.Client`
+    """
+
+    _single_flight_factory = AsyncSingleFlight
+
+    def __init__(self, key, session=None, limit=100, limit_per_host=0,
+                 keepalive_timeout=15, rate_limit=None, burst=None,
+                 retries=3, timeout=Client.DEFAULT_TIMEOUT, deadline=None,
+                 coalesce=False, codec=None, metrics=None, compress=False):
+        self._session = session
+        self._owns_session = session is None
+        self._connector_options = dict(
+            limit=limit,
+            limit_per_host=limit_per_host,
+            keepalive_timeout=keepalive_timeout
+        )
+        self._init_client(key, rate_limit, burst, retries, timeout, deadline,
+                          None, None, coalesce, codec, metrics, compress)
+
+    @property
+    def session(self):
+        """
+        The pooled :class:`aiohttp.ClientSession` used for all calls, created
+        on first use.
+        """
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(**self._connector_options))
+
+        return self._session
+
+    async def close(self):
+        """
+        Close the underlying session and release pooled connections. A
+        session given by the caller is left open.
+        """
+        if self._session is not None and self._owns_session:
+            await self._session.close()
+
+    def __enter__(self):
+        raise TypeError("use 'async with' with AsyncClient")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def call(self, path,
+                   data=None,
+                   headers={},
+                   query={},
+                   method='get',
+                   files=None,
+                   as_json=True,
+                   stream=False,
+                   timeout=None,
+                   deadline=None):
+        """
+        Asynchronous counterpart of :meth:`Client.call
+        <crowdflower.client.Client.call>`. If ``as_json`` is false, returns
+        the :class:`aiohttp.ClientResponse` with its body already read,
+        unless ``stream`` is true, in which case the caller reads and
+        releases it.
+        """
+        key = self._coalesce_key(path, data, headers, query, method, files,
+                                 as_json, stream)
+        if key is not None:
+            return await self._single_flight.do(key, lambda: self._call(
+                path, data, headers, query, method, files, as_json, stream,
+                timeout, deadline))
+
+        return await self._call(path, data, headers, query, method, files,
+                                as_json, stream, timeout, deadline)
+
+    async def _call(self, path, data, headers, query, method, files,
+                    as_json, stream, timeout, deadline):
+        if data and isinstance(data, six.text_type):
+            data = data.encode('utf-8')
+
+        elif isinstance(data, dict):
+            data = _key_values(data)
+
+        if files:
+            form = aiohttp.FormData(data or ())
+            for name, value in files.items():
+                form.add_field(name, value)
+
+            data = form
+
+        if method == 'get' and data:
+            method = 'post'
+
+        url = self.API_URL.format(path=path)
+        timeout = _client_timeout(timeout or self._timeout)
+        deadline = deadline or self._deadline
+        # Read once, hooks may be removed concurrently
+        hooks = self._hooks
+        info = None
+        if hooks is not None:
+            info = hooks.start(method, path, data)
+
+        resp = None
+        text = None
+        try:
+            send = self._send(
+                method=method,
+                url=url,
+                params=_key_values(dict(query, key=self._key)),
+                data=data,
+                headers=dict(accept='application/json', **headers),
+                timeout=timeout,
+                info=info
+            )
+            if deadline is not None:
+                try:
+                    resp = await asyncio.wait_for(send, deadline)
+
+                except asyncio.TimeoutError:
+                    raise DeadlineExceeded(
+                        "deadline of {}s exceeded".format(deadline))
+
+            else:
+                resp = await send
+
+            if info is not None and isinstance(data, _StreamBody):
+                # Streamed bodies are sized once sent
+                info.bytes_out = data.bytes_out
+
+            keep = False
+            try:
+                if stream and not as_json and resp.status < 400:
+                    if info is not None:
+                        info.latency = _clock() - info.start
+                        info.status = resp.status
+                        info.wire_bytes_in = _content_length(resp.headers)
+                        if not resp.headers.get('Content-Encoding'):
+                            info.bytes_in = info.wire_bytes_in
+
+                    # The caller reads the body
+                    keep = True
+                    return resp
+
+                body = await resp.read()
+                if info is not None:
+                    info.latency = _clock() - info.start
+                    info.status = resp.status
+                    info.bytes_in = len(body)
+                    info.wire_bytes_in = _wire_size(resp.headers,
+                                                    info.bytes_in)
+
+                text = body.decode(resp.get_encoding(), 'replace')
+                resp.raise_for_status()
+
+                if not as_json:
+                    # The body has been read, keep the response readable
+                    keep = True
+                    return resp
+
+                if info is None:
+                    resp_json = self._codec.loads(body)
+
+                else:
+                    start = _clock()
+                    resp_json = self._codec.loads(body)
+                    info.decode_time = _clock() - start
+
+                self._check_errors(resp_json)
+
+            finally:
+                if not keep:
+                    resp.release()
+
+        except Exception as e:
+            error = _api_error(e, method, url, resp, text,
+                               getattr(resp, 'request_info', None))
+            if info is not None:
+                info.error = error
+
+            raise error
+
+        finally:
+            if info is not None:
+                if info.latency is None:
+                    info.latency = _clock() - info.start
+
+                hooks.finish(info)
+
+        return resp_json
+
+    async def _send(self, method, url, data=None, info=None, **kwgs):
+        """
+        Send a request through the session, applying the rate limit and
+        retry policy.
+        """
+        replayable = not isinstance(data, (aiohttp.FormData, _StreamBody))
+        attempt = 0
+
+        while True:
+            if info is not None:
+                info.retries = attempt
+
+            if self._rate_limit is not None:
+                delay = self._rate_limit.reserve()
+                if delay:
+                    await asyncio.sleep(delay)
+
+            try:
+                resp = await self.session.request(method=method, url=url,
+                                                  data=data, **kwgs)
+
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if not (replayable and
+                        self._retry.should_retry(attempt, method)):
+                    raise
+
+                delay = self._retry.backoff(attempt)
+
+            else:
+                if not (replayable and self._retry.should_retry(
+                        attempt, method, resp.status)):
+                    return resp
+
+                delay = self._retry.backoff(attempt, parse_retry_after(
+                    resp.headers.get('Retry-After')))
+                resp.release()
+
+                if resp.status == 429 and self._rate_limit is not None:
+                    self._rate_limit.penalize(delay)
+                    delay = 0
+
+            if delay:
+                await asyncio.sleep(delay)
+
+            attempt += 1
+
+    async def paged_call(self, *args, **kwgs):
+        """
+        Asynchronous generator counterpart of :meth:`Client.paged_call
+        <crowdflower.client.Client.paged_call>`.
+
+        :keyword page: Page to start at, defaults to 1.
+        :keyword limit: Limit pages to ``limit`` items, defaults to 100.
+        :keyword sentinel: Stop paging when a response equals ``sentinel``.
+        :keyword concurrency: Fetch a window of ``concurrency`` pages at
+                              once, see :meth:`Client.paged_call
+                              <crowdflower.client.Client.paged_call>`.
+        """
+        page = kwgs.pop('page', 1)
+        limit = kwgs.pop('limit', 100)
+        sentinel = kwgs.pop('sentinel', None)
+        query = kwgs.pop('query', {})
+        concurrency = kwgs.pop('concurrency', None) or 1
+        pages = count(page)
+        window = deque()
+        # The first page known to be the last one
+        last_page = None
+
+        async def fetch(page):
+            nonlocal last_page
+            response = await self.call(
+                *args,
+                query=dict(query, page=page, limit=limit),
+                **kwgs
+            )
+            if concurrency > 1 and (response == sentinel or
+                                    len(response) < limit):
+                if last_page is None or page < last_page:
+                    last_page = page
+
+            return response
+
+        def schedule():
+            page = next(pages)
+            if last_page is None or page <= last_page:
+                window.append(asyncio.ensure_future(fetch(page)))
+
+        try:
+            for _ in range(concurrency):
+                schedule()
+
+            while window:
+                response = await window.popleft()
+                if response == sentinel:
+                    break
+
+                yield response
+
+                if concurrency > 1 and len(response) < limit:
+                    break
+
+                schedule()
+
+        finally:
+            for task in window:
+                task.cancel()
+
+    async def _then(self, result, callback):
+        result = callback(await result)
+        if inspect.isawaitable(result):
+            result = await result
+
+        return result
+
+    async def _collect(self, iterable):
+        return [item async for item in iterable]
+
+    async def _gather(self, results):
+        return list(await asyncio.gather(*results))
+
+    async def _resolved(self, value):
+        return value
+
+    async def create_job(self, attrs):
+        return Job(
+            client=self,
+            **await self.jobs(data=self._make_cf_attrs('job', attrs),
+                              method='post')
+        )
+
+    create_job.__doc__ = Client.create_job.__doc__
+
+    async def get_job(self, job_id):
+        return Job(client=self, **await self.jobs[job_id]())
+
+    get_job.__doc__ = Client.get_job.__doc__
+
+    async def get_jobs(self, concurrency=None):
+        """
+        Get Jobs connected to this client and key.
+
+        :returns: an asynchronous iterator of CrowdFlower jobs
+        """
+        async for resp in self.jobs.pages(sentinel=[],
+                                          concurrency=concurrency):
+            for data in resp:
+                yield Job(client=self, **data)
+
+    def bulk(self, jobs, concurrency=10):
+        return AsyncBulkJobs(self._bulk_jobs(jobs), concurrency)
+
+    bulk.__doc__ = Client.bulk.__doc__
+
+    async def bulk_workers(self, actions, concurrency=10, journal=None,
+                           retry_unknown=False):
+        if isinstance(journal, six.string_types):
+            with Journal(journal) as journal:
+                return await self.bulk_workers(actions, concurrency, journal,
+                                               retry_unknown)
+
+        return await AsyncBulkWorkerActions(actions, concurrency, journal,
+                                            retry_unknown).run()
+
+    bulk_workers.__doc__ = Client.bulk_workers.__doc__
+
+    async def _upload_job(self, chunks, type_, job_id, force=False):
+        headers = {'Content-Type': type_}
+        path = self.jobs
+
+        if self._compress_level is not None:
+            chunks = GzipBody(chunks, self._compress_level,
+                              self.UPLOAD_CHUNK_SIZE)
+            headers['Content-Encoding'] = 'gzip'
+
+        data = _StreamBody(chunks)
+
+        if job_id is not None:
+            path = path[job_id]
+
+        path = path.upload
+
+        return Job(
+            client=self,
+            **await path(data=data, headers=headers, method='post',
+                         query=dict(force='true') if force else {})
+        )
+
+    def upload_job(self, data, job_id=None, force=False):
+        """
+        Upload given data as JSON. The data is consumed lazily and streamed,
+        encoded off the event loop. Batched uploads are only supported by
+        the blocking :meth:`Client.upload_job
+        <crowdflower.client.Client.upload_job>`.
+        """
+        return self._upload_job(
+            self._iter_json_lines(data),
+            'application/json',
+            job_id,
+            force=force
+        )
+
+    async def upload_job_file(self, file, type_=None, job_id=None,
+                              force=False):
+        """
+        Upload a file like object or open a file for reading and upload,
+        see :meth:`Client.upload_job_file
+        <crowdflower.client.Client.upload_job_file>`. The file is read in
+        chunks off the event loop and streamed.
+        """
+        if isinstance(file, six.string_types):
+            if type_ is None:
+                type_, encoding = mimetypes.guess_type(file)
+
+            if type_ is None:
+                raise ValueError("Type not set or could not guess type")
+
+            with open(file, 'rb') as fp:
+                return await self._upload_job(self._file_chunks(fp), type_,
+                                              job_id, force=force)
+
+        if type_ is None:
+            raise ValueError("Type not set or could not guess type")
+
+        return await self._upload_job(self._file_chunks(file), type_, job_id,
+                                      force=force)
+
+    def _file_chunks(self, fp):
+        """
+        Read file like object ``fp`` in chunks of :attr:`UPLOAD_CHUNK_SIZE`,
+        encoding text to UTF-8.
+        """
+        size = self.UPLOAD_CHUNK_SIZE
+        if isinstance(fp.read(0), six.text_type):
+            return (chunk.encode('utf-8') for chunk in
+                    iter(lambda: fp.read(size), u''))
+
+        return iter(lambda: fp.read(size), b'')
+
+    async def get_judgmentaggregates(self, job, concurrency=None):
+        """
+        Get JudgmentAggregates for ``job`` as an asynchronous iterator.
+        """
+        async for resp in self.jobs[job.id].judgments.pages(
+                sentinel={}, concurrency=concurrency):
+            for data in resp.values():
+                yield JudgmentAggregate(job, client=self, **data)
+
+    async def get_judgment(self, job, judgment_id):
+        return Judgment(
+            job,
+            client=self,
+            **await self.jobs[job.id].judgments[judgment_id]()
+        )
+
+    get_judgment.__doc__ = Client.get_judgment.__doc__
+
+    async def resolve_judgments(self, job, aggregates, concurrency=10):
+        aggregates = list(aggregates)
+        pending = [a for a in aggregates if not hasattr(a, '_judgments')]
+        ids = list(OrderedDict.fromkeys(
+            id_ for aggregate in pending for id_ in aggregate.ids))
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(id_):
+            async with semaphore:
+                return await self.get_judgment(job, id_)
+
+        judgments = dict(zip(ids, await asyncio.gather(*map(fetch, ids))))
+
+        for aggregate in pending:
+            aggregate._judgments = [judgments[id_] for id_ in aggregate.ids]
+
+        return aggregates
+
+    resolve_judgments.__doc__ = Client.resolve_judgments.__doc__
+
+    async def get_unit(self, job, unit_id):
+        return Unit(
+            job, client=self,
+            **await self.jobs[job.id].units[unit_id]()
+        )
+
+    get_unit.__doc__ = Client.get_unit.__doc__
+
+    async def get_units(self, job, concurrency=None):
+        """
+        Get :class:`unit promises <crowdflower.unit.UnitPromise>`
+        for :class:`~.job.Job` as an asynchronous iterator.
+        """
+        async for resp in self.jobs[job.id].units.pages(
+                sentinel={}, concurrency=concurrency):
+            for unit_id, data in resp.items():
+                yield UnitPromise(job, client=self, id=unit_id, data=data)
+
+    async def resolve_units(self, job, promises, concurrency=10):
+        promises = list(promises)
+        pending = [p for p in promises if p._object is None]
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def resolve(promise):
+            async with semaphore:
+                promise._object = await self.get_unit(job, promise.id)
+
+        await asyncio.gather(*map(resolve, pending))
+        return [p._object for p in promises]
+
+    resolve_units.__doc__ = Client.resolve_units.__doc__
+
+    async def copy_job(self, job_id, all_units, gold):
+        return Job(
+            client=self,
+            **await self.jobs[job_id].copy(
+                query=dict(all_units=all_units, gold=gold),
+                method='post'
+            )
+        )
+
+    copy_job.__doc__ = Client.copy_job.__doc__
+
+    async def get_order(self, job, order_id):
+        return Order(
+            job, client=self,
+            **await self.jobs[job.id].orders[order_id]()
+        )
+
+    get_order.__doc__ = Client.get_order.__doc__
+
+    async def get_report(self, job, type_='json', compact=False):
+        return [unit async for unit in self.iter_report(job, type_, compact)]
+
+    get_report.__doc__ = Client.get_report.__doc__
+
+    #: Number of units parsed at a time by :meth:`iter_report`
+    REPORT_BATCH_SIZE = 1000
+
+    async def iter_report(self, job, type_='json', compact=False):
+        """
+        Download and uncompress reports lazily, generating
+        :py:class:`Units <crowdflower.unit.Unit>` asynchronously. The
+        report is streamed to a spooled temporary file, and units are
+        parsed in batches of :attr:`REPORT_BATCH_SIZE` off the event loop,
+        so memory use does not depend on the size of the report.
+
+        :param compact: Generate memory efficient
+                        :class:`~crowdflower.unit.CompactUnit` instances
+                        sharing ``job``
+        :type compact: bool
+        :returns: an asynchronous iterator of
+                  :py:class:`Units <crowdflower.unit.Unit>`
+        """
+        resp = await self.jobs[job.id](
+            _suffix='.csv',
+            as_json=False,
+            stream=True,
+            query=dict(type=type_),
+        )
+        loop = asyncio.get_running_loop()
+
+        with tempfile.SpooledTemporaryFile(
+                max_size=self.REPORT_SPOOL_SIZE) as fp:
+            try:
+                async for chunk in resp.content.iter_chunked(
+                        self.REPORT_CHUNK_SIZE):
+                    # Writes block, once spooled to disk
+                    await loop.run_in_executor(None, fp.write, chunk)
+
+            finally:
+                resp.release()
+
+            fp.seek(0)
+            units = self._iter_report_units(job, fp, compact)
+
+            while True:
+                batch = await loop.run_in_executor(
+                    None, lambda: list(islice(units, self.REPORT_BATCH_SIZE)))
+                if not batch:
+                    break
+
+                for unit in batch:
+                    yield unit
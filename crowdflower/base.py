@@ -1,81 +1,151 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function, division, absolute_import
+from operator import attrgetter
 from six import with_metaclass
 
+try:
+    from types import MappingProxyType
+
+except ImportError:
+    MappingProxyType = dict
+
 __author__ = u'Ilja Everilä <ilja.everila@liilak.com>'
 
+#: Shared read only changes of compact resources, replaced with a dict on
+#: first change.
+_NO_CHANGES = MappingProxyType({})
+
 
-class Attribute(object):
+class Attribute(property):
+    """
+    Attribute descriptor proxying item ``name`` of the JSON data of a
+    resource, stored in instance attribute ``get_attr``. Changes are stored
+    in instance attribute ``set_attr`` and take precedence over the JSON
+    data.
+
+    The accessors are generated as closures, once the name is known, either
+    given as ``name`` or set by :class:`_AttributeMeta`, so that attribute
+    access runs at :class:`property` speed.
+    """
 
     def __init__(self, name=None, get_attr='_json', set_attr='_changes'):
-        self.name = name
+        super(Attribute, self).__init__()
+        self.name = None
         self.get_attr = get_attr
         self.set_attr = set_attr
 
-    def __get__(self, instance, owner):
-        if instance is None:
-            return self
+        if name is not None:
+            self._bind(name)
+
+    def _bind(self, name):
+        self.name = name
+        property.__init__(self, self._make_getter(), self._make_setter())
+
+    def _make_getter(self):
+        name = self.name
 
         # Look in the 'set_attr' (holding possible temporary changes) first,
-        # default to 'get_attr'.
-        return getattr(instance, self.set_attr).get(
-            self.name, getattr(instance, self.get_attr)[self.name])
+        # fall back to 'get_attr'. The fallback is evaluated only when
+        # needed, so that attributes only present in changes work.
+        if self.get_attr == '_json' and self.set_attr == '_changes':
+            def fget(instance):
+                changes = instance._changes
+                if changes and name in changes:
+                    return changes[name]
+
+                return instance._json[name]
+
+        else:
+            get_data = attrgetter(self.get_attr)
+            get_changes = attrgetter(self.set_attr)
+
+            def fget(instance):
+                changes = get_changes(instance)
+                if changes and name in changes:
+                    return changes[name]
+
+                return get_data(instance)[name]
+
+        return fget
+
+    def _make_setter(self):
+        name = self.name
+        set_attr = self.set_attr
+
+        if set_attr == '_changes':
+            def fset(instance, value):
+                changes = instance._changes
+
+                if changes is _NO_CHANGES:
+                    changes = instance._changes = {}
+
+                changes[name] = value
+
+        else:
+            get_changes = attrgetter(set_attr)
+
+            def fset(instance, value):
+                changes = get_changes(instance)
+
+                if changes is _NO_CHANGES:
+                    changes = {}
+                    setattr(instance, set_attr, changes)
 
-    def __set__(self, instance, value):
-        getattr(instance, self.set_attr)[self.name] = value
+                changes[name] = value
+
+        return fset
 
 
 class RoAttribute(Attribute):
 
-    def __set__(self, instance, value):
-        raise AttributeError(
-            "cannot change read only attribute '{}'".format(self.name))
+    def _make_setter(self):
+        name = self.name
+
+        def fset(instance, value):
+            raise AttributeError(
+                "cannot change read only attribute '{}'".format(name))
+
+        return fset
 
 
 class WoAttribute(Attribute):
 
-    def __get__(self, instance, owner):
-        if instance is None:
-            return self
+    def _make_getter(self):
+        name = self.name
 
-        raise AttributeError(
-            "cannot read write only attribute '{}'".format(self.name))
+        def fget(instance):
+            raise AttributeError(
+                "cannot read write only attribute '{}'".format(name))
+
+        return fget
 
 
 class _AttributeMeta(type):
     """
     An evil hack that inspects certain types of attributes and sets
-    values for them (names).
+    values for them (names), which generates their accessors.
     """
 
     def __init__(cls, what, bases, dict_):
         for k, v in dict_.items():
             if isinstance(v, Attribute) and v.name is None:
-                v.name = k
+                v._bind(k)
 
         super(_AttributeMeta, cls).__init__(what, bases, dict_)
 
     def __setattr__(cls, key, value):
         if isinstance(value, Attribute) and value.name is None:
-            value.name = key
+            value._bind(key)
 
         super(_AttributeMeta, cls).__setattr__(key, value)
 
 
-class Base(with_metaclass(_AttributeMeta, object)):
+class _Resource(with_metaclass(_AttributeMeta, object)):
     """
-    CrowdFlower Base type.
-
-    :param data: JSON data
-    :type data: dict
-    :param client: CrowdFlower API client
-    :type client: crowdflower.client.Client
+    Behaviour shared by :class:`Base` and slotted compact resources.
     """
 
-    def __init__(self, data, client=None):
-        self._client = client
-        self._json = data
-        self._changes = {}
+    __slots__ = ()
 
     def _send_changes(self, changes):
         """
@@ -88,8 +158,11 @@ class Base(with_metaclass(_AttributeMeta, object)):
         """
         Send changes to server and update instance with reply.
         """
-        self._json.update(self._send_changes(self._changes))
-        self._changes = {}
+        def _update(reply):
+            self._json.update(reply)
+            self._changes = {}
+
+        return self.client._then(self._send_changes(self._changes), _update)
 
     @property
     def client(self):
@@ -106,7 +179,27 @@ class Base(with_metaclass(_AttributeMeta, object)):
         """
         Allows job['item'] syntax for those preferring such things.
         """
-        return self._changes.get(item, self._json[item])
+        changes = self._changes
+        if changes and item in changes:
+            return changes[item]
+
+        return self._json[item]
+
+
+class Base(_Resource):
+    """
+    CrowdFlower Base type.
+
+    :param data: JSON data
+    :type data: dict
+    :param client: CrowdFlower API client
+    :type client: crowdflower.client.Client
+    """
+
+    def __init__(self, data, client=None):
+        self._client = client
+        self._json = data
+        self._changes = {}
 
 
 class JobResource(Base):
@@ -126,6 +219,80 @@ class JobResource(Base):
         self.job = job
 
 
+class CompactJobResource(_Resource):
+    """
+    Base class for compact variants of :class:`JobResource` types, meant
+    for large read only bulk results such as reports. Instances have no
+    ``__dict__``, share an empty read only changes mapping until first
+    changed and get their client from the shared :attr:`job`.
+
+    Use :func:`compact` to create compact variants.
+
+    :param job: :py:class:`Job <crowdflower.job.Job>` instance owning this
+                resource
+    :type job: crowdflower.job.Job
+    :param client: Ignored, the client of ``job`` is used
+    :param data: JSON dictionary
+    :type data: dict
+    """
+
+    __slots__ = ('_json', '_changes', 'job')
+
+    def __init__(self, job, client=None, **data):
+        self.job = job
+        self._json = data
+        self._changes = _NO_CHANGES
+
+    @classmethod
+    def from_json(cls, job, data):
+        """
+        Create a new instance using JSON dictionary ``data`` as is, without
+        copying it.
+        """
+        self = cls.__new__(cls)
+        self.job = job
+        self._json = data
+        self._changes = _NO_CHANGES
+        return self
+
+    @property
+    def _client(self):
+        return self.job._client
+
+    @_client.setter
+    def _client(self, value):
+        raise AttributeError(
+            "compact resources use the client of their job, set it on "
+            "the job instead")
+
+
+def compact(cls, slots=()):
+    """
+    Create a compact, slotted variant of :class:`JobResource` subclass
+    ``cls`` with the same attributes and methods, including those
+    inherited from its bases below :class:`JobResource`. Additional
+    instance attributes used by ``cls`` must be declared in ``slots``.
+
+    :param cls: Resource class
+    :param slots: Additional attribute names
+    :returns: new class deriving from :class:`CompactJobResource`
+    """
+    dict_ = {}
+    # Most derived definitions win
+    for klass in reversed(cls.__mro__):
+        if klass in JobResource.__mro__:
+            continue
+
+        dict_.update((k, v) for k, v in vars(klass).items()
+                     if k not in {'__dict__', '__weakref__', '__slots__'})
+
+    dict_['__slots__'] = tuple(slots)
+    dict_['__doc__'] = "Compact variant of :class:`{}.{}`.".format(
+        cls.__module__, cls.__name__)
+    return _AttributeMeta('Compact' + cls.__name__,
+                          (CompactJobResource,), dict_)
+
+
 class Promise(object):
     """
     A promise that an crowdflower object will be available for querying
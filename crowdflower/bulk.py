@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+"""
+Bulk operations over many resources with bounded concurrency. Results and
+exceptions are collected per item, so that a batch does not abort on the
+first failure.
+"""
+from __future__ import print_function, division, absolute_import
+from collections import namedtuple, Counter
+from .pool import bounded_map
+from .ratelimit import RetryPolicy
+from .worker import Worker
+import json
+import os
+import threading
+
+__author__ = u'Ilja Everilä <ilja.everila@liilak.com>'
+
+
+class JobResult(namedtuple('JobResult', 'job result error')):
+    """
+    Result of a bulk command on a single job: either the ``result`` of the
+    command, or the ``error`` it raised.
+    """
+
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def _bulk_command(name):
+    """
+    Helper function for creating :class:`BulkJobs` commands.
+    """
+    def cmd(self):
+        return self.run(name)
+
+    cmd.__name__ = name
+    cmd.__doc__ = """
+        Run :meth:`Job.{0} <crowdflower.job.Job.{0}>` on all jobs.
+
+        :returns: list of :class:`JobResult` in the order of jobs
+        """.format(name)
+    return cmd
+
+
+class BulkJobs(object):
+    """
+    Run :class:`~.job.Job` commands across many jobs, ``concurrency`` at
+    a time. Use :meth:`Client.bulk <crowdflower.client.Client.bulk>` to
+    create instances.
+
+    .. code-block:: python
+
+       >>> results = client.bulk(jobs).pause()
+       >>> failed = [r.job for r in results if not r.ok]
+
+    :param jobs: Iterable of jobs
+    :param concurrency: Maximum number of concurrent requests
+    :type concurrency: int
+    """
+
+    def __init__(self, jobs, concurrency=10):
+        self.jobs = list(jobs)
+        self.concurrency = concurrency
+
+    def _call(self, job, command, args, kwgs):
+        try:
+            return JobResult(job, getattr(job, command)(*args, **kwgs), None)
+
+        except Exception as e:
+            return JobResult(job, None, e)
+
+    def run(self, command, *args, **kwgs):
+        """
+        Call job method ``command`` with ``args`` and ``kwgs`` on all jobs.
+
+        :param command: Name of a :class:`~.job.Job` method
+        :type command: str
+        :returns: list of :class:`JobResult` in the order of jobs
+        """
+        return list(bounded_map(
+            lambda job: self._call(job, command, args, kwgs),
+            self.jobs, self.concurrency))
+
+    pause = _bulk_command('pause')
+    resume = _bulk_command('resume')
+    cancel = _bulk_command('cancel')
+    ping = _bulk_command('ping')
+    legend = _bulk_command('legend')
+    delete = _bulk_command('delete')
+
+
+#: Worker action states recorded in a :class:`Journal` and reported in
+#: :class:`ActionResult`
+STARTED = 'started'
+DONE = 'done'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+UNKNOWN = 'unknown'
+
+
+class ActionResult(namedtuple('ActionResult',
+                              'worker action args state result error')):
+    """
+    Result of a bulk action on a single worker. The ``state`` is one of:
+
+    - ``'done'``: the action succeeded with ``result``
+    - ``'failed'``: the action failed with ``error`` and can be retried
+    - ``'skipped'``: the action was done in an earlier run
+    - ``'unknown'``: an earlier run crashed after sending a non idempotent
+      action, or its request failed without a response or with a server
+      error, so it may or may not have taken effect. It is not sent
+      again, unless explicitly asked to.
+    """
+
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.state in {DONE, SKIPPED}
+
+
+class Journal(object):
+    """
+    Append only JSON lines log of worker action states, for resuming bulk
+    actions after a crash. Each action is recorded as started before its
+    request is sent and as done or failed after.
+
+    :param path: Log file path, created if missing
+    :type path: str
+    :param fsync: Flush records to disk with :func:`os.fsync`
+    :type fsync: bool
+    """
+
+    def __init__(self, path, fsync=False):
+        self.path = path
+        self.fsync = fsync
+        self._entries = {}
+
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    line = line.strip()
+                    # The last line may be partial after a crash
+                    try:
+                        entry = json.loads(line)
+
+                    except ValueError:
+                        continue
+
+                    self._entries[entry['key']] = entry
+
+        self._file = open(path, 'a')
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Latest entry recorded for ``key``, or None.
+        """
+        return self._entries.get(key)
+
+    def record(self, key, state, **data):
+        """
+        Record ``state`` of action ``key`` with additional ``data``.
+        """
+        entry = dict(data, key=key, state=state)
+        line = json.dumps(entry, sort_keys=True) + '\n'
+        with self._lock:
+            self._entries[key] = entry
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _status(resp):
+    """
+    HTTP status of a :mod:`requests` or :mod:`aiohttp` response ``resp``,
+    or None.
+    """
+    status = getattr(resp, 'status_code', None)
+    if status is None:
+        status = getattr(resp, 'status', None)
+
+    return status
+
+
+class _Action(object):
+
+    __slots__ = ('worker', 'action', 'args', 'command', 'callargs', 'key',
+                 'result')
+
+    def __init__(self, worker, action, args):
+        self.worker = worker
+        self.action = action
+        self.args = args
+        self.command = None
+        self.callargs = None
+        self.key = None
+        self.result = None
+
+    def report(self, state, result=None, error=None):
+        self.result = ActionResult(self.worker, self.action, self.args,
+                                   state, result, error)
+        return self.result
+
+
+class BulkWorkerActions(object):
+    """
+    Run :class:`~.worker.Worker` actions, such as bonuses, in bulk,
+    ``concurrency`` at a time. Requests are subject to the rate limits of
+    the client. Arguments of all actions are bound and validated before
+    any are sent.
+
+    Given a :class:`Journal`, actions done in an earlier run are skipped,
+    so that an interrupted run can be resumed without double paying.
+    Actions are identified by job, worker, action and arguments, counting
+    repeated identical actions separately.
+
+    .. code-block:: python
+
+       >>> actions = [(worker, 'bonus', (100, 'Thanks!')) for worker in workers]
+       >>> with Journal('bonuses.jsonl') as journal:
+       ...     results = client.bulk_workers(actions, journal=journal)
+
+    :param actions: Iterable of ``(worker, action, args)``, where ``args``
+                    is a sequence of positional arguments or a dictionary of
+                    keyword arguments of the action
+    :param concurrency: Maximum number of concurrent requests
+    :type concurrency: int
+    :param journal: Journal of action states
+    :type journal: crowdflower.bulk.Journal
+    :param retry_unknown: Send actions in unknown state again
+    :type retry_unknown: bool
+    """
+
+    def __init__(self, actions, concurrency=10, journal=None,
+                 retry_unknown=False):
+        self.actions = [_Action(*action) for action in actions]
+        self.concurrency = concurrency
+        self.journal = journal
+        self.retry_unknown = retry_unknown
+
+    def _prepare(self, action, seen):
+        """
+        Bind arguments and check the journal. Returns True, if ``action``
+        should be sent.
+        """
+        command = getattr(Worker, action.action, None)
+        if not hasattr(command, 'bind'):
+            action.report(FAILED, error=AttributeError(
+                "unknown worker action '{}'".format(action.action)))
+            return False
+
+        try:
+            if isinstance(action.args, dict):
+                callargs = command.bind((), action.args)
+
+            else:
+                callargs = command.bind(tuple(action.args), {})
+
+        except TypeError as e:
+            action.report(FAILED, error=e)
+            return False
+
+        action.command = command
+        action.callargs = callargs
+        key = '{}/{}/{}/{}'.format(
+            action.worker.job.id, action.worker.id, action.action,
+            json.dumps(callargs, sort_keys=True))
+        action.key = '{}#{}'.format(key, seen[key])
+        seen[key] += 1
+
+        entry = self.journal and self.journal.get(action.key)
+        state = entry and entry['state']
+
+        if state == DONE:
+            action.report(SKIPPED, result=entry.get('result'))
+            return False
+
+        if state in {STARTED, UNKNOWN} and not self.retry_unknown:
+            action.report(UNKNOWN, error=entry.get('error'))
+            return False
+
+        return True
+
+    def _pending(self):
+        """
+        Prepare all actions, returning those that should be sent.
+        """
+        seen = Counter()
+        return [action for action in self.actions
+                if self._prepare(action, seen)]
+
+    def _start(self, action):
+        if self.journal:
+            self.journal.record(action.key, STARTED)
+
+    def _fail(self, action, error):
+        # A non idempotent request may have had an effect, unless the API
+        # answered it with an error other than a server error
+        state = FAILED
+        if action.command.method not in RetryPolicy.IDEMPOTENT_METHODS:
+            status = _status(getattr(error, 'response', None))
+            if status is None or status >= 500:
+                state = UNKNOWN
+
+        if self.journal:
+            self.journal.record(action.key, state, error=str(error))
+
+        return action.report(state, error=error)
+
+    def _done(self, action, result):
+        if self.journal:
+            self.journal.record(action.key, DONE, result=result)
+
+        return action.report(DONE, result=result)
+
+    def _send(self, action):
+        self._start(action)
+        try:
+            # Arguments were bound when preparing
+            result = action.command.call(action.worker, action.callargs)
+
+        except Exception as e:
+            return self._fail(action, e)
+
+        return self._done(action, result)
+
+    def run(self):
+        """
+        Run the actions.
+
+        :returns: list of :class:`ActionResult` in the order of actions
+        """
+        # Consume the results
+        for _ in bounded_map(self._send, self._pending(), self.concurrency):
+            pass
+
+        return [action.result for action in self.actions]
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Conditional GET response cache.
+"""
+from __future__ import print_function, division, absolute_import
+from collections import OrderedDict, namedtuple
+from .ratelimit import _clock
+import posixpath
+import threading
+
+__author__ = u'Ilja Everilä <ilja.everila@liilak.com>'
+
+#: A cached response body with its validators
+CacheEntry = namedtuple('CacheEntry', 'content etag last_modified expires')
+
+
+def _resource(path):
+    """
+    Resource path of API ``path`` without a suffix.
+
+    .. code-block:: python
+
+       >>> _resource('jobs/1/units/2.json')
+       'jobs/1/units/2'
+    """
+    return posixpath.splitext(path)[0]
+
+
+class ResponseCache(object):
+    """
+    Thread safe LRU cache of GET response bodies with TTL eviction. Entries
+    hold the ``ETag`` and ``Last-Modified`` validators of the response,
+    which the :class:`~.client.Client` uses for conditional requests, so
+    that a *304 Not Modified* reply can reuse the cached body.
+
+    :param maxsize: Maximum number of cached responses
+    :type maxsize: int
+    :param ttl: Seconds after which an entry is evicted
+    :type ttl: float
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, clock=_clock):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        #: Number of lookups that found an entry
+        self.hits = 0
+        #: Number of lookups that did not find an entry
+        self.misses = 0
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Get the entry stored with ``key``, or None if not found or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and entry.expires <= self._clock():
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, content, etag=None, last_modified=None):
+        """
+        Store response ``content`` and its validators with ``key``,
+        evicting the least recently used entries if the cache is full.
+        """
+        entry = CacheEntry(content, etag, last_modified,
+                           self._clock() + self.ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, path):
+        """
+        Remove entries related to resource ``path``: the resource itself,
+        the resources containing it and its sub resources. For example
+        a change to ``jobs/1/units/2`` invalidates ``jobs/1/units/2.json``,
+        ``jobs/1.json`` and ``jobs.json``.
+        """
+        path = _resource(path)
+        with self._lock:
+            for key in list(self._entries):
+                resource = _resource(key[0])
+                if resource == path or \
+                        path.startswith(resource + '/') or \
+                        resource.startswith(path + '/'):
+                    del self._entries[key]
+
+    def clear(self):
+        """
+        Remove all entries.
+        """
+        with self._lock:
+            self._entries.clear()
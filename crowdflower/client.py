@@ -1,18 +1,38 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function, division, absolute_import
-from itertools import chain, count
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from itertools import count, islice
+from six.moves.urllib.parse import urlencode
 from zipfile import ZipFile
 from .order import Order
-from .unit import Unit, UnitPromise
+from .unit import Unit, UnitPromise, CompactUnit
 from .job import Job
-from .judgment import JudgmentAggregate, Judgment
+from .judgment import JudgmentAggregate, Judgment, \
+    CompactJudgmentAggregate
+from .bulk import BulkJobs, BulkWorkerActions, Journal
+from .cache import ResponseCache
+from .codec import get_codec
+from .compress import GzipBody, compress_level
+from .coalesce import SingleFlight
+from .metrics import Hooks, Metrics
+from .pool import bounded_map
+from .transport import RequestsTransport
+from .ratelimit import TokenBucket, RetryPolicy, HedgePolicy, \
+    parse_retry_after, _clock
 import contextlib
+import datetime
 import functools
-import json
+import io
 import mimetypes
+import mmap
 import requests
+import requests.adapters
 import requests.exceptions
 import six
+import tempfile
+import threading
+import time
 import logging
 
 _log = logging.getLogger(__name__)
@@ -41,6 +61,115 @@ class ApiError(Exception):
         return self.args[2]
 
 
+def _make_codec(codec):
+    if codec is None or isinstance(codec, six.string_types):
+        return get_codec(codec)
+
+    return codec
+
+
+def _replayable(data):
+    """
+    Can request body ``data`` be sent again on retry. Streams and
+    generators are consumed by the first attempt.
+    """
+    if isinstance(data, GzipBody):
+        return data.replayable
+
+    return data is None or isinstance(
+        data, (bytes, six.text_type, dict, list, tuple, memoryview))
+
+
+def _cap_timeout(timeout, remaining):
+    """
+    Cap connect and read ``timeout`` to ``remaining`` seconds.
+    """
+    if remaining <= 0:
+        raise DeadlineExceeded("deadline exceeded")
+
+    if timeout is None:
+        return remaining
+
+    if isinstance(timeout, tuple):
+        return tuple(remaining if t is None else min(t, remaining)
+                     for t in timeout)
+
+    return min(timeout, remaining)
+
+
+def _close_response(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def _api_error(error, method, url, resp, text, request):
+    return ApiError(
+        # This is rather spammy, but nice when hacking around in shell
+        "CrowdFlower API {method} request to {url} failed: {error}\n"
+        "Response: {resp}".format(
+            url=url,
+            error=error,
+            method=method.upper(),
+            resp=text),
+        resp,
+        request
+    )
+
+
+def _content_length(headers):
+    try:
+        return int(headers.get('Content-Length'))
+
+    except (TypeError, ValueError):
+        return None
+
+
+def _wire_size(headers, size):
+    """
+    Size of a response body as received, before decompressing it: its
+    ``Content-Length``, or the decoded ``size``, if not encoded.
+    """
+    wire_size = _content_length(headers)
+    if wire_size is None and not headers.get('Content-Encoding'):
+        wire_size = size
+
+    return wire_size
+
+
+def _received(info, resp, stream, data=None):
+    """
+    Fill in response details of :class:`~.metrics.RequestInfo` ``info``
+    for a request sending body ``data``.
+    """
+    info.latency = _clock() - info.start
+    info.status = resp.status_code
+    elapsed = getattr(resp, 'elapsed', None)
+    if isinstance(elapsed, datetime.timedelta):
+        info.elapsed = elapsed.total_seconds()
+
+    if not stream:
+        info.bytes_in = len(resp.content)
+
+    elif not resp.headers.get('Content-Encoding'):
+        info.bytes_in = _content_length(resp.headers)
+
+    info.wire_bytes_in = _wire_size(resp.headers, info.bytes_in)
+
+    if isinstance(data, GzipBody):
+        # Compressed while sending, the size is known only now
+        info.bytes_out = data.bytes_out
+
+    elif info.bytes_out is None:
+        # Form encoded and streamed bodies are sized by the request
+        info.bytes_out = _content_length(resp.request.headers)
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """
+    Raised when the overall deadline of a call expires.
+    """
+
+
 class PathFactory:
     """
     Magic attribute/item syntax for making calls.
@@ -88,22 +217,278 @@ class Client(object):
     TODO: Trust data model types in order to provide general methods instead
     of specialized do_this and do_that methods.
 
+    The client owns a pooled :class:`requests.Session`, which keeps
+    connections alive between calls. Use the client as a context manager,
+    or call :meth:`close` when done, in order to release the pooled
+    connections.
+
+    .. code-block:: python
+
+       >>> with Client('yourapikey', pool_maxsize=20) as client:
+       ...     job = client.get_job(123123)
+
     :param key: CrowdFlower API key. Required for authentication.
+    :param session: Use a pre configured :class:`requests.Session` instead
+                    of creating one. Pool options are ignored, if given.
+                    The caller remains responsible for closing it.
+    :type session: requests.Session
+    :param transport: HTTP transport to use instead of a
+                      :class:`~.transport.RequestsTransport`, see
+                      :mod:`crowdflower.transport`. Session and pool options
+                      are ignored, if given. The caller remains responsible
+                      for closing it.
+    :type transport: crowdflower.transport.Transport
+    :param pool_connections: Number of per host connection pools to cache
+    :type pool_connections: int
+    :param pool_maxsize: Maximum number of connections kept alive per host
+    :type pool_maxsize: int
+    :param pool_block: If True, block when no free connections are available
+                       in a host pool instead of opening a new throwaway
+                       connection
+    :type pool_block: bool
+    :param keep_alive: If False, ask the server to close connections after
+                       each request
+    :type keep_alive: bool
+    :param rate_limit: Client wide limit of requests per second, shared by
+                       all threads using the client, or a
+                       :class:`~.ratelimit.TokenBucket`
+    :type rate_limit: float or crowdflower.ratelimit.TokenBucket
+    :param burst: Number of requests allowed in a burst, defaults to
+                  ``rate_limit``
+    :type burst: int
+    :param retries: Number of retries, or a :class:`~.ratelimit.RetryPolicy`.
+                    By default idempotent requests failing with a connection
+                    error, *429* or *50x* status are retried with jittered
+                    exponential backoff, honoring ``Retry-After``.
+    :type retries: int or crowdflower.ratelimit.RetryPolicy
+    :param timeout: Default connect and read timeouts in seconds, either
+                    as a single number or a ``(connect, read)`` tuple
+    :type timeout: float or tuple
+    :param deadline: Default overall deadline of a call in seconds,
+                     including retries
+    :type deadline: float
+    :param hedge: Hedge idempotent GET requests: if no response arrives in
+                  time, send a duplicate request and use whichever
+                  response comes first. Either a fixed delay in seconds or
+                  a :class:`~.ratelimit.HedgePolicy`, which can also adapt
+                  the delay to a latency percentile. Duplicates take a
+                  token from ``rate_limit`` and are skipped, if none is
+                  available. Hedged requests run in two thread pools of
+                  ``pool_maxsize`` threads, one for the originals and one
+                  for the duplicates, so at most ``pool_maxsize`` hedged
+                  requests run at a time. The hedge delay starts when the
+                  original request starts, not while it waits for a
+                  thread.
+    :type hedge: float or crowdflower.ratelimit.HedgePolicy
+    :param cache: Cache GET responses and revalidate them with conditional
+                  requests. Either True for a default
+                  :class:`~.cache.ResponseCache`, or a cache instance.
+                  Changes sent with PUT, POST or DELETE invalidate
+                  related cached resources.
+    :type cache: bool or crowdflower.cache.ResponseCache
+    :param coalesce: Coalesce concurrent identical GET calls, so that only
+                     one request is made and every caller gets the same
+                     parsed result. See :attr:`single_flight` for
+                     counters.
+    :type coalesce: bool
+    :param codec: Name of the JSON codec to use for responses, uploads and
+                  reports, or a codec instance. Defaults to the fastest
+                  installed codec, see :mod:`crowdflower.codec`.
+    :type codec: str or crowdflower.codec.JsonCodec
+    :param metrics: Collect request metrics per endpoint, see
+                    :attr:`metrics`. Either True for a default
+                    :class:`~.metrics.Metrics`, or a metrics instance.
+    :type metrics: bool or crowdflower.metrics.Metrics
+    :param compress: Gzip compress upload bodies while streaming them,
+                     either True for the default compression level or a
+                     level from 1 to 9, see :mod:`crowdflower.compress`.
+                     Responses are always compressed, if the server
+                     supports it.
+    :type compress: bool or int
     """
 
     API_URL = 'https://api.crowdflower.com/v1/{path}'
 
-    def __init__(self, key):
+    DEFAULT_TIMEOUT = (10, 60)
+
+    #: Factory of the :class:`~.coalesce.SingleFlight` used for coalescing
+    _single_flight_factory = SingleFlight
+
+    def __init__(self, key, session=None, pool_connections=10,
+                 pool_maxsize=10, pool_block=False, keep_alive=True,
+                 rate_limit=None, burst=None, retries=3,
+                 timeout=DEFAULT_TIMEOUT, deadline=None, hedge=None,
+                 cache=None, coalesce=False, codec=None, metrics=None,
+                 transport=None, compress=False):
+        # Only close what the client created
+        self._owns_transport = transport is None and session is None
+        if transport is None:
+            transport = RequestsTransport(session, pool_connections,
+                                          pool_maxsize, pool_block)
+
+        self._transport = transport
+        self._session = getattr(transport, 'session', None)
+
+        if not keep_alive:
+            transport.headers['Connection'] = 'close'
+
+        self._hedge_workers = pool_maxsize
+        self._init_client(key, rate_limit, burst, retries, timeout, deadline,
+                          hedge, cache, coalesce, codec, metrics, compress)
+
+    def _init_client(self, key, rate_limit, burst, retries, timeout,
+                     deadline, hedge, cache, coalesce, codec, metrics,
+                     compress):
+        """
+        Set up the options shared by blocking and asynchronous clients.
+        """
         self._key = key
+        self._init_policies(rate_limit, burst, retries, timeout, deadline,
+                            hedge)
+        self._hedge_executors = None
+        self._hedge_lock = threading.Lock()
+        if cache is True:
+            cache = ResponseCache()
+
+        elif cache is False:
+            cache = None
+
+        self._cache = cache
+        self._single_flight = self._single_flight_factory() if coalesce \
+            else None
+        self._codec = _make_codec(codec)
+        self._compress_level = compress_level(compress)
+        self._init_instrumentation(metrics)
         self.jobs = PathFactory(self, ('jobs',))
 
+    def _init_instrumentation(self, metrics):
+        if metrics is True:
+            metrics = Metrics()
+
+        elif metrics is False:
+            metrics = None
+
+        self._hooks = None
+        self._metrics = metrics
+        if metrics is not None:
+            self.add_hook('after', metrics.record)
+
+    def _init_policies(self, rate_limit, burst, retries, timeout, deadline,
+                       hedge):
+        if rate_limit is not None and not isinstance(rate_limit, TokenBucket):
+            rate_limit = TokenBucket(rate_limit, burst)
+
+        if not isinstance(retries, RetryPolicy):
+            retries = RetryPolicy(total=retries or 0)
+
+        if hedge is not None and not isinstance(hedge, HedgePolicy):
+            hedge = HedgePolicy(delay=hedge)
+
+        self._rate_limit = rate_limit
+        self._retry = retries
+        self._timeout = timeout
+        self._deadline = deadline
+        self._hedge = hedge
+
+    @property
+    def session(self):
+        """
+        The pooled :class:`requests.Session` used for all calls, or None if
+        not using a :class:`~.transport.RequestsTransport`.
+        """
+        return self._session
+
+    @property
+    def transport(self):
+        """
+        The :class:`~.transport.Transport` used for all calls.
+        """
+        return self._transport
+
+    @property
+    def cache(self):
+        """
+        The :class:`~.cache.ResponseCache` of this client, or None.
+        """
+        return self._cache
+
+    @property
+    def single_flight(self):
+        """
+        The :class:`~.coalesce.SingleFlight` coalescing calls of this
+        client, or None. Its ``coalesced`` counter tells how many calls
+        were saved.
+        """
+        return self._single_flight
+
+    @property
+    def metrics(self):
+        """
+        The :class:`~.metrics.Metrics` of this client, or None.
+        """
+        return self._metrics
+
+    def add_hook(self, when, hook):
+        """
+        Add instrumentation ``hook``, called with
+        a :class:`~.metrics.RequestInfo` ``'before'`` or ``'after'`` each
+        call, as given by ``when``. Hooks are called in the calling thread
+        and should be fast.
+
+        :raises ValueError: if ``when`` is invalid
+        """
+        if when not in {'before', 'after'}:
+            raise ValueError("invalid hook event '{}'".format(when))
+
+        if self._hooks is None:
+            self._hooks = Hooks()
+
+        getattr(self._hooks, when).append(hook)
+
+    def remove_hook(self, when, hook):
+        """
+        Remove instrumentation ``hook`` added with :meth:`add_hook`.
+
+        :raises ValueError: if the hook has not been added
+        """
+        if self._hooks is None or when not in {'before', 'after'}:
+            raise ValueError("hook not found")
+
+        getattr(self._hooks, when).remove(hook)
+        if not self._hooks:
+            # No hooks, no overhead
+            self._hooks = None
+
+    def close(self):
+        """
+        Close the underlying session and release pooled connections. A
+        session or transport given by the caller is left open.
+        """
+        with self._hedge_lock:
+            executors, self._hedge_executors = self._hedge_executors, None
+
+        for executor in executors or ():
+            executor.shutdown(wait=True)
+
+        if self._owns_transport:
+            self._transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def call(self, path,
              data=None,
              headers={},
              query={},
              method='get',
              files=None,
-             as_json=True):
+             as_json=True,
+             stream=False,
+             timeout=None,
+             deadline=None):
         """
         Data may be str (unicode) or bytes. Unicode strings will be
         encoded to UTF-8 bytes.
@@ -120,9 +505,44 @@ class Client(object):
         :type files: dict
         :param as_json: Handle response as json, defaults to True
         :type as_json: bool
+        :param stream: Do not download the response body immediately, only
+                       meaningful with ``as_json=False``. The caller must
+                       close the response.
+        :type stream: bool
+        :param timeout: Connect and read timeouts, overrides the client
+                        default
+        :type timeout: float or tuple
+        :param deadline: Overall deadline in seconds, including retries,
+                         overrides the client default
+        :type deadline: float
         :returns: JSON dictionary
         :rtype: dict
         """
+        key = self._coalesce_key(path, data, headers, query, method, files,
+                                 as_json, stream)
+        if key is not None:
+            return self._single_flight.do(key, lambda: self._call(
+                path, data, headers, query, method, files, as_json, stream,
+                timeout, deadline))
+
+        return self._call(path, data, headers, query, method, files, as_json,
+                          stream, timeout, deadline)
+
+    def _coalesce_key(self, path, data, headers, query, method, files,
+                      as_json, stream):
+        """
+        Key identifying equal coalescable calls, or None if the call must
+        not be coalesced.
+        """
+        if self._single_flight is None or method != 'get' or data or \
+                files or not as_json or stream:
+            return None
+
+        return (path, urlencode(sorted(query.items()), doseq=True),
+                tuple(sorted(headers.items())))
+
+    def _call(self, path, data, headers, query, method, files, as_json,
+              stream, timeout, deadline):
         if data and isinstance(data, six.text_type):
             data = data.encode('utf-8')
 
@@ -130,17 +550,45 @@ class Client(object):
             method = 'post'
 
         url = self.API_URL.format(path=path)
+        headers = dict(accept='application/json', **headers)
+        cache_key = None
+        cached = None
+
+        if self._cache is not None and method == 'get' and as_json:
+            cache_key = (path, urlencode(sorted(query.items()), doseq=True))
+            cached = self._cache.get(cache_key)
+
+            if cached is not None:
+                if cached.etag:
+                    headers['If-None-Match'] = cached.etag
+
+                if cached.last_modified:
+                    headers['If-Modified-Since'] = cached.last_modified
+
+        # Read once, hooks may be removed concurrently
+        hooks = self._hooks
+        info = None
+        if hooks is not None:
+            info = hooks.start(method, path, None if files else data)
+
         resp = None
         try:
-            resp = requests.request(
+            resp = self._send(
                 method=method,
                 url=url,
                 params=dict(key=self._key, **query),
                 data=data,
-                headers=dict(accept='application/json', **headers),
-                files=files
+                headers=headers,
+                files=files,
+                stream=stream,
+                timeout=timeout or self._timeout,
+                deadline=deadline or self._deadline,
+                info=info
             )
 
+            if info is not None:
+                _received(info, resp, stream, data)
+
             # Raise an exception, if server responded with 50x or so
             resp.raise_for_status()
 
@@ -148,32 +596,229 @@ class Client(object):
                 # Caller knows what to do, hopefully
                 return resp
 
-            resp_json = resp.json()
+            if cached is not None and resp.status_code == 304:
+                content = cached.content
 
-            if 'error' in resp_json:
-                raise RuntimeError(resp_json['error'])
+            else:
+                content = resp.content
+
+            if info is None:
+                resp_json = self._codec.loads(content)
+
+            else:
+                start = _clock()
+                resp_json = self._codec.loads(content)
+                info.decode_time = _clock() - start
 
-            elif 'errors' in resp_json:
-                raise RuntimeError(*resp_json['errors'])
+            self._check_errors(resp_json)
 
         except Exception as e:
             # Wrap all exceptions as ApiErrors, python 3 has the benefit of
             # chained exceptions that allow inspecting the true reason through
             # __context__ property.
-            raise ApiError(
-                # This is rather spammy, but nice when hacking around in shell
-                "CrowdFlower API {method} request to {url} failed: {error}\n"
-                "Response: {resp}".format(
-                    url=url,
-                    error=e,
-                    method=method.upper(),
-                    resp=getattr(resp, 'text', None)),
-                resp,
-                getattr(resp, 'request', None)
-            )
+            error = _api_error(e, method, url, resp,
+                               getattr(resp, 'text', None),
+                               getattr(resp, 'request', None))
+            if info is not None:
+                info.error = error
+
+            raise error
+
+        finally:
+            if self._cache is not None and method != 'get':
+                # Changes may affect the resource and related resources,
+                # whether the request succeeded or not
+                self._cache.invalidate(path)
+
+            if info is not None:
+                if info.latency is None:
+                    info.latency = _clock() - info.start
+
+                hooks.finish(info)
+
+        if cache_key is not None and resp.status_code == 200:
+            etag = resp.headers.get('ETag')
+            last_modified = resp.headers.get('Last-Modified')
+
+            # Responses that cannot be revalidated are not cached
+            if etag or last_modified:
+                self._cache.set(cache_key, resp.content, etag, last_modified)
+
+        elif cached is not None and resp.status_code == 304:
+            # Still fresh, restart the TTL with the latest validators
+            self._cache.set(
+                cache_key, cached.content,
+                resp.headers.get('ETag') or cached.etag,
+                resp.headers.get('Last-Modified') or cached.last_modified)
 
         return resp_json
 
+    def _send(self, method, url, data=None, files=None, timeout=None,
+              deadline=None, info=None, **kwgs):
+        """
+        Send a request through the session, applying the rate limit, retry
+        policy and ``deadline``. Returns the final response, which may still
+        be an error response. Retries are counted in ``info``, if given.
+        """
+        replayable = files is None and _replayable(data)
+        attempt = 0
+        expires = None if deadline is None else _clock() + deadline
+
+        while True:
+            if info is not None:
+                info.retries = attempt
+
+            if self._rate_limit is not None:
+                self._rate_limit.acquire()
+
+            if expires is not None:
+                timeout = _cap_timeout(timeout, expires - _clock())
+
+            try:
+                resp = self._request(method=method, url=url, data=data,
+                                     files=files, timeout=timeout, **kwgs)
+
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout) as e:
+                if not (replayable and
+                        self._retry.should_retry(attempt, method)):
+                    raise
+
+                delay = self._retry.backoff(attempt)
+                _log.debug("%s %s failed (%s), retrying in %.2fs",
+                           method.upper(), url, e, delay)
+
+            else:
+                if not (replayable and self._retry.should_retry(
+                        attempt, method, resp.status_code)):
+                    return resp
+
+                delay = self._retry.backoff(attempt, parse_retry_after(
+                    resp.headers.get('Retry-After')))
+                resp.close()
+                _log.debug("%s %s responded %d, retrying in %.2fs",
+                           method.upper(), url, resp.status_code, delay)
+
+                if resp.status_code == 429 and self._rate_limit is not None:
+                    # Throttle all users of the client, the wait happens
+                    # when acquiring the next token.
+                    self._rate_limit.penalize(delay)
+                    delay = 0
+
+            if expires is not None and _clock() + delay >= expires:
+                raise DeadlineExceeded(
+                    "deadline of {}s exceeded after {} attempts".format(
+                        deadline, attempt + 1))
+
+            if delay:
+                time.sleep(delay)
+
+            attempt += 1
+
+    def _request(self, method, **kwgs):
+        """
+        Send a single request, hedged if the hedging policy applies.
+        """
+        hedge = self._hedge
+
+        if hedge is None or method.lower() not in hedge.methods or \
+                kwgs.get('stream'):
+            return self._timed_request(method, **kwgs)
+
+        delay = hedge.delay()
+        if delay is None:
+            return self._timed_request(method, **kwgs)
+
+        primaries, duplicates = self._hedge_pools()
+        started = threading.Event()
+
+        def primary():
+            started.set()
+            return self._timed_request(method, **kwgs)
+
+        futures = [primaries.submit(primary)]
+        # Time spent queueing for a thread is not the server being slow
+        started.wait()
+        done, _ = wait(futures, timeout=delay)
+
+        # Duplicates count against the rate limit, but never wait for it
+        if not done and (self._rate_limit is None or
+                         self._rate_limit.try_acquire()):
+            hedge.record_hedged()
+            futures.append(duplicates.submit(self._timed_request, method,
+                                             **kwgs))
+
+        error = None
+        for future in as_completed(futures):
+            try:
+                resp = future.result()
+
+            except Exception as e:
+                error = error or e
+                continue
+
+            if future is not futures[0]:
+                hedge.record_won()
+
+            for other in futures:
+                if other is not future:
+                    other.add_done_callback(_close_response)
+
+            return resp
+
+        raise error
+
+    def _hedge_pools(self):
+        """
+        Thread pools for hedged requests and their duplicates, created on
+        first use.
+        """
+        with self._hedge_lock:
+            if self._hedge_executors is None:
+                # Duplicates have their own threads, so that they do not
+                # queue behind the requests they are racing
+                self._hedge_executors = (
+                    ThreadPoolExecutor(self._hedge_workers),
+                    ThreadPoolExecutor(self._hedge_workers))
+
+            return self._hedge_executors
+
+    def _timed_request(self, method, **kwgs):
+        start = _clock()
+        resp = self._transport.request(method=method, **kwgs)
+
+        if self._hedge is not None:
+            self._hedge.record(_clock() - start)
+
+        return resp
+
+    @staticmethod
+    def _check_errors(resp_json):
+        """
+        Raise errors reported in an otherwise successful response.
+        """
+        if 'error' in resp_json:
+            raise RuntimeError(resp_json['error'])
+
+        elif 'errors' in resp_json:
+            raise RuntimeError(*resp_json['errors'])
+
+    # Hooks that allow models to work with both blocking and asynchronous
+    # clients. The blocking client simply applies callbacks to results,
+    # :class:`~.aio.AsyncClient` returns awaitables.
+
+    def _then(self, result, callback):
+        return callback(result)
+
+    def _collect(self, iterable):
+        return list(iterable)
+
+    def _gather(self, results):
+        return list(results)
+
+    def _resolved(self, value):
+        return value
+
     def paged_call(self, *args, **kwgs):
         """
         Generate paged calls to API end points, wraps :meth:`_call`. Provide
@@ -186,23 +831,87 @@ class Client(object):
         :keyword page: Page to start at, defaults to 1.
         :keyword limit: Limit pages to ``limit`` items, defaults to 100.
         :keyword sentinel: Sentinel value for ``iter()``.
+        :keyword concurrency: Fetch a window of ``concurrency`` pages at
+                              once. Pages are still yielded in order, and
+                              no more pages are requested after a page
+                              equal to ``sentinel`` or shorter than
+                              ``limit`` has been seen. Keep it at or below
+                              the client's ``pool_maxsize``.
         """
         page = kwgs.pop('page', 1)
         limit = kwgs.pop('limit', 100)
         sentinel = kwgs.pop('sentinel', None)
         query = kwgs.pop('query', {})
-        page = count(page)
+        concurrency = kwgs.pop('concurrency', None)
 
-        for response in iter(
-            lambda: self.call(
+        def fetch(page):
+            return self.call(
                 *args,
-                query=dict(query, page=next(page), limit=limit),
+                query=dict(query, page=page, limit=limit),
                 **kwgs
-            ),
-            sentinel
-        ):
+            )
+
+        if concurrency and concurrency > 1:
+            for response in self._concurrent_pages(
+                    fetch, page, limit, sentinel, concurrency):
+                yield response
+
+            return
+
+        page = count(page)
+
+        for response in iter(lambda: fetch(next(page)), sentinel):
             yield response
 
+    @staticmethod
+    def _concurrent_pages(fetch, page, limit, sentinel, concurrency):
+        """
+        Fetch pages starting from ``page`` using a sliding window of
+        ``concurrency`` requests in flight and generate responses in page
+        order.
+        """
+        # The first page known to be the last one, shared with workers
+        last_page = [None]
+
+        def fetch_page(page):
+            response = fetch(page)
+            if response == sentinel or len(response) < limit:
+                if last_page[0] is None or page < last_page[0]:
+                    last_page[0] = page
+
+            return response
+
+        pages = count(page)
+        window = deque()
+
+        def schedule():
+            page = next(pages)
+            if last_page[0] is None or page <= last_page[0]:
+                window.append(executor.submit(fetch_page, page))
+
+        executor = ThreadPoolExecutor(concurrency)
+        try:
+            for _ in range(concurrency):
+                schedule()
+
+            while window:
+                response = window.popleft().result()
+                if response == sentinel:
+                    break
+
+                yield response
+
+                if len(response) < limit:
+                    break
+
+                schedule()
+
+        finally:
+            for future in window:
+                future.cancel()
+
+            executor.shutdown(wait=True)
+
     def _recursive_items(self, dict_, path=()):
         """
         Recursive generator for producing a flat list from nested dictionaries.
@@ -302,21 +1011,71 @@ class Client(object):
         """
         return Job(client=self, **self.jobs[job_id]())
 
-    def get_jobs(self):
+    def get_jobs(self, concurrency=None):
         """
         Get Jobs connected to this client and key.
 
+        :param concurrency: Number of pages to fetch concurrently, see
+                            :meth:`paged_call`
+        :type concurrency: int
         :returns: an iterator of CrowdFlower jobs
         :rtype: iter of crowdflower.job.Job
         """
-        for resp in self.jobs.pages(sentinel=[]):
+        for resp in self.jobs.pages(sentinel=[], concurrency=concurrency):
             for data in resp:
                 yield Job(client=self, **data)
 
+    def bulk(self, jobs, concurrency=10):
+        """
+        Run commands across many ``jobs`` with bounded concurrency, for
+        example ``client.bulk(jobs).pause()``. Results and exceptions are
+        collected per job.
+
+        :param jobs: Iterable of :class:`~.job.Job` instances or job ids
+        :param concurrency: Maximum number of concurrent requests
+        :type concurrency: int
+        :rtype: crowdflower.bulk.BulkJobs
+        """
+        return BulkJobs(self._bulk_jobs(jobs), concurrency)
+
+    def bulk_workers(self, actions, concurrency=10, journal=None,
+                     retry_unknown=False):
+        """
+        Run :class:`~.worker.Worker` actions, such as bonuses or
+        notifications, ``concurrency`` at a time. Resumable with
+        a :class:`~.bulk.Journal`, see :class:`~.bulk.BulkWorkerActions`.
+
+        :param actions: Iterable of ``(worker, action, args)``
+        :param concurrency: Maximum number of concurrent requests
+        :type concurrency: int
+        :param journal: Journal of action states, or its path
+        :type journal: crowdflower.bulk.Journal or str
+        :param retry_unknown: Send actions in unknown state again
+        :type retry_unknown: bool
+        :returns: list of :class:`~.bulk.ActionResult` in the order of
+                  actions
+        """
+        if isinstance(journal, six.string_types):
+            with Journal(journal) as journal:
+                return self.bulk_workers(actions, concurrency, journal,
+                                         retry_unknown)
+
+        return BulkWorkerActions(actions, concurrency, journal,
+                                 retry_unknown).run()
+
+    def _bulk_jobs(self, jobs):
+        return [job if isinstance(job, Job) else Job(client=self, id=job)
+                for job in jobs]
+
     def _upload_job(self, data, type_, job_id, force=False):
         headers = {'Content-Type': type_}
         path = self.jobs
 
+        if self._compress_level is not None:
+            data = GzipBody(data, self._compress_level,
+                            self.UPLOAD_CHUNK_SIZE)
+            headers['Content-Encoding'] = 'gzip'
+
         if job_id is not None:
             path = path[job_id]
 
@@ -328,9 +1087,40 @@ class Client(object):
                    query=dict(force='true') if force else {})
         )
 
-    def upload_job(self, data, job_id=None, force=False):
+    #: Approximate size of body chunks produced when streaming uploads
+    UPLOAD_CHUNK_SIZE = 64 * 1024
+
+    def _iter_json_lines(self, data):
         """
-        Upload given data as JSON.
+        Encode ``data`` as newline delimited JSON, generating byte chunks of
+        roughly :attr:`UPLOAD_CHUNK_SIZE` bytes.
+        """
+        chunk = []
+        size = 0
+        for obj in data:
+            line = self._codec.dumps(obj) + b'\n'
+            chunk.append(line)
+            size += len(line)
+            if size >= self.UPLOAD_CHUNK_SIZE:
+                yield b''.join(chunk)
+                chunk = []
+                size = 0
+
+        if chunk:
+            yield b''.join(chunk)
+
+    def upload_job(self, data, job_id=None, force=False, batch_size=None,
+                   concurrency=None):
+        """
+        Upload given data as JSON. The data is consumed lazily and streamed
+        to the server as newline delimited JSON, so ``data`` may well be
+        a generator producing millions of rows.
+
+        If ``batch_size`` is given, the data is split to multiple uploads of
+        at most ``batch_size`` rows, sent ``concurrency`` at a time. When no
+        ``job_id`` is given, the first batch creates the job and the rest
+        are added to it. Returns a list of per batch results in order, where
+        failed batches are represented by their :exc:`ApiError`.
 
         :param data: Iterable of JSON serializable objects
         :type data: collections.abc.Iterable
@@ -339,15 +1129,41 @@ class Client(object):
         :param force: If True force adding units even if the columns do not
                       match existing data
         :type force: bool
-        :returns: crowdflower.job.Job instance
-        :rtype: crowdflower.job.Job
+        :param batch_size: Maximum number of rows per upload request
+        :type batch_size: int
+        :param concurrency: Number of batches to upload concurrently
+        :type concurrency: int
+        :returns: crowdflower.job.Job instance, or a list of
+                  crowdflower.job.Job or ApiError instances, if
+                  ``batch_size`` is given
+        :rtype: crowdflower.job.Job or list
         """
-        return self._upload_job(
-            '\n'.join(map(json.dumps, data)).encode('utf-8'),
-            'application/json',
-            job_id,
-            force=force
-        )
+        if batch_size is None:
+            return self._upload_job(
+                self._iter_json_lines(data),
+                'application/json',
+                job_id,
+                force=force
+            )
+
+        data = iter(data)
+        batches = iter(lambda: list(islice(data, batch_size)), [])
+        results = []
+
+        if job_id is None:
+            # The job must exist before the rest can be uploaded in parallel
+            for batch in islice(batches, 1):
+                job = self.upload_job(batch, force=force)
+                job_id = job.id
+                results.append(job)
+
+        results.extend(bounded_map(
+            lambda batch: self.upload_job(batch, job_id, force=force),
+            batches,
+            concurrency,
+            return_exceptions=True
+        ))
+        return results
 
     def upload_job_file(self, file, type_=None, job_id=None, force=False):
         """
@@ -358,6 +1174,9 @@ class Client(object):
         guess from. If file like object provides text (unicode) data, it
         will be encoded to UTF-8 bytes.
 
+        The file is streamed from its current position and never read to
+        memory as a whole; real files on disk are memory mapped.
+
         If explicit ``type_`` is not provided and the ``file`` is a string
         containing a filename to open, will make a guess with mimetypes.
         Returns a new Job instance related to the uploaded data.
@@ -392,18 +1211,55 @@ class Client(object):
         if type_ is None:
             raise ValueError("Type not set or could not guess type")
 
-        with context(file) as fp:
-            return self._upload_job(fp.read(), type_, job_id, force=force)
+        with context(file) as fp, self._file_body(fp) as body:
+            return self._upload_job(body, type_, job_id, force=force)
+
+    @contextlib.contextmanager
+    def _file_body(self, fp):
+        """
+        Provide an upload body for file like object ``fp`` without reading
+        it to memory. Real files are memory mapped and sent as a zero-copy
+        view with known length, other binary file objects are streamed by
+        :mod:`requests` directly and text is encoded incrementally.
+        """
+        if isinstance(fp.read(0), six.text_type):
+            yield (chunk.encode('utf-8') for chunk in
+                   iter(lambda: fp.read(self.UPLOAD_CHUNK_SIZE), u''))
+            return
+
+        try:
+            position = fp.tell()
+            view = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+        except (AttributeError, EnvironmentError, ValueError,
+                io.UnsupportedOperation):
+            # Not a real file, a pipe or an empty file, which mmap refuses
+            yield fp
+            return
+
+        try:
+            body = memoryview(view)[position:]
+            try:
+                yield body
+
+            finally:
+                body.release()
+
+        finally:
+            view.close()
 
     def delete_job(self, job_id):
         """
         Delete job ``job_id`` from CrowdFlower.
         """
-        self.jobs[job_id](method='delete')
+        return self.jobs[job_id](method='delete')
 
-    def get_judgmentaggregates(self, job):
+    def get_judgmentaggregates(self, job, concurrency=None, compact=False):
         """
-        Get JudgmentAggregates for ``job``.
+        Get JudgmentAggregates for ``job``. Pages are fetched ``concurrency``
+        at a time, if given, see :meth:`paged_call`. If ``compact`` is true,
+        generates memory efficient
+        :class:`~crowdflower.judgment.CompactJudgmentAggregate` instances.
 
         .. note::
 
@@ -412,9 +1268,15 @@ class Client(object):
            aggregate lacks documentation at https://crowdflower.com/docs-api ,
            so this code is very very likely to break in the future.
         """
-        for resp in self.jobs[job.id].judgments.pages(sentinel={}):
-            for data in resp.values():
-                yield JudgmentAggregate(job, client=self, **data)
+        for resp in self.jobs[job.id].judgments.pages(
+                sentinel={}, concurrency=concurrency):
+            if compact:
+                for data in resp.values():
+                    yield CompactJudgmentAggregate.from_json(job, data)
+
+            else:
+                for data in resp.values():
+                    yield JudgmentAggregate(job, client=self, **data)
 
     def get_judgment(self, job, judgment_id):
         """
@@ -426,6 +1288,34 @@ class Client(object):
             **self.jobs[job.id].judgments[judgment_id]()
         )
 
+    def resolve_judgments(self, job, aggregates, concurrency=10):
+        """
+        Fetch the :class:`Judgments <crowdflower.judgment.Judgment>` of many
+        :class:`JudgmentAggregates <crowdflower.judgment.JudgmentAggregate>`
+        in bulk. Judgment ids are collected from all aggregates not yet
+        holding their judgments, deduplicated and fetched ``concurrency`` at
+        a time. Each aggregate's :attr:`judgments
+        <crowdflower.judgment.JudgmentAggregate.judgments>` is then filled
+        in at once.
+
+        :param aggregates: Iterable of judgment aggregates
+        :param concurrency: Maximum number of concurrent requests
+        :type concurrency: int
+        :returns: list of the aggregates
+        :rtype: list of crowdflower.judgment.JudgmentAggregate
+        """
+        aggregates = list(aggregates)
+        pending = [a for a in aggregates if not hasattr(a, '_judgments')]
+        ids = list(OrderedDict.fromkeys(
+            id_ for aggregate in pending for id_ in aggregate.ids))
+        judgments = dict(zip(ids, bounded_map(
+            lambda id_: self.get_judgment(job, id_), ids, concurrency)))
+
+        for aggregate in pending:
+            aggregate._judgments = [judgments[id_] for id_ in aggregate.ids]
+
+        return aggregates
+
     def get_unit(self, job, unit_id):
         """
         Get :class:`~.unit.Unit` ``unit_id`` for :class:`~.job.Job`.
@@ -435,15 +1325,40 @@ class Client(object):
             **self.jobs[job.id].units[unit_id]()
         )
 
-    def get_units(self, job):
+    def get_units(self, job, concurrency=None):
         """
         Get :class:`unit promises <crowdflower.unit.UnitPromise>`
-        for :class:`~.job.Job`.
+        for :class:`~.job.Job`. Pages are fetched ``concurrency`` at a time,
+        if given, see :meth:`paged_call`.
         """
-        for resp in self.jobs[job.id].units.pages(sentinel={}):
+        for resp in self.jobs[job.id].units.pages(
+                sentinel={}, concurrency=concurrency):
             for unit_id, data in resp.items():
                 yield UnitPromise(job, client=self, id=unit_id, data=data)
 
+    def resolve_units(self, job, promises, concurrency=10):
+        """
+        Resolve :class:`unit promises <crowdflower.unit.UnitPromise>` of
+        :class:`~.job.Job` in bulk, fetching the underlying units
+        ``concurrency`` at a time. Already resolved promises are not fetched
+        again.
+
+        :param promises: Iterable of unit promises
+        :param concurrency: Maximum number of concurrent requests
+        :type concurrency: int
+        :returns: list of resolved units in the order of ``promises``
+        :rtype: list of crowdflower.unit.Unit
+        """
+        promises = list(promises)
+        pending = [p for p in promises if p._object is None]
+
+        for promise, unit in zip(pending, bounded_map(
+                lambda promise: self.get_unit(job, promise.id),
+                pending, concurrency)):
+            promise._object = unit
+
+        return [p._object for p in promises]
+
     def unit_from_json(self, data):
         """
         Create a new Unit instance from JSON ``data``.
@@ -529,30 +1444,64 @@ class Client(object):
             **self.jobs[job.id].orders[order_id]()
         )
 
-    def get_report(self, job, type_='json'):
+    def get_report(self, job, type_='json', compact=False):
         """
         Download and uncompress reports. Returns a list of
-        :py:class:`Units <crowdflower.unit.Unit>`.
+        :py:class:`Units <crowdflower.unit.Unit>`. See :meth:`iter_report`
+        for processing large reports.
+        """
+        return list(self.iter_report(job, type_=type_, compact=compact))
+
+    #: Reports smaller than this are spooled in memory instead of a
+    #: temporary file on disk.
+    REPORT_SPOOL_SIZE = 16 * 1024 * 1024
+    REPORT_CHUNK_SIZE = 64 * 1024
+
+    def iter_report(self, job, type_='json', compact=False):
+        """
+        Download and uncompress reports lazily. The report is streamed to a
+        spooled temporary file and the archived JSON lines are parsed one by
+        one, so memory use does not depend on the size of the report.
+
+        :param compact: Generate memory efficient
+                        :class:`~crowdflower.unit.CompactUnit` instances
+                        sharing ``job``
+        :type compact: bool
+        :returns: an iterator of :py:class:`Units <crowdflower.unit.Unit>`
         """
         resp = self.jobs[job.id](
             _suffix='.csv',
             as_json=False,
+            stream=True,
             query=dict(type=type_),
         )
-        # The response content is a ZipFile (at least it should be)
-        with ZipFile(six.io.BytesIO(resp.content)) as zf:
-            return [
-                Unit(job, client=self, **u)
-                for u in map(json.loads, chain.from_iterable(
-                    map(
-                        lambda bs: (
-                            line for line in bs.decode('utf-8').split('\n')
-                            if line
-                        ),
-                        map(zf.read, zf.namelist())
-                    )
-                ))
-            ]
+
+        with tempfile.SpooledTemporaryFile(
+                max_size=self.REPORT_SPOOL_SIZE) as fp:
+            with contextlib.closing(resp):
+                for chunk in resp.iter_content(self.REPORT_CHUNK_SIZE):
+                    fp.write(chunk)
+
+            fp.seek(0)
+            # The response content is a ZipFile (at least it should be)
+            for unit in self._iter_report_units(job, fp, compact):
+                yield unit
+
+    def _iter_report_units(self, job, file, compact=False):
+        if compact:
+            make_unit = functools.partial(CompactUnit.from_json, job)
+
+        else:
+            make_unit = lambda data: Unit(job, client=self, **data)
+
+        with ZipFile(file) as zf:
+            for name in zf.namelist():
+                with zf.open(name) as member:
+                    # Members are read line by line as bytes
+                    for line in member:
+                        line = line.strip()
+                        if line:
+                            yield make_unit(self._codec.loads(line))
 
     def get_job_tags(self, job_id):
         """
@@ -564,23 +1513,23 @@ class Client(object):
         """
         Add tag to job.
         """
-        self.jobs[job_id].tags(_suffix=None, data=dict(tags=tag))
+        return self.jobs[job_id].tags(_suffix=None, data=dict(tags=tag))
 
     def set_job_tags(self, job_id, tags):
         """
         Set tags for job.
         """
-        self.jobs[job_id].tags(_suffix=None, data=dict(tags=', '.join(tags)),
-                               method='put')
+        return self.jobs[job_id].tags(
+            _suffix=None, data=dict(tags=', '.join(tags)), method='put')
 
     def convert_job_test_questions(self, job_id):
         """
         Convert uploaded gold to test questions.
         """
-        self.jobs[job_id].gold(_suffix=None, method='put')
+        return self.jobs[job_id].gold(_suffix=None, method='put')
 
     def cancel_unit(self, job_id, unit_id):
         """
         Cancel unit.
         """
-        self.jobs[job_id].units[unit_id].cancel(method='post')
+        return self.jobs[job_id].units[unit_id].cancel(method='post')
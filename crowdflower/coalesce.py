@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+In-flight request coalescing. Concurrent identical calls share a single
+request and its result.
+"""
+from __future__ import print_function, division, absolute_import
+import threading
+
+__author__ = u'Ilja Everilä <ilja.everila@liilak.com>'
+
+
+class _Call(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Coalesce concurrent calls with equal keys in threaded code: the first
+    caller runs the call, later callers arriving before it completes wait
+    for and receive the same result, or exception.
+    """
+
+    def __init__(self):
+        #: Number of calls actually made
+        self.calls = 0
+        #: Number of calls saved by joining a call in flight
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def stats(self):
+        """
+        Counters as a dictionary.
+        """
+        return dict(calls=self.calls, coalesced=self.coalesced)
+
+    def do(self, key, fn):
+        """
+        Call ``fn`` unless a call with ``key`` is already in flight, in
+        which case wait for its result instead.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+
+        except Exception as e:
+            call.error = e
+            raise
+
+        except BaseException as e:
+            # Do not hand KeyboardInterrupt and such to other threads, but
+            # do not let them see a result either
+            call.error = RuntimeError(
+                "coalesced call aborted: {!r}".format(e))
+            raise
+
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+            call.done.set()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Pluggable JSON codecs. The fastest installed codec is used by default:
+
+- `orjson <https://pypi.org/project/orjson/>`_
+- `pysimdjson <https://pypi.org/project/pysimdjson/>`_ (decoding only)
+- `ujson <https://pypi.org/project/ujson/>`_
+- :mod:`json` from the standard library
+
+Codecs decode UTF-8 bytes directly, without decoding to str first, where
+the underlying library allows it.
+"""
+from __future__ import print_function, division, absolute_import
+from collections import OrderedDict
+import json
+
+__author__ = u'Ilja Everilä <ilja.everila@liilak.com>'
+
+
+class JsonCodec(object):
+    """
+    JSON codec using :mod:`json` from the standard library.
+    """
+
+    name = 'json'
+
+    def loads(self, data):
+        """
+        Decode JSON ``data``, given as UTF-8 bytes or str.
+        """
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+
+        return json.loads(data)
+
+    def dumps(self, obj):
+        """
+        Encode ``obj`` as UTF-8 JSON bytes.
+        """
+        return json.dumps(obj).encode('utf-8')
+
+
+class OrjsonCodec(JsonCodec):
+    """
+    JSON codec using :mod:`orjson`.
+    """
+
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self.loads = orjson.loads
+        self._dumps = orjson.dumps
+        # Match the standard library in accepting non str keys
+        self._option = orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj):
+        return self._dumps(obj, option=self._option)
+
+
+class SimdjsonCodec(JsonCodec):
+    """
+    JSON codec decoding with :mod:`simdjson`, encoding with the standard
+    library.
+    """
+
+    name = 'simdjson'
+
+    def __init__(self):
+        import simdjson
+        self.loads = simdjson.loads
+
+
+class UjsonCodec(JsonCodec):
+    """
+    JSON codec using :mod:`ujson`.
+    """
+
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self.loads = ujson.loads
+        self._dumps = ujson.dumps
+
+    def dumps(self, obj):
+        return self._dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+#: Available codecs in order of preference
+CODECS = OrderedDict((codec.name, codec) for codec in (
+    OrjsonCodec, SimdjsonCodec, UjsonCodec, JsonCodec))
+
+
+def get_codec(name=None):
+    """
+    Get an instance of codec ``name``, or the fastest installed codec, if
+    ``name`` is None.
+
+    :raises ValueError: if the codec is unknown or not installed
+    """
+    if name is not None:
+        try:
+            return CODECS[name]()
+
+        except KeyError:
+            raise ValueError("unknown codec '{}'".format(name))
+
+        except ImportError:
+            raise ValueError("codec '{}' is not installed".format(name))
+
+    for codec in CODECS.values():
+        try:
+            return codec()
+
+        except ImportError:
+            pass
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Gzip compression of request bodies, sent with ``Content-Encoding: gzip``.
+
+Upload bodies are compressed lazily while they are streamed, so that
+compression overlaps with producing and sending the data and the
+uncompressed body is never held in memory as a whole. Responses are
+negotiated with ``Accept-Encoding`` and decompressed incrementally by the
+transports.
+
+.. code-block:: python
+
+   >>> client = Client('yourapikey', compress=True)
+   >>> client.upload_job(rows)
+
+"""
+from __future__ import print_function, division, absolute_import
+import zlib
+import six
+
+__author__ = u'Ilja Everilä <ilja.everila@liilak.com>'
+
+#: Compression level used by ``compress=True``, a good tradeoff between
+#: speed and size for JSON
+DEFAULT_LEVEL = 6
+
+# Window bits producing a gzip header and trailer instead of zlib
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def compress_level(compress):
+    """
+    Compression level from a ``compress`` option: True for
+    :data:`DEFAULT_LEVEL`, a level from 1 to 9, or False or None for no
+    compression, returned as None.
+    """
+    if compress is None or compress is False:
+        return None
+
+    if compress is True:
+        return DEFAULT_LEVEL
+
+    if not 0 < compress <= 9:
+        raise ValueError(
+            "invalid compression level {!r}, expected 1-9".format(compress))
+
+    return compress
+
+
+def gzip_bytes(data, level=DEFAULT_LEVEL):
+    """
+    Gzip compress ``data`` as a whole.
+    """
+    if isinstance(data, six.text_type):
+        data = data.encode('utf-8')
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, _GZIP_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class GzipBody(object):
+    """
+    Request body compressing ``body`` lazily as it is iterated over. The
+    ``body`` may be bytes, a memoryview, a binary file like object or an
+    iterable of byte chunks. Bodies of bytes and memoryviews can be
+    iterated over again, so requests sending them can be retried.
+
+    :param body: Uncompressed body
+    :param level: Compression level from 1 to 9
+    :param chunk_size: Size of uncompressed chunks read from files and
+                       memory
+    """
+
+    def __init__(self, body, level=DEFAULT_LEVEL, chunk_size=64 * 1024):
+        if isinstance(body, six.text_type):
+            body = body.encode('utf-8')
+
+        self.body = body
+        self.level = level
+        self.chunk_size = chunk_size
+        #: Uncompressed bytes consumed by the last iteration
+        self.bytes_in = 0
+        #: Compressed bytes produced by the last iteration
+        self.bytes_out = 0
+
+    @property
+    def replayable(self):
+        return isinstance(self.body, (bytes, bytearray, memoryview))
+
+    def _chunks(self):
+        body = self.body
+        size = self.chunk_size
+
+        if isinstance(body, (bytes, bytearray, memoryview)):
+            view = memoryview(body)
+            return (view[i:i + size] for i in range(0, len(view), size))
+
+        if hasattr(body, 'read'):
+            return iter(lambda: body.read(size), b'')
+
+        return iter(body)
+
+    def __iter__(self):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, _GZIP_WBITS)
+        self.bytes_in = self.bytes_out = 0
+
+        for chunk in self._chunks():
+            self.bytes_in += len(chunk)
+            # Buffered output of small chunks is empty, do not yield those
+            # as they would end a chunked body
+            compressed = compressor.compress(chunk)
+            if compressed:
+                self.bytes_out += len(compressed)
+                yield compressed
+
+        compressed = compressor.flush()
+        self.bytes_out += len(compressed)
+        yield compressed
@@ -138,19 +138,29 @@ class Job(Base):
                     "missing required attribute '{}'".format(attr))
 
         # calls Base.update, which calls _send_changes with changes dict
-        super(Job, self).update()
+        return super(Job, self).update()
 
-    def upload(self, data, force=False):
+    def upload(self, data, force=False, batch_size=None, concurrency=None):
         """
-        Upload given data as JSON.
+        Upload given data as JSON. See :meth:`Client.upload_job
+        <crowdflower.client.Client.upload_job>` for batched uploads.
 
         :param data: Iterable of JSON serializable objects
         :type data: collections.abc.Iterable
         :param force: If True force adding units even if the columns do not
                       match existing data
         :type force: bool
+        :param batch_size: Maximum number of rows per upload request
+        :type batch_size: int
+        :param concurrency: Number of batches to upload concurrently
+        :type concurrency: int
         """
-        self._client.upload_job(data, self.id, force=force)
+        if batch_size is None:
+            return self._client.upload_job(data, self.id, force=force)
+
+        return self._client.upload_job(data, self.id, force=force,
+                                       batch_size=batch_size,
+                                       concurrency=concurrency)
 
     def upload_file(self, file, type_=None, force=False):
         """
@@ -181,14 +191,14 @@ class Job(Base):
         :raises ValueError: if type information isn't provided and cannot
                             guess
         """
-        self._client.upload_job_file(file, type_, self.id, force=force)
+        return self._client.upload_job_file(file, type_, self.id, force=force)
 
     def delete(self):
         """
         Delete this job, removing it from CrowdFlower. Calling :class:`Job`
         instance will be invalid after deletion and must not be used anymore.
         """
-        self._client.delete_job(self.id)
+        return self._client.delete_job(self.id)
 
     @property
     def judgment_aggregates(self):
@@ -205,13 +215,39 @@ class Job(Base):
 
         """
         try:
-            return self._judgments_aggregates
+            return self._client._resolved(self._judgments_aggregates)
 
         except AttributeError:
             # noinspection PyAttributeOutsideInit
-            self._judgments_aggregates = list(
-                self._client.get_judgmentaggregates(self))
-            return self._judgments_aggregates
+            def cache(aggregates):
+                self._judgments_aggregates = aggregates
+                return aggregates
+
+            return self._client._then(
+                self._client._collect(
+                    self._client.get_judgmentaggregates(self)),
+                cache)
+
+    def resolve_judgments(self, aggregates=None, concurrency=10):
+        """
+        Fetch the :class:`Judgments <crowdflower.judgment.Judgment>` of
+        ``aggregates`` in parallel and fill in their :attr:`judgments
+        <crowdflower.judgment.JudgmentAggregate.judgments>`. Defaults to all
+        :attr:`judgment_aggregates` of this job.
+
+        :param aggregates: Iterable of
+                           :class:`~.judgment.JudgmentAggregate` instances
+        :param concurrency: Maximum number of concurrent requests
+        :type concurrency: int
+        :returns: list of crowdflower.judgment.JudgmentAggregate
+        """
+        if aggregates is None:
+            return self._client._then(
+                self.judgment_aggregates,
+                lambda aggregates: self._client.resolve_judgments(
+                    self, aggregates, concurrency))
+
+        return self._client.resolve_judgments(self, aggregates, concurrency)
 
     def get_judgment(self, judgment_id):
         """
@@ -234,8 +270,9 @@ class Job(Base):
         """
         List of enabled channels for this job.
         """
-        return self._client.get_job_channels(self.id).get(
-            'enabled_channels', [])
+        return self._client._then(
+            self._client.get_job_channels(self.id),
+            lambda channels: channels.get('enabled_channels', []))
 
     @channels.setter
     def channels(self, channels):
@@ -252,12 +289,36 @@ class Job(Base):
         List of :class:`~.unit.UnitPromise` instances of this :class:`Job`.
         """
         try:
-            return self._units
+            return self._client._resolved(self._units)
 
         except AttributeError:
             # noinspection PyAttributeOutsideInit
-            self._units = list(self._client.get_units(self))
-            return self._units
+            def cache(units):
+                self._units = units
+                return units
+
+            return self._client._then(
+                self._client._collect(self._client.get_units(self)),
+                cache)
+
+    def resolve_units(self, promises=None, concurrency=10):
+        """
+        Fetch the :class:`Units <crowdflower.unit.Unit>` behind ``promises``
+        in parallel, instead of one blocking request per promise on first
+        attribute access. Defaults to resolving all :attr:`units`.
+
+        :param promises: Iterable of :class:`~.unit.UnitPromise` instances
+        :param concurrency: Maximum number of concurrent requests
+        :type concurrency: int
+        :returns: list of crowdflower.unit.Unit
+        """
+        if promises is None:
+            return self._client._then(
+                self.units,
+                lambda units: self._client.resolve_units(self, units,
+                                                         concurrency))
+
+        return self._client.resolve_units(self, promises, concurrency)
 
     @_command
     def pause(self):
@@ -303,13 +364,29 @@ class Job(Base):
         """
         return self._client.debit_order(self, units_count, channels)
 
-    def get_results_report(self):
+    def get_results_report(self, compact=False):
         """
         Download and parse JSON report containing aggregates and
-        individual judgments as a list of :class:`Units <~.unit.Unit>`.
+        individual judgments as a list of
+        :class:`Units <crowdflower.unit.Unit>`. If ``compact`` is true, the
+        units are memory efficient :class:`~.unit.CompactUnit` instances.
+
         :returns: list of crowdflower.unit.Unit
         """
-        return self._client.get_report(self)
+        return self._client.get_report(self, compact=compact)
+
+    def iter_results_report(self, compact=False):
+        """
+        Download and parse JSON report lazily, generating
+        :class:`Units <crowdflower.unit.Unit>` one at a time with constant
+        memory use regardless of report size. If ``compact`` is true,
+        generates memory efficient :class:`~.unit.CompactUnit` instances.
+        With an :class:`~.aio.AsyncClient` returns an asynchronous
+        generator.
+
+        :returns: iterator of crowdflower.unit.Unit
+        """
+        return self._client.iter_report(self, compact=compact)
 
     # noinspection PyAttributeOutsideInit
     @property
@@ -318,12 +395,15 @@ class Job(Base):
         List of tags.
         """
         try:
-            return self._tags
+            return self._client._resolved(self._tags)
 
         except AttributeError:
-            self._tags = list(map(itemgetter('name'),
-                                  self._client.get_job_tags(self.id)))
-            return self._tags
+            def cache(tags):
+                self._tags = list(map(itemgetter('name'), tags))
+                return self._tags
+
+            return self._client._then(self._client.get_job_tags(self.id),
+                                      cache)
 
     # noinspection PyAttributeOutsideInit
     @tags.setter
@@ -339,15 +419,18 @@ class Job(Base):
         """
         Add tag.
         """
-        self._client.add_job_tag(self.id, tag)
-        try:
-            self._tags.append(tag)
+        def cache(_):
+            try:
+                self._tags.append(tag)
 
-        except AttributeError:
-            self._tags = [tag]
+            except AttributeError:
+                self._tags = [tag]
+
+        return self._client._then(self._client.add_job_tag(self.id, tag),
+                                  cache)
 
     def convert_test_questions(self):
         """
         Convert uploaded golden units to test questions.
         """
-        self._client.convert_job_test_questions(self.id)
+        return self._client.convert_job_test_questions(self.id)
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function, division, absolute_import
-from .base import Attribute, RoAttribute, JobResource
+from .base import Attribute, RoAttribute, JobResource, compact
 
 __author__ = u'Ilja Everilä <ilja.everila@liilak.com>'
 
@@ -53,13 +53,18 @@ class JudgmentAggregate(JobResource):
         List of :class:`Judgment` instances for this aggregate.
         """
         try:
-            return self._judgments
+            return self._client._resolved(self._judgments)
 
         except AttributeError:
             # noinspection PyAttributeOutsideInit
-            self._judgments = [self._client.get_judgment(self.job, id_)
-                               for id_ in self.ids]
-            return self._judgments
+            def cache(judgments):
+                self._judgments = judgments
+                return judgments
+
+            return self._client._then(
+                self._client._gather(self._client.get_judgment(self.job, id_)
+                                     for id_ in self.ids),
+                cache)
 
 
 class Judgment(JobResource):
@@ -99,3 +104,7 @@ class Judgment(JobResource):
     city = Attribute()
     golden = Attribute()
     unit_state = Attribute()
+
+
+CompactJudgmentAggregate = compact(JudgmentAggregate, slots=('_judgments',))
+CompactJudgment = compact(Judgment)
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""
+Request instrumentation: hooks called before and after each API call, and
+:class:`Metrics` collecting counters and histograms per endpoint template,
+such as ``jobs/{id}/units``.
+
+.. code-block:: python
+
+   >>> client = Client('yourapikey', metrics=True)
+   >>> units = list(job.units)
+   >>> print(client.metrics.to_prometheus())
+
+Instrumentation is disabled by default, which costs a single attribute
+check per call.
+"""
+from __future__ import print_function, division, absolute_import
+from bisect import bisect_left
+from collections import Counter
+from .ratelimit import _clock
+import logging
+import posixpath
+import re
+import threading
+
+__author__ = u'Ilja Everilä <ilja.everila@liilak.com>'
+
+_log = logging.getLogger(__name__)
+
+_ID = re.compile(r'(^|/)\d+(?=[/.]|$)')
+
+
+def endpoint_template(path):
+    """
+    Endpoint template of API ``path``, with ids replaced by ``{id}`` and
+    without a ``.json`` suffix. Other suffixes, such as that of reports,
+    are kept to tell the endpoints apart.
+
+    .. code-block:: python
+
+       >>> endpoint_template('jobs/123/units/456.json')
+       'jobs/{id}/units/{id}'
+       >>> endpoint_template('jobs/123.csv')
+       'jobs/{id}.csv'
+    """
+    root, ext = posixpath.splitext(path)
+    if ext != '.json':
+        root = path
+
+    return _ID.sub(r'\1{id}', root)
+
+
+class RequestInfo(object):
+    """
+    Information about a single API call, passed to instrumentation hooks.
+    Hooks called before the request see only :attr:`method`, :attr:`path`,
+    :attr:`endpoint`, :attr:`start` and :attr:`bytes_out`; the rest are
+    filled in when available.
+    """
+
+    __slots__ = ('method', 'path', 'endpoint', 'start', 'latency', 'elapsed',
+                 'status', 'bytes_out', 'bytes_in', 'wire_bytes_in', 'retries',
+                 'decode_time', 'error')
+
+    def __init__(self, method, path, bytes_out=None):
+        #: HTTP method, upper case
+        self.method = method.upper()
+        #: API path
+        self.path = path
+        #: Endpoint template of :attr:`path`
+        self.endpoint = endpoint_template(path)
+        self.start = _clock()
+        #: Seconds from sending the request, including retries, until the
+        #: final response was received
+        self.latency = None
+        #: Seconds from sending the final request until its response
+        #: headers were parsed, if known. The difference to
+        #: :attr:`latency` is time spent in connecting, retrying and
+        #: reading the body.
+        self.elapsed = None
+        #: HTTP status of the final response
+        self.status = None
+        #: Request body size, if known
+        self.bytes_out = bytes_out
+        #: Response body size, decompressed, if known
+        self.bytes_in = None
+        #: Response body size as received, compressed if the response
+        #: was, if known
+        self.wire_bytes_in = None
+        #: Number of retries
+        self.retries = 0
+        #: Seconds spent decoding JSON
+        self.decode_time = None
+        #: Exception raised by the call, if any
+        self.error = None
+
+
+def _body_size(data):
+    if data is None:
+        return 0
+
+    if isinstance(data, (bytes, bytearray)):
+        return len(data)
+
+    if isinstance(data, memoryview):
+        return data.nbytes
+
+    return None
+
+
+class Hooks(object):
+    """
+    Instrumentation hooks of a client. Exceptions raised by hooks are
+    logged and ignored, so that instrumentation cannot break calls.
+    """
+
+    def __init__(self):
+        #: Functions called with a :class:`RequestInfo` before each call
+        self.before = []
+        #: Functions called with a :class:`RequestInfo` after each call
+        self.after = []
+
+    def __bool__(self):
+        return bool(self.before or self.after)
+
+    __nonzero__ = __bool__
+
+    @staticmethod
+    def _run(hooks, info):
+        for hook in hooks:
+            try:
+                hook(info)
+
+            except Exception:
+                _log.exception("instrumentation hook %r failed", hook)
+
+    def start(self, method, path, data):
+        """
+        Create a :class:`RequestInfo` and run the before hooks.
+        """
+        info = RequestInfo(method, path, _body_size(data))
+        self._run(self.before, info)
+        return info
+
+    def finish(self, info):
+        """
+        Run the after hooks.
+        """
+        self._run(self.after, info)
+
+
+class Histogram(object):
+    """
+    Histogram with fixed bucket upper bounds.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        Pairs of upper bound and cumulative count, ending with infinity.
+        """
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+    def as_dict(self):
+        return dict(count=self.count, sum=self.sum,
+                    buckets=[[bound, count]
+                             for bound, count in self.cumulative()])
+
+
+class _EndpointMetrics(object):
+
+    def __init__(self, latency_buckets, decode_buckets):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.wire_bytes_in = 0
+        self.statuses = Counter()
+        self.latency = Histogram(latency_buckets)
+        self.decode_time = Histogram(decode_buckets)
+
+    def as_dict(self):
+        return dict(requests=self.requests, errors=self.errors,
+                    retries=self.retries, bytes_out=self.bytes_out,
+                    bytes_in=self.bytes_in, wire_bytes_in=self.wire_bytes_in,
+                    statuses=dict(self.statuses),
+                    latency=self.latency.as_dict(),
+                    decode_time=self.decode_time.as_dict())
+
+
+def _label(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"') \
+        .replace('\n', r'\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join('{}="{}"'.format(k, _label(v))
+                          for k, v in sorted(labels.items())) + '}'
+
+
+class Metrics(object):
+    """
+    Thread safe request metrics per endpoint template and HTTP method:
+    number of requests, errors and retries, bytes in and out, bytes in
+    as transferred before decompressing, response statuses, and
+    histograms of latency and JSON decode time.
+
+    :param latency_buckets: Upper bounds of latency histogram buckets in
+                            seconds
+    :param decode_buckets: Upper bounds of decode time histogram buckets
+                           in seconds
+    """
+
+    LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                       5.0, 10.0, 30.0)
+    DECODE_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5,
+                      1.0)
+
+    def __init__(self, latency_buckets=LATENCY_BUCKETS,
+                 decode_buckets=DECODE_BUCKETS):
+        self.latency_buckets = latency_buckets
+        self.decode_buckets = decode_buckets
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def record(self, info):
+        """
+        Record a finished call, given as :class:`RequestInfo`. Used as an
+        after hook.
+        """
+        key = (info.endpoint, info.method)
+        with self._lock:
+            metrics = self._endpoints.get(key)
+            if metrics is None:
+                metrics = self._endpoints[key] = _EndpointMetrics(
+                    self.latency_buckets, self.decode_buckets)
+
+            metrics.requests += 1
+            metrics.retries += info.retries
+            metrics.bytes_out += info.bytes_out or 0
+            metrics.bytes_in += info.bytes_in or 0
+            metrics.wire_bytes_in += info.wire_bytes_in or 0
+
+            if info.error is not None:
+                metrics.errors += 1
+
+            if info.status is not None:
+                metrics.statuses[info.status] += 1
+
+            if info.latency is not None:
+                metrics.latency.observe(info.latency)
+
+            if info.decode_time is not None:
+                metrics.decode_time.observe(info.decode_time)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def as_dict(self):
+        """
+        Metrics as a dictionary of endpoint templates to dictionaries of
+        HTTP methods to metrics.
+        """
+        result = {}
+        with self._lock:
+            for (endpoint, method), metrics in self._endpoints.items():
+                result.setdefault(endpoint, {})[method] = metrics.as_dict()
+
+        return result
+
+    def to_prometheus(self, prefix='crowdflower'):
+        """
+        Metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            lines = []
+
+            def counter(name, help_, values):
+                lines.append('# HELP {}_{} {}'.format(prefix, name, help_))
+                lines.append('# TYPE {}_{} counter'.format(prefix, name))
+                for labels, value in values:
+                    lines.append('{}_{}{} {}'.format(prefix, name, labels,
+                                                     value))
+
+            def histogram(name, help_, attr):
+                lines.append('# HELP {}_{} {}'.format(prefix, name, help_))
+                lines.append('# TYPE {}_{} histogram'.format(prefix, name))
+                for (endpoint, method), metrics in endpoints:
+                    hist = getattr(metrics, attr)
+                    for bound, count in hist.cumulative():
+                        lines.append('{}_{}_bucket{} {}'.format(
+                            prefix, name,
+                            _labels(endpoint=endpoint, method=method,
+                                    le='+Inf' if bound == float('inf')
+                                    else repr(bound)),
+                            count))
+
+                    labels = _labels(endpoint=endpoint, method=method)
+                    lines.append('{}_{}_sum{} {!r}'.format(
+                        prefix, name, labels, hist.sum))
+                    lines.append('{}_{}_count{} {}'.format(
+                        prefix, name, labels, hist.count))
+
+            counter('requests_total', 'API calls by response status.', [
+                (_labels(endpoint=endpoint, method=method, status=status),
+                 count)
+                for (endpoint, method), metrics in endpoints
+                for status, count in sorted(metrics.statuses.items())])
+
+            for name, help_, attr in [
+                    ('errors_total', 'Failed API calls.', 'errors'),
+                    ('retries_total', 'Retried requests.', 'retries'),
+                    ('sent_bytes_total', 'Request body bytes sent.',
+                     'bytes_out'),
+                    ('received_bytes_total',
+                     'Response body bytes received, decompressed.',
+                     'bytes_in'),
+                    ('received_wire_bytes_total',
+                     'Response body bytes received, as transferred.',
+                     'wire_bytes_in')]:
+                counter(name, help_, [
+                    (_labels(endpoint=endpoint, method=method),
+                     getattr(metrics, attr))
+                    for (endpoint, method), metrics in endpoints])
+
+            histogram('request_duration_seconds',
+                      'API request latency, including retries.', 'latency')
+            histogram('decode_duration_seconds',
+                      'JSON response decode time.', 'decode_time')
+
+        return '\n'.join(lines) + '\n'
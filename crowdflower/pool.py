@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+__author__ = u'Ilja Everilä <ilja.everila@liilak.com>'
+
+
+def bounded_map(fn, iterable, concurrency=None, return_exceptions=False):
+    """
+    Lazily map ``fn`` over ``iterable`` in a thread pool, keeping at most
+    ``concurrency`` calls in flight. Results are generated in the order of
+    ``iterable``, which is consumed only as fast as results are. Runs
+    sequentially in the calling thread, if ``concurrency`` is not greater
+    than 1.
+
+    :param fn: Function to call with each item
+    :param iterable: Items to map
+    :param concurrency: Maximum number of concurrent calls
+    :type concurrency: int
+    :param return_exceptions: If True, exceptions raised by ``fn`` are
+                              generated in place of results instead of
+                              raised
+    :type return_exceptions: bool
+    """
+    if not concurrency or concurrency < 2:
+        for item in iterable:
+            try:
+                yield fn(item)
+
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+
+                yield e
+
+        return
+
+    iterator = iter(iterable)
+    executor = ThreadPoolExecutor(concurrency)
+    window = deque(executor.submit(fn, item)
+                   for item in islice(iterator, concurrency))
+    try:
+        while window:
+            future = window.popleft()
+            window.extend(executor.submit(fn, item)
+                          for item in islice(iterator, 1))
+            try:
+                result = future.result()
+
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+
+                result = e
+
+            yield result
+
+    finally:
+        for future in window:
+            future.cancel()
+
+        executor.shutdown(wait=True)
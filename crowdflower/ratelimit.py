@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+Client side rate limiting, retry and hedging policies.
+"""
+from __future__ import print_function, division, absolute_import
+from collections import deque
+from email.utils import parsedate_tz, mktime_tz
+import random
+import threading
+import time
+
+__author__ = u'Ilja Everilä <ilja.everila@liilak.com>'
+
+try:
+    _clock = time.monotonic
+
+except AttributeError:
+    _clock = time.time
+
+
+class TokenBucket(object):
+    """
+    Thread safe token bucket rate limiter. Tokens are added at ``rate``
+    per second up to ``capacity``, which allows short bursts.
+
+    Callers reserve tokens ahead of time and wait for the returned delay,
+    so that concurrent callers are served in order and the bucket may go
+    into debt, which is then paid back by later callers waiting longer.
+
+    :param rate: Tokens added per second
+    :type rate: float
+    :param capacity: Bucket size, defaults to ``rate`` (1 second burst)
+    :type capacity: float
+    """
+
+    def __init__(self, rate, capacity=None, clock=_clock):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(rate, 1))
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity,
+                           self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens=1):
+        """
+        Take ``tokens`` from the bucket and return the number of seconds
+        the caller must wait before using them.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+    def try_acquire(self, tokens=1):
+        """
+        Take ``tokens`` from the bucket only if they are available now,
+        without going into debt.
+
+        :returns: True if the tokens were taken
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens < tokens:
+                return False
+
+            self._tokens -= tokens
+            return True
+
+    def acquire(self, tokens=1):
+        """
+        Take ``tokens`` from the bucket, blocking until they are available.
+        """
+        delay = self.reserve(tokens)
+        if delay:
+            time.sleep(delay)
+
+    def penalize(self, seconds):
+        """
+        Empty the bucket so that no tokens are available for ``seconds``,
+        for example when the server responds with *429 Too Many Requests*.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+def parse_retry_after(value):
+    """
+    Parse a ``Retry-After`` header value, given either as seconds or as an
+    HTTP date, to seconds from now. Returns None for missing or invalid
+    values.
+
+    .. code-block:: python
+
+       >>> parse_retry_after('120')
+       120.0
+       >>> parse_retry_after(None) is None
+       True
+    """
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+
+    except ValueError:
+        date = parsedate_tz(value)
+        if date is None:
+            return None
+
+        return max(0.0, mktime_tz(date) - time.time())
+
+
+class RetryPolicy(object):
+    """
+    Retry policy with jittered exponential backoff. Failed requests are
+    retried up to ``total`` times, if the method is one of ``methods``
+    and the request failed with a connection error or a status in
+    ``statuses``. A ``Retry-After`` given by the server is honored instead
+    of the computed backoff, up to ``max_backoff`` seconds.
+
+    :param total: Maximum number of retries
+    :type total: int
+    :param backoff_factor: Base of the exponential backoff in seconds
+    :type backoff_factor: float
+    :param max_backoff: Maximum backoff in seconds, also capping
+                        ``Retry-After``, so that a bogus value cannot stall
+                        callers for long
+    :type max_backoff: float
+    :param statuses: HTTP statuses to retry
+    :param methods: HTTP methods to retry, lower case. Defaults to the
+                    idempotent methods.
+    """
+
+    STATUSES = frozenset({429, 500, 502, 503, 504})
+    IDEMPOTENT_METHODS = frozenset({'get', 'head', 'options', 'put',
+                                    'delete'})
+
+    def __init__(self, total=3, backoff_factor=0.5, max_backoff=60.0,
+                 statuses=STATUSES, methods=IDEMPOTENT_METHODS):
+        self.total = total
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(methods)
+
+    def should_retry(self, attempt, method, status=None):
+        """
+        Should the ``attempt``:th (counting from 0) try of ``method`` be
+        retried after failing with ``status``, or a connection error, if
+        ``status`` is None.
+        """
+        return (attempt < self.total and
+                method.lower() in self.methods and
+                (status is None or status in self.statuses))
+
+    def backoff(self, attempt, retry_after=None):
+        """
+        Seconds to wait before retrying after the ``attempt``:th try.
+        Uses "full jitter", so that concurrent clients do not retry in
+        lock step.
+        """
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+
+        return random.uniform(
+            0, min(self.max_backoff, self.backoff_factor * 2 ** attempt))
+
+
+class HedgePolicy(object):
+    """
+    Policy for hedging requests: if no response has arrived in
+    :meth:`delay` seconds, a duplicate request is sent and whichever
+    response arrives first is used. Only applies to idempotent ``methods``.
+
+    The delay is either fixed, or the ``percentile`` of recently observed
+    request latencies, so that only the slowest requests are duplicated
+    and the extra load stays around ``100 - percentile`` percent.
+
+    :param percentile: Latency percentile to hedge at
+    :type percentile: float
+    :param delay: Fixed hedging delay in seconds, overrides ``percentile``
+    :type delay: float
+    :param window: Number of latest latency samples to keep
+    :type window: int
+    :param min_samples: Do not hedge before this many samples have been
+                        observed, unless using a fixed ``delay``
+    :type min_samples: int
+    :param methods: HTTP methods to hedge, lower case
+    """
+
+    def __init__(self, percentile=95, delay=None, window=256, min_samples=20,
+                 methods=frozenset({'get'})):
+        self.percentile = percentile
+        self.fixed_delay = delay
+        self.min_samples = min_samples
+        self.methods = frozenset(methods)
+        #: Number of requests that were hedged
+        self.hedged = 0
+        #: Number of hedged requests where the duplicate won
+        self.won = 0
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        """
+        Record an observed request latency.
+        """
+        with self._lock:
+            self._samples.append(seconds)
+
+    def record_hedged(self):
+        """
+        Count a hedged request.
+        """
+        with self._lock:
+            self.hedged += 1
+
+    def record_won(self):
+        """
+        Count a hedged request won by the duplicate.
+        """
+        with self._lock:
+            self.won += 1
+
+    def delay(self):
+        """
+        Seconds to wait before sending a duplicate request, or None if
+        requests should not be hedged (yet).
+        """
+        if self.fixed_delay is not None:
+            return self.fixed_delay
+
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+
+            samples = sorted(self._samples)
+
+        index = int(round(self.percentile / 100.0 * (len(samples) - 1)))
+        return samples[index]
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+Local SQLite mirror of jobs, units, judgment aggregates and judgments, for
+running analytics without hitting the API again.
+
+.. code-block:: python
+
+   >>> store = Store('jobs.sqlite')
+   >>> store.sync(client.get_job(123))
+   {'units': 1000, 'judgment_aggregates': 1000, 'judgments': 5000}
+   >>> # Later only records changed since the previous sync are fetched
+   >>> store.sync(client.get_job(123))
+   {'units': 3, 'judgment_aggregates': 3, 'judgments': 15}
+   >>> units = list(store.get_units(123, state='finalized'))
+
+Records are stored as JSON documents along with indexed columns for
+``job_id``, ``unit_id``, ``worker_id`` and ``state``, so that the
+connection can also be queried directly with SQL.
+"""
+from __future__ import print_function, division, absolute_import
+from .codec import get_codec
+from .job import Job
+from .judgment import JudgmentAggregate, Judgment
+from .pool import bounded_map
+from .unit import Unit
+import datetime
+import re
+import sqlite3
+
+__author__ = u'Ilja Everilä <ilja.everila@liilak.com>'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    state TEXT,
+    updated_at TEXT,
+    synced_updated_at TEXT,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY,
+    job_id INTEGER NOT NULL,
+    state TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_units_job_id ON units (job_id);
+CREATE INDEX IF NOT EXISTS ix_units_state ON units (state);
+
+CREATE TABLE IF NOT EXISTS judgment_aggregates (
+    unit_id INTEGER PRIMARY KEY,
+    job_id INTEGER NOT NULL,
+    state TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_judgment_aggregates_job_id
+    ON judgment_aggregates (job_id);
+CREATE INDEX IF NOT EXISTS ix_judgment_aggregates_state
+    ON judgment_aggregates (state);
+
+CREATE TABLE IF NOT EXISTS judgments (
+    id INTEGER PRIMARY KEY,
+    job_id INTEGER NOT NULL,
+    unit_id INTEGER,
+    worker_id INTEGER,
+    data TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_judgments_job_id ON judgments (job_id);
+CREATE INDEX IF NOT EXISTS ix_judgments_unit_id ON judgments (unit_id);
+CREATE INDEX IF NOT EXISTS ix_judgments_worker_id ON judgments (worker_id);
+"""
+
+_TIMESTAMP = re.compile(
+    r'(\d{4})-(\d\d)-(\d\d)[T ](\d\d):(\d\d):(\d\d)(?:\.(\d{1,6})\d*)?'
+    r'\s*(Z|[+-]\d\d:?\d\d)?$')
+
+
+def _parse_timestamp(value):
+    """
+    Parse ISO 8601 timestamp ``value`` to a naive :class:`datetime.datetime`
+    in UTC, so that timestamps with differing offsets compare correctly.
+    Timestamps without an offset are taken to be in UTC.
+
+    :returns: the timestamp, or None if ``value`` is None or not a
+              timestamp
+    """
+    if value is None:
+        return None
+
+    match = _TIMESTAMP.match(value.strip())
+    if match is None:
+        return None
+
+    year, month, day, hour, minute, second = map(int, match.groups()[:6])
+    fraction, offset = match.group(7, 8)
+    microsecond = int(fraction.ljust(6, '0')) if fraction else 0
+    timestamp = datetime.datetime(year, month, day, hour, minute, second,
+                                  microsecond)
+    if offset and offset != 'Z':
+        sign = -1 if offset[0] == '-' else 1
+        offset = offset[1:].replace(':', '')
+        timestamp -= sign * datetime.timedelta(hours=int(offset[:2]),
+                                               minutes=int(offset[2:]))
+
+    return timestamp
+
+
+class Store(object):
+    """
+    SQLite mirror of CrowdFlower jobs.
+
+    :param path: Database file path, or ``':memory:'``
+    :type path: str
+    :param client: :class:`~.client.Client` to bind models read from the
+                   store to
+    :type client: crowdflower.client.Client
+    :param codec: Name of the JSON codec used for stored documents, see
+                  :func:`~.codec.get_codec`
+    :type codec: str
+    """
+
+    def __init__(self, path=':memory:', client=None, codec=None):
+        self.client = client
+        self._codec = get_codec(codec)
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(_SCHEMA)
+
+    @property
+    def connection(self):
+        """
+        The underlying :class:`sqlite3.Connection`, for custom queries.
+        """
+        return self._conn
+
+    def close(self):
+        """
+        Close the database connection.
+        """
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _dumps(self, obj):
+        return self._codec.dumps(obj).decode('utf-8')
+
+    def _loads(self, data):
+        return self._codec.loads(data)
+
+    def sync(self, job, concurrency=10, full=False):
+        """
+        Pull ``job``, its units, judgment aggregates and judgments to the
+        store.
+
+        The API cannot filter listings by time, so the unit and judgment
+        aggregate listings are paged through, but full units and judgments
+        are fetched only for units that are new to the store or whose
+        aggregate's ``updated_at`` is newer than at the last sync of the
+        job. Judgments already in the store are not fetched again, and the
+        job itself is fetched anew. Timestamps are compared as points in
+        time, regardless of their UTC offsets. Fetches are made
+        ``concurrency`` at a time.
+
+        :param job: Job to sync, bound to a client
+        :type job: crowdflower.job.Job
+        :param concurrency: Maximum number of concurrent requests
+        :type concurrency: int
+        :param full: Ignore the last sync and fetch everything
+        :type full: bool
+        :returns: number of records written per table
+        :rtype: dict
+        """
+        client = job.client
+        since = None if full else self._synced_updated_at(job.id)
+        since_ts = _parse_timestamp(since)
+        known = {id_ for id_, in self._conn.execute(
+            "SELECT id FROM units WHERE job_id = ?", (job.id,))}
+        known_judgments = set() if full else {
+            id_ for id_, in self._conn.execute(
+                "SELECT id FROM judgments WHERE job_id = ?", (job.id,))}
+
+        changed = {}
+        for unit_id in self._unit_ids(job, concurrency):
+            if full or unit_id not in known:
+                changed[unit_id] = None
+
+        aggregates = {}
+        watermark, watermark_ts = since, since_ts
+        for unit_id, data in self._aggregates(job, concurrency):
+            updated_at = data.get('_updated_at')
+            updated_ts = _parse_timestamp(updated_at)
+            if since_ts is None or updated_ts is None or updated_ts > since_ts:
+                aggregates[unit_id] = data
+                changed[unit_id] = None
+
+            if updated_ts is not None and \
+                    (watermark_ts is None or updated_ts > watermark_ts):
+                watermark, watermark_ts = updated_at, updated_ts
+
+        # The job row is refreshed, the given instance may be stale
+        job_data = client.jobs[job.id]()
+        unit_ids = list(changed)
+        units = list(bounded_map(
+            lambda unit_id: client.jobs[job.id].units[unit_id](),
+            unit_ids, concurrency))
+        # Judgments do not change once made, only new ones are fetched
+        judgment_ids = list({id_ for data in aggregates.values()
+                             for id_ in data.get('_ids', ())
+                             if id_ not in known_judgments})
+        judgments = list(bounded_map(
+            lambda judgment_id: client.jobs[job.id].judgments[judgment_id](),
+            judgment_ids, concurrency))
+
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs "
+                "(id, state, updated_at, synced_updated_at, data) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (job.id, job_data.get('state'), job_data.get('updated_at'),
+                 watermark, self._dumps(job_data)))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO units "
+                "(id, job_id, state, updated_at, data) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(unit_id, job.id, data.get('state'),
+                  data.get('updated_at'), self._dumps(data))
+                 for unit_id, data in zip(unit_ids, units)])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO judgment_aggregates "
+                "(unit_id, job_id, state, updated_at, data) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(unit_id, job.id, data.get('_state'),
+                  data.get('_updated_at'), self._dumps(data))
+                 for unit_id, data in aggregates.items()])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO judgments "
+                "(id, job_id, unit_id, worker_id, data) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(data['id'], job.id, data.get('unit_id'),
+                  data.get('worker_id'), self._dumps(data))
+                 for data in judgments])
+
+        return {'units': len(units),
+                'judgment_aggregates': len(aggregates),
+                'judgments': len(judgments)}
+
+    @staticmethod
+    def _unit_ids(job, concurrency):
+        for resp in job.client.jobs[job.id].units.pages(
+                sentinel={}, concurrency=concurrency):
+            for unit_id in resp:
+                yield int(unit_id)
+
+    @staticmethod
+    def _aggregates(job, concurrency):
+        # Aggregates are keyed by unit id, which the aggregates themselves
+        # lack, so the listing is paged directly.
+        for resp in job.client.jobs[job.id].judgments.pages(
+                sentinel={}, concurrency=concurrency):
+            for unit_id, data in resp.items():
+                yield int(unit_id), data
+
+    def _synced_updated_at(self, job_id):
+        row = self._conn.execute(
+            "SELECT synced_updated_at FROM jobs WHERE id = ?",
+            (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def get_job(self, job_id):
+        """
+        Get stored :class:`~.job.Job` ``job_id``.
+
+        :raises KeyError: if the job is not in the store
+        """
+        row = self._conn.execute(
+            "SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise KeyError(job_id)
+
+        return Job(client=self.client, **self._loads(row[0]))
+
+    def _select(self, table, job_id, **filters):
+        sql = "SELECT data FROM {} WHERE job_id = ?".format(table)
+        params = [job_id]
+        for column, value in sorted(filters.items()):
+            if value is not None:
+                sql += " AND {} = ?".format(column)
+                params.append(value)
+
+        for data, in self._conn.execute(sql, params):
+            yield self._loads(data)
+
+    def get_units(self, job_id, state=None):
+        """
+        Generate stored :class:`Units <crowdflower.unit.Unit>` of job
+        ``job_id``, optionally in ``state``.
+        """
+        job = self.get_job(job_id)
+        for data in self._select('units', job_id, state=state):
+            yield Unit(job, client=self.client, **data)
+
+    def get_judgmentaggregates(self, job_id, state=None):
+        """
+        Generate stored :class:`JudgmentAggregates
+        <crowdflower.judgment.JudgmentAggregate>` of job ``job_id``,
+        optionally in ``state``.
+        """
+        job = self.get_job(job_id)
+        for data in self._select('judgment_aggregates', job_id, state=state):
+            yield JudgmentAggregate(job, client=self.client, **data)
+
+    def get_judgments(self, job_id, unit_id=None, worker_id=None):
+        """
+        Generate stored :class:`Judgments <crowdflower.judgment.Judgment>`
+        of job ``job_id``, optionally of unit ``unit_id`` or by worker
+        ``worker_id``.
+        """
+        job = self.get_job(job_id)
+        for data in self._select('judgments', job_id,
+                                 unit_id=unit_id, worker_id=worker_id):
+            yield Judgment(job, client=self.client, **data)
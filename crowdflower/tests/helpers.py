@@ -0,0 +1,18 @@
+import json
+
+try:
+    from unittest import mock
+
+except ImportError:
+    import mock
+
+
+def mock_response(json_data=None, status_code=200):
+    """
+    Mock :class:`requests.Response` with ``json_data`` as its content.
+    """
+    resp = mock.Mock()
+    resp.status_code = status_code
+    resp.json.return_value = json_data
+    resp.content = json.dumps(json_data).encode('utf-8')
+    return resp
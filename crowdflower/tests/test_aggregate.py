@@ -0,0 +1,130 @@
+import unittest
+from crowdflower.job import Job
+from crowdflower.unit import Unit
+
+try:
+    from unittest import mock
+
+except ImportError:
+    import mock
+
+try:
+    import numpy as np
+    from crowdflower.aggregate import Judgments
+
+except ImportError:
+    np = None
+
+
+def _judgment(unit_id, worker_id, trust, tainted=False, **data):
+    return dict(unit_id=unit_id, worker_id=worker_id, trust=trust,
+                tainted=tainted, data=data)
+
+
+@unittest.skipIf(np is None, "numpy not installed")
+class TestJudgments(unittest.TestCase):
+
+    def setUp(self):
+        self.judgments = Judgments.from_judgments([
+            _judgment(1, 10, 0.9, sentiment='pos', tags=['a', 'b']),
+            _judgment(1, 11, 0.5, sentiment='neg', tags=['a']),
+            _judgment(1, 12, 0.5, sentiment='neg', tags=['a']),
+            _judgment(2, 10, 0.9, sentiment='neg'),
+            _judgment(2, 11, 0.5, sentiment='neg'),
+            _judgment(2, 13, 1.0, tainted=True, sentiment='pos'),
+            _judgment(3, 12, 0.5, sentiment=''),
+        ])
+
+    def test_load(self):
+        j = self.judgments
+        self.assertEqual(len(j), 6)
+        self.assertEqual(j.unit_ids.tolist(), [1, 2, 3])
+        self.assertEqual(j.unit_index.tolist(), [0, 0, 0, 1, 1, 2])
+        self.assertEqual(sorted(j.fields), ['sentiment', 'tags'])
+        self.assertEqual(j.categories['sentiment'], ['pos', 'neg'])
+        self.assertEqual(j.codes['sentiment'].tolist(), [0, 1, 1, 1, 1, -1])
+        self.assertEqual(j.categories['tags'], [('a', 'b'), ('a',)])
+        self.assertEqual(j.codes['tags'].tolist(), [0, 1, 1, -1, -1, -1])
+
+    def test_fields(self):
+        j = Judgments.from_judgments([
+            _judgment(1, 10, 0.9, tags=['a']),
+            _judgment(1, 11, 0.9, sentiment='pos', tags=['a']),
+        ], exclude_tainted=False)
+        self.assertEqual(j.codes['sentiment'].tolist(), [-1, 0])
+
+        j = Judgments.from_judgments([
+            _judgment(1, 10, 0.9, sentiment='pos', tags=['a'])],
+            fields=['sentiment'])
+        self.assertEqual(j.fields, ['sentiment'])
+
+    def test_majority_vote(self):
+        result = self.judgments.majority_vote('sentiment')
+        self.assertEqual(result.answers.tolist(), ['neg', 'neg', None])
+        self.assertEqual(result.codes.tolist(), [1, 1, -1])
+        np.testing.assert_allclose(result.confidence, [2 / 3, 1, 0])
+
+    def test_weighted_vote(self):
+        result = self.judgments.weighted_vote('sentiment')
+        self.assertEqual(result.answers.tolist(), ['neg', 'neg', None])
+        np.testing.assert_allclose(result.confidence, [1 / 1.9, 1, 0])
+
+        result = self.judgments.weighted_vote('tags')
+        self.assertEqual(result.answers.tolist(), [('a',), None, None])
+
+    def test_unit_confidence(self):
+        np.testing.assert_allclose(
+            self.judgments.unit_confidence(['sentiment']), [1 / 1.9, 1, 0])
+        np.testing.assert_allclose(
+            self.judgments.unit_confidence(['sentiment', 'tags']),
+            [1 / 1.9, 0, 0])
+
+    def test_agreement(self):
+        agreement = self.judgments.agreement('sentiment')
+        np.testing.assert_allclose(agreement[:2], [1 / 3, 1])
+        self.assertTrue(np.isnan(agreement[2]))
+
+    def test_from_units(self):
+        job = Job(id=1)
+        units = [
+            Unit(job, id=1, results={'judgments': [
+                _judgment(1, 10, 0.9, sentiment='pos'),
+                _judgment(1, 11, 0.9, sentiment='pos')]}),
+            {'id': 2, 'results': {'judgments': [
+                _judgment(2, 10, 0.9, sentiment='neg')]}},
+            {'id': 3},
+        ]
+        result = Judgments.from_units(units).weighted_vote('sentiment')
+        self.assertEqual(result.unit_ids.tolist(), [1, 2, 3])
+        self.assertEqual(result.answers.tolist(), ['pos', 'neg', None])
+        self.assertEqual(result.codes.tolist(), [0, 1, -1])
+
+    def test_unit_ids(self):
+        """
+        Given units are included, also without untainted judgments.
+        """
+        j = Judgments.from_judgments([
+            _judgment(2, 10, 0.9, sentiment='pos'),
+            _judgment(3, 11, 0.9, tainted=True, sentiment='neg'),
+            _judgment(5, 11, 0.9, sentiment='neg'),
+        ], unit_ids=[4, 3, 2])
+        self.assertEqual(j.unit_ids.tolist(), [4, 3, 2, 5])
+        result = j.majority_vote('sentiment')
+        self.assertEqual(result.answers.tolist(), [None, None, 'pos', 'neg'])
+        self.assertEqual(result.codes.tolist(), [-1, -1, 0, 1])
+
+    def test_async_report(self):
+        """
+        Loading the report of an asynchronous client fails clearly.
+        """
+        class AsyncUnits(object):
+
+            def __aiter__(self):
+                return self
+
+        client = mock.Mock()
+        client.iter_report.return_value = AsyncUnits()
+        with self.assertRaises(TypeError) as cm:
+            Judgments.from_report(client, Job(id=1))
+
+        self.assertIn('from_units', str(cm.exception))
@@ -0,0 +1,279 @@
+import asyncio
+import io
+import zipfile
+import unittest
+
+try:
+    from unittest import mock
+
+except ImportError:
+    import mock
+
+try:
+    import aiohttp
+    from aiohttp import web
+    from crowdflower.aio import AsyncClient
+
+except ImportError:
+    web = None
+
+_pings = []
+
+
+async def _report(request):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w') as zf:
+        zf.writestr('job.json', '\n'.join(
+            '{{"id": {}, "state": "finalized"}}'.format(i)
+            for i in range(1, 6)))
+
+    return web.Response(body=buf.getvalue(),
+                        content_type='application/zip')
+
+async def _jobs(request):
+    page = int(request.query['page'])
+    return web.json_response([{'id': page}] if page <= 2 else [])
+
+
+async def _job(request):
+    return web.json_response({'id': int(request.match_info['id']),
+                              'title': 'TITLE'})
+
+
+async def _ping(request):
+    _pings.append(request.path)
+    await asyncio.sleep(0.05)
+    return web.json_response({'done': True})
+
+
+async def _judgments(request):
+    return web.json_response({
+        '1': {'_ids': [10, 11], '_agreement': 1.0},
+    } if request.query['page'] == '1' else {})
+
+
+async def _judgment(request):
+    return web.json_response({'id': int(request.match_info['id'])})
+
+
+async def _upload(request):
+    # Compressed bodies are decompressed by aiohttp
+    body = await request.read()
+    return web.json_response({
+        'id': 1, 'units_count': body.count(b'\n'),
+        'chunked': request.headers.get('Transfer-Encoding') == 'chunked',
+        'encoding': request.headers.get('Content-Encoding'),
+    })
+
+
+async def _bonus(request):
+    _pings.append(request.path)
+    await asyncio.sleep(0.01)
+    worker_id = int(request.match_info['id'])
+    if worker_id == 10:
+        return web.json_response({'error': 'Invalid amount'}, status=422)
+
+    if worker_id == 11:
+        return web.json_response({'error': 'Internal error'}, status=500)
+
+    return web.json_response({'paid': worker_id})
+
+
+@unittest.skipIf(web is None, "aiohttp not installed")
+class TestAsyncClient(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        app = web.Application()
+        del _pings[:]
+        app.router.add_get('/v1/jobs.json', _jobs)
+        app.router.add_get('/v1/jobs/{id}.json', _job)
+        app.router.add_get('/v1/jobs/{id}.csv', _report)
+        app.router.add_get('/v1/jobs/{id}/ping.json', _ping)
+        app.router.add_get('/v1/jobs/{id}/judgments.json', _judgments)
+        app.router.add_get('/v1/jobs/{job_id}/judgments/{id}.json', _judgment)
+        app.router.add_post('/v1/jobs/upload.json', _upload)
+        app.router.add_post('/v1/jobs/{job_id}/workers/{id}/bonus.json',
+                            _bonus)
+        self.runner = web.AppRunner(app)
+        self.loop.run_until_complete(self.runner.setup())
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        self.loop.run_until_complete(site.start())
+        port = site._server.sockets[0].getsockname()[1]
+        self.client = AsyncClient('KEY', coalesce=True)
+        self.client.API_URL = 'http://127.0.0.1:{}/v1/{{path}}'.format(port)
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.client.close())
+        self.loop.run_until_complete(self.runner.cleanup())
+        self.loop.close()
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def test_path_factory_call(self):
+        """
+        PathFactory calls return awaitables and models can be awaited.
+        """
+        async def go():
+            job = await self.client.get_job(5)
+            return job, await job.ping()
+
+        job, status = self.run_async(go())
+        self.assertEqual(job.title, 'TITLE')
+        self.assertEqual(status, {'done': True})
+
+    def test_paged_call(self):
+        """
+        Paged results are asynchronous generators.
+        """
+        async def go():
+            return [job.id async for job in self.client.get_jobs()]
+
+        self.assertEqual(self.run_async(go()), [1, 2])
+
+    def test_model_properties(self):
+        """
+        Model properties making API calls are awaitable and cached.
+        """
+        async def go():
+            job = await self.client.get_job(5)
+            aggregates = await job.judgment_aggregates
+            judgments = await aggregates[0].judgments
+            return aggregates, judgments, await job.judgment_aggregates
+
+        aggregates, judgments, cached = self.run_async(go())
+        self.assertEqual([j.id for j in judgments], [10, 11])
+        self.assertIs(aggregates, cached)
+
+    def test_coalescing(self):
+        """
+        Concurrent identical calls share a single request.
+        """
+        async def go():
+            job = await self.client.get_job(5)
+            return await asyncio.gather(*[job.ping() for _ in range(5)])
+
+        results = self.run_async(go())
+        self.assertEqual(len(_pings), 1)
+        self.assertTrue(all(r is results[0] for r in results))
+        self.assertEqual(self.client.single_flight.coalesced, 4)
+
+    def test_bulk(self):
+        """
+        Bulk commands are awaitable.
+        """
+        results = self.run_async(
+            self.client.bulk([1, 2, 3], concurrency=2).ping())
+        self.assertEqual([r.result for r in results], [{'done': True}] * 3)
+        self.assertEqual(sorted(_pings), ['/v1/jobs/{}/ping.json'.format(i)
+                                          for i in (1, 2, 3)])
+
+    def test_bulk_workers(self):
+        """
+        Bulk worker actions are awaited and recorded as done.
+        """
+        async def go():
+            job = await self.client.get_job(1)
+            return await self.client.bulk_workers(
+                [(job.get_worker(i), 'bonus', (100,)) for i in range(3)],
+                concurrency=2)
+
+        results = self.run_async(go())
+        self.assertEqual([r.state for r in results], ['done'] * 3)
+        self.assertEqual([r.result for r in results],
+                         [{'paid': i} for i in range(3)])
+        self.assertEqual(len(_pings), 3)
+
+    def test_bulk_workers_failures(self):
+        """
+        Bulk worker actions failing with a client error are failed, with
+        a server error unknown, without aborting the others.
+        """
+        client = AsyncClient('KEY', retries=0)
+        client.API_URL = self.client.API_URL
+
+        async def go():
+            try:
+                job = await client.get_job(1)
+                return await client.bulk_workers(
+                    [(job.get_worker(i), 'bonus', (100,))
+                     for i in (10, 11, 12)])
+
+            finally:
+                await client.close()
+
+        results = self.run_async(go())
+        self.assertEqual([r.state for r in results],
+                         ['failed', 'unknown', 'done'])
+        self.assertEqual(results[0].error.response.status, 422)
+
+    def test_given_session_left_open(self):
+        """
+        Sessions given by the caller are not closed with the client.
+        """
+        async def go():
+            session = aiohttp.ClientSession()
+            async with AsyncClient('KEY', session=session) as client:
+                client.API_URL = self.client.API_URL
+                await client.get_job(5)
+
+            closed = session.closed
+            await session.close()
+            return closed
+
+        self.assertFalse(self.run_async(go()))
+
+    def test_iter_report(self):
+        """
+        Reports are generated asynchronously in batches.
+        """
+        self.client.REPORT_BATCH_SIZE = 2
+
+        async def go():
+            job = await self.client.get_job(5)
+            return [unit.id async for unit in
+                    job.iter_results_report(compact=True)]
+
+        self.assertEqual(self.run_async(go()), [1, 2, 3, 4, 5])
+
+    def test_report_streamed(self):
+        """
+        Reports are streamed to a temporary file in chunks, not read to
+        memory as a whole.
+        """
+        self.client.REPORT_SPOOL_SIZE = 16
+        self.client.REPORT_CHUNK_SIZE = 32
+
+        async def go():
+            job = await self.client.get_job(5)
+            with mock.patch('aiohttp.ClientResponse.read',
+                            side_effect=AssertionError("read to memory")):
+                return await job.get_results_report()
+
+        units = self.run_async(go())
+        self.assertEqual([unit.id for unit in units], [1, 2, 3, 4, 5])
+
+    def test_upload_streamed(self):
+        """
+        Uploads are streamed in chunks, compressed if asked to.
+        """
+        client = AsyncClient('KEY', compress=True)
+        client.API_URL = self.client.API_URL
+        client.UPLOAD_CHUNK_SIZE = 64
+
+        async def go():
+            try:
+                job = await client.upload_job({'id': i} for i in range(100))
+                job_file = await client.upload_job_file(
+                    io.StringIO(u'a,b\n1,2\n'), 'text/csv')
+                return job, job_file
+
+            finally:
+                await client.close()
+
+        job, job_file = self.run_async(go())
+        self.assertEqual(job.units_count, 100)
+        self.assertTrue(job._json['chunked'])
+        self.assertEqual(job._json['encoding'], 'gzip')
+        self.assertEqual(job_file.units_count, 2)
@@ -0,0 +1,782 @@
+import io
+import json
+import os
+import requests
+import tempfile
+import threading
+import time
+import unittest
+import zipfile
+from crowdflower.cache import ResponseCache
+from crowdflower.client import Client, ApiError
+from crowdflower.coalesce import SingleFlight
+from crowdflower.job import Job
+from crowdflower.metrics import endpoint_template
+from crowdflower.ratelimit import TokenBucket, RetryPolicy, HedgePolicy
+from crowdflower.tests.helpers import mock_response
+
+try:
+    from unittest import mock
+
+except ImportError:
+    import mock
+
+
+class TestClientSession(unittest.TestCase):
+
+    def test_calls_reuse_session(self):
+        """
+        All calls go through the client owned session.
+        """
+        session = mock.Mock()
+        session.request.return_value = mock_response({'id': 1})
+        client = Client('KEY', session=session)
+        client.jobs[1]()
+        client.jobs[1].units()
+        self.assertEqual(session.request.call_count, 2)
+        _, kwgs = session.request.call_args
+        self.assertEqual(kwgs['url'],
+                         'https://api.crowdflower.com/v1/jobs/1/units.json')
+
+    def test_pool_options(self):
+        """
+        Pool options configure the mounted adapters.
+        """
+        client = Client('KEY', pool_connections=3, pool_maxsize=7)
+        adapter = client.session.get_adapter('https://api.crowdflower.com')
+        self.assertEqual(adapter._pool_connections, 3)
+        self.assertEqual(adapter._pool_maxsize, 7)
+        client.close()
+
+    def test_context_manager_closes_session(self):
+        """
+        Exiting the client context closes the session created by the client.
+        """
+        with Client('KEY') as client:
+            close = mock.patch.object(client.session, 'close').start()
+            self.addCleanup(mock.patch.stopall)
+
+        close.assert_called_once_with()
+
+    def test_given_session_left_open(self):
+        """
+        Sessions and transports given by the caller are not closed.
+        """
+        session = mock.Mock()
+        with Client('KEY', session=session) as client:
+            self.assertIs(client.session, session)
+
+        session.close.assert_not_called()
+
+        transport = mock.Mock()
+        with Client('KEY', transport=transport):
+            pass
+
+        transport.close.assert_not_called()
+
+
+class TestConcurrentPages(unittest.TestCase):
+
+    def setUp(self):
+        self.requested = []
+
+        def request(**kwgs):
+            page = kwgs['params']['page']
+            limit = kwgs['params']['limit']
+            self.requested.append(page)
+            # 5 full pages followed by a short one
+            start = (page - 1) * limit + 1
+            stop = min(start + limit, 5 * limit + 2)
+            return mock_response([{'id': i} for i in range(start, stop)])
+
+        session = mock.Mock()
+        session.request.side_effect = request
+        self.client = Client('KEY', session=session)
+
+    def test_pages_in_order(self):
+        """
+        Concurrently fetched pages are generated in page order.
+        """
+        pages = list(self.client.jobs.pages(sentinel=[], limit=2,
+                                            concurrency=4))
+        self.assertEqual(sum(pages, []), [{'id': i} for i in range(1, 12)])
+
+    def test_stops_scheduling_after_short_page(self):
+        """
+        No pages past the window are requested after a short page.
+        """
+        jobs = list(self.client.jobs.pages(sentinel=[], limit=2,
+                                           concurrency=3))
+        self.assertEqual(len(jobs), 6)
+        self.assertLessEqual(max(self.requested), 6 + 2)
+
+    def test_get_jobs_concurrency(self):
+        """
+        get_jobs passes concurrency on to paging.
+        """
+        ids = [job.id for job in self.client.get_jobs(concurrency=2)]
+        self.assertEqual(ids, list(range(1, 502)))
+
+
+def _report(units, members=2):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w') as zf:
+        for i in range(members):
+            zf.writestr('job_{}.json'.format(i), '\n'.join(
+                json.dumps(u) for u in units[i::members]) + '\n')
+
+    return buf.getvalue()
+
+
+class TestReport(unittest.TestCase):
+
+    def setUp(self):
+        self.units = [{'id': i, 'state': 'finalized'} for i in range(10)]
+        content = _report(self.units)
+        resp = mock_response()
+        resp.content = content
+        resp.iter_content.side_effect = lambda size: (
+            content[i:i + size] for i in range(0, len(content), size))
+        self.session = mock.Mock()
+        self.session.request.return_value = resp
+        self.client = Client('KEY', session=self.session)
+        self.client.REPORT_CHUNK_SIZE = 100
+        self.job = Job(client=self.client, id=1)
+
+    def test_iter_results_report(self):
+        """
+        Report is streamed and units generated from all members.
+        """
+        units = self.job.iter_results_report()
+        self.assertFalse(self.session.request.called)
+        self.assertEqual(sorted(u.id for u in units), list(range(10)))
+        _, kwgs = self.session.request.call_args
+        self.assertTrue(kwgs['stream'])
+
+    def test_get_results_report(self):
+        """
+        Report is returned as a list of units.
+        """
+        units = self.job.get_results_report()
+        self.assertEqual(len(units), 10)
+        self.assertTrue(all(u.job is self.job for u in units))
+
+
+class TestUpload(unittest.TestCase):
+
+    def setUp(self):
+        self.bodies = []
+
+        def request(**kwgs):
+            self.bodies.append(b''.join(kwgs['data']))
+            return mock_response({'id': 7})
+
+        self.session = mock.Mock()
+        self.session.request.side_effect = request
+        self.client = Client('KEY', session=self.session)
+        self.client.UPLOAD_CHUNK_SIZE = 10
+
+    def test_streams_generator(self):
+        """
+        Rows are consumed lazily and sent as newline delimited JSON chunks.
+        """
+        rows = ({'n': i} for i in range(5))
+        job = self.client.upload_job(rows)
+        self.assertEqual(job.id, 7)
+        self.assertEqual(
+            [json.loads(line) for line in self.bodies[0].splitlines()],
+            [{'n': i} for i in range(5)])
+
+    def test_batches(self):
+        """
+        Batched uploads create the job with the first batch.
+        """
+        results = self.client.upload_job(
+            ({'n': i} for i in range(10)), batch_size=3, concurrency=2)
+        self.assertEqual(len(results), 4)
+        self.assertEqual(len(self.bodies), 4)
+        paths = [kwgs['url'] for _, kwgs in self.session.request.call_args_list]
+        self.assertTrue(paths[0].endswith('/jobs/upload.json'))
+        self.assertTrue(all(p.endswith('/jobs/7/upload.json')
+                            for p in paths[1:]))
+        self.assertEqual(sum(len(b.splitlines()) for b in self.bodies), 10)
+
+
+class TestUploadFile(unittest.TestCase):
+
+    def setUp(self):
+        self.bodies = []
+
+        def request(**kwgs):
+            data = kwgs['data']
+            self.bodies.append((type(data), bytes(data) if
+                                isinstance(data, memoryview) else
+                                b''.join(data) if not hasattr(data, 'read')
+                                else data.read()))
+            return mock_response({'id': 7})
+
+        session = mock.Mock()
+        session.request.side_effect = request
+        self.client = Client('KEY', session=session)
+        self.client.UPLOAD_CHUNK_SIZE = 4
+
+    def test_real_file_is_memory_mapped(self):
+        """
+        Files on disk are sent as a memory mapped view.
+        """
+        fd, name = tempfile.mkstemp(suffix='.csv')
+        self.addCleanup(os.remove, name)
+        with os.fdopen(fd, 'wb') as fp:
+            fp.write(b'a,b\n1,2\n')
+
+        self.client.upload_job_file(name)
+        self.assertEqual(self.bodies, [(memoryview, b'a,b\n1,2\n')])
+
+    def test_binary_file_object(self):
+        """
+        Binary file like objects are streamed as is.
+        """
+        self.client.upload_job_file(io.BytesIO(b'a,b\n'), 'text/csv')
+        self.assertEqual(self.bodies, [(io.BytesIO, b'a,b\n')])
+
+    def test_text_file_object(self):
+        """
+        Text file like objects are encoded incrementally.
+        """
+        self.client.upload_job_file(io.StringIO(u'a,\xe4\n1,2\n'), 'text/csv')
+        self.assertEqual(self.bodies[0][1], u'a,\xe4\n1,2\n'.encode('utf-8'))
+
+
+class TestResolveUnits(unittest.TestCase):
+
+    def test_resolve_units(self):
+        """
+        Unit promises are resolved in bulk and not fetched again.
+        """
+        def request(**kwgs):
+            if kwgs['url'].endswith('/units.json'):
+                return mock_response({'1': {}, '2': {}, '3': {}}
+                                 if kwgs['params']['page'] == 1 else {})
+
+            unit_id = int(kwgs['url'].rsplit('/', 1)[1].split('.')[0])
+            return mock_response({'id': unit_id, 'state': 'judgable'})
+
+        session = mock.Mock()
+        session.request.side_effect = request
+        client = Client('KEY', session=session)
+        job = Job(client=client, id=1)
+        units = job.resolve_units(concurrency=2)
+        self.assertEqual(sorted(u.id for u in units), [1, 2, 3])
+        self.assertEqual(session.request.call_count, 5)
+        self.assertEqual([p.state for p in job.units], ['judgable'] * 3)
+        job.resolve_units()
+        self.assertEqual(session.request.call_count, 5)
+
+
+class TestResolveJudgments(unittest.TestCase):
+
+    def test_resolve_judgments(self):
+        """
+        Judgments shared between aggregates are fetched once.
+        """
+        def request(**kwgs):
+            if kwgs['url'].endswith('/judgments.json'):
+                return mock_response({'1': {'_ids': [10, 11]},
+                                  '2': {'_ids': [11, 12]}}
+                                 if kwgs['params']['page'] == 1 else {})
+
+            judgment_id = int(kwgs['url'].rsplit('/', 1)[1].split('.')[0])
+            return mock_response({'id': judgment_id})
+
+        session = mock.Mock()
+        session.request.side_effect = request
+        client = Client('KEY', session=session)
+        job = Job(client=client, id=1)
+        first, second = job.resolve_judgments(concurrency=3)
+        # 2 pages and 3 distinct judgments
+        self.assertEqual(session.request.call_count, 5)
+        self.assertEqual([j.id for j in first.judgments], [10, 11])
+        self.assertEqual([j.id for j in second.judgments], [11, 12])
+        self.assertIs(first.judgments[1], second.judgments[0])
+
+
+class TestBulk(unittest.TestCase):
+
+    def test_bulk_pause(self):
+        """
+        Bulk commands collect results and errors per job.
+        """
+        def request(**kwgs):
+            if '/jobs/2/' in kwgs['url']:
+                return mock_response({'error': 'FAIL'})
+
+            return mock_response({'paused': True})
+
+        session = mock.Mock()
+        session.request.side_effect = request
+        client = Client('KEY', session=session)
+        job = Job(client=client, id=1)
+        results = client.bulk([job, 2, 3], concurrency=2).pause()
+        self.assertEqual(session.request.call_count, 3)
+        self.assertIs(results[0].job, job)
+        self.assertEqual([r.job.id for r in results], [1, 2, 3])
+        self.assertEqual([r.ok for r in results], [True, False, True])
+        self.assertEqual(results[2].result, {'paused': True})
+        self.assertIsInstance(results[1].error, ApiError)
+        self.assertTrue(session.request.call_args_list[0][1]['url']
+                        .endswith('/jobs/1/pause.json'))
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        sleep = mock.patch('crowdflower.client.time.sleep')
+        sleep.start()
+        self.addCleanup(sleep.stop)
+        self.session = mock.Mock()
+        self.client = Client('KEY', session=self.session, metrics=True)
+
+    def test_metrics(self):
+        """
+        Calls are counted per endpoint template and method.
+        """
+        failed = mock_response(status_code=503)
+        failed.headers = {}
+        self.session.request.side_effect = [
+            failed, mock_response({'1': {}}), mock_response({'2': {}}),
+            mock_response({'error': 'FAIL'}),
+        ]
+        self.client.jobs[1].units()
+        self.client.jobs[2].units()
+        with self.assertRaises(ApiError):
+            self.client.jobs[1].units[5](data=b'12345', method='put')
+
+        metrics = self.client.metrics.as_dict()
+        self.assertEqual(sorted(metrics),
+                         ['jobs/{id}/units', 'jobs/{id}/units/{id}'])
+        units = metrics['jobs/{id}/units']['GET']
+        self.assertEqual(units['requests'], 2)
+        self.assertEqual(units['retries'], 1)
+        self.assertEqual(units['statuses'], {200: 2})
+        self.assertEqual(units['bytes_in'], len(b'{"1": {}}') * 2)
+        self.assertEqual(units['latency']['count'], 2)
+        self.assertEqual(units['decode_time']['count'], 2)
+        unit = metrics['jobs/{id}/units/{id}']['PUT']
+        self.assertEqual(unit['errors'], 1)
+        self.assertEqual(unit['bytes_out'], 5)
+
+        text = self.client.metrics.to_prometheus()
+        self.assertIn('crowdflower_requests_total{endpoint="jobs/{id}/units",'
+                      'method="GET",status="200"} 2\n', text)
+        self.assertIn('crowdflower_request_duration_seconds_bucket{'
+                      'endpoint="jobs/{id}/units",le="+Inf",method="GET"} 2\n',
+                      text)
+
+    def test_hooks(self):
+        """
+        Hooks see the call before and after, failing hooks are ignored.
+        """
+        self.session.request.return_value = mock_response({})
+        seen = []
+
+        def before(info):
+            seen.append(('before', info.endpoint, info.status))
+            raise RuntimeError("hook failure")
+
+        def after(info):
+            seen.append(('after', info.endpoint, info.status))
+
+        self.client.add_hook('before', before)
+        self.client.add_hook('after', after)
+        self.client.jobs[1].ping()
+        self.assertEqual(seen, [('before', 'jobs/{id}/ping', None),
+                                ('after', 'jobs/{id}/ping', 200)])
+
+        client = Client('KEY', session=self.session)
+        self.assertIsNone(client._hooks)
+        client.add_hook('after', after)
+        client.remove_hook('after', after)
+        self.assertIsNone(client._hooks)
+
+    def test_hook_removed_during_call(self):
+        """
+        Removing the last hook during a call does not break the call.
+        """
+        self.session.request.return_value = mock_response({'done': True})
+        client = Client('KEY', session=self.session)
+
+        def before(info):
+            client.remove_hook('before', before)
+
+        client.add_hook('before', before)
+        self.assertEqual(client.jobs[1].ping(), {'done': True})
+        self.assertIsNone(client._hooks)
+
+    def test_endpoint_template(self):
+        """
+        Ids and the JSON suffix are removed from endpoints, other suffixes
+        kept.
+        """
+        self.assertEqual(endpoint_template('jobs/123/units/456.json'),
+                         'jobs/{id}/units/{id}')
+        self.assertEqual(endpoint_template('jobs/123.csv'), 'jobs/{id}.csv')
+        self.assertEqual(endpoint_template('jobs/123/ping'), 'jobs/{id}/ping')
+
+
+class TestRetries(unittest.TestCase):
+
+    def setUp(self):
+        self.session = mock.Mock()
+        sleep = mock.patch('crowdflower.client.time.sleep')
+        self.sleep = sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def test_retry_after(self):
+        """
+        Throttled idempotent requests are retried honoring Retry-After.
+        """
+        throttled = mock_response(status_code=429)
+        throttled.headers = {'Retry-After': '2'}
+        self.session.request.side_effect = [throttled,
+                                            mock_response({'id': 1})]
+        client = Client('KEY', session=self.session)
+        self.assertEqual(client.jobs[1](), {'id': 1})
+        self.sleep.assert_called_once_with(2.0)
+
+    def test_retry_after_capped(self):
+        """
+        Retry-After is capped to the maximum backoff.
+        """
+        throttled = mock_response(status_code=503)
+        throttled.headers = {'Retry-After': '86400'}
+        self.session.request.side_effect = [throttled,
+                                            mock_response({'id': 1})]
+        client = Client('KEY', session=self.session,
+                        retries=RetryPolicy(max_backoff=30))
+        self.assertEqual(client.jobs[1](), {'id': 1})
+        self.sleep.assert_called_once_with(30)
+
+    def test_post_not_retried(self):
+        """
+        Non idempotent requests are not retried by default.
+        """
+        failed = mock_response(status_code=503)
+        failed.raise_for_status.side_effect = Exception("503")
+        self.session.request.return_value = failed
+        client = Client('KEY', session=self.session)
+        with self.assertRaises(ApiError):
+            client.jobs[1].copy(method='post')
+
+        self.assertEqual(self.session.request.call_count, 1)
+
+    def test_paging_survives_throttling(self):
+        """
+        Paged calls continue from the same page after a retry.
+        """
+        throttled = mock_response(status_code=503)
+        throttled.headers = {}
+        self.session.request.side_effect = [
+            mock_response([{'id': 1}]), throttled, mock_response([{'id': 2}]),
+            mock_response([])]
+        client = Client('KEY', session=self.session)
+        self.assertEqual([job.id for job in client.get_jobs()], [1, 2])
+        pages = [kwgs['params']['page'] for _, kwgs in
+                 self.session.request.call_args_list]
+        self.assertEqual(pages, [1, 2, 2, 3])
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_reserve(self):
+        """
+        Tokens are handed out at the configured rate after a burst.
+        """
+        now = [0.0]
+        bucket = TokenBucket(2, capacity=2, clock=lambda: now[0])
+        self.assertEqual([bucket.reserve() for _ in range(4)],
+                         [0.0, 0.0, 0.5, 1.0])
+        now[0] = 2.0
+        self.assertEqual(bucket.reserve(), 0.0)
+
+
+class TestTimeouts(unittest.TestCase):
+
+    def test_default_timeout(self):
+        """
+        Requests are sent with a timeout.
+        """
+        session = mock.Mock()
+        session.request.return_value = mock_response({})
+        Client('KEY', session=session).jobs[1]()
+        _, kwgs = session.request.call_args
+        self.assertEqual(kwgs['timeout'], Client.DEFAULT_TIMEOUT)
+
+    def test_deadline_caps_timeout(self):
+        """
+        Timeouts are capped to the time remaining until the deadline.
+        """
+        session = mock.Mock()
+        session.request.return_value = mock_response({})
+        Client('KEY', session=session).jobs[1](deadline=5)
+        _, kwgs = session.request.call_args
+        self.assertTrue(all(0 < t <= 5 for t in kwgs['timeout']))
+
+    def test_deadline_stops_retries(self):
+        """
+        No retries are made past the deadline.
+        """
+        session = mock.Mock()
+        session.request.side_effect = requests.exceptions.ConnectionError()
+        client = Client('KEY', session=session,
+                        retries=RetryPolicy(total=10, backoff_factor=10))
+        with self.assertRaises(ApiError):
+            client.jobs[1](deadline=0.5)
+
+        self.assertLess(session.request.call_count, 10)
+
+    def test_hedged_get(self):
+        """
+        A slow GET is hedged with a duplicate and the first answer wins.
+        """
+        responses = [mock_response({'slow': True}),
+                     mock_response({'slow': False})]
+
+        def request(**kwgs):
+            resp = responses.pop(0)
+            if resp.json()['slow']:
+                time.sleep(0.5)
+
+            return resp
+
+        session = mock.Mock()
+        session.request.side_effect = request
+        hedge = HedgePolicy(delay=0.05)
+        client = Client('KEY', session=session, hedge=hedge)
+        self.assertEqual(client.jobs[1](), {'slow': False})
+        self.assertEqual((hedge.hedged, hedge.won), (1, 1))
+        client.close()
+
+    def test_hedge_respects_rate_limit(self):
+        """
+        Duplicates are not sent, if the rate limit has no tokens left.
+        """
+        def request(**kwgs):
+            time.sleep(0.2)
+            return mock_response({'id': 1})
+
+        session = mock.Mock()
+        session.request.side_effect = request
+        hedge = HedgePolicy(delay=0.01)
+        client = Client('KEY', session=session, hedge=hedge,
+                        rate_limit=TokenBucket(0.001, 1))
+        self.assertEqual(client.jobs[1](), {'id': 1})
+        self.assertEqual(session.request.call_count, 1)
+        self.assertEqual(hedge.hedged, 0)
+        client.close()
+
+    def test_hedge_queued_not_duplicated(self):
+        """
+        Requests waiting for a thread of the pool are not hedged for
+        being queued.
+        """
+        def request(**kwgs):
+            time.sleep(0.1)
+            return mock_response({'id': 1})
+
+        session = mock.Mock()
+        session.request.side_effect = request
+        hedge = HedgePolicy(delay=0.15)
+        client = Client('KEY', session=session, hedge=hedge,
+                        pool_maxsize=1)
+        threads = [threading.Thread(target=client.jobs[1])
+                   for _ in range(3)]
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        client.close()
+        self.assertEqual(session.request.call_count, 3)
+        self.assertEqual(hedge.hedged, 0)
+
+    def test_hedge_pools_created_once(self):
+        """
+        Concurrent first calls share the thread pools.
+        """
+        client = Client('KEY', session=mock.Mock(), hedge=0.1)
+        pools = []
+        barrier = threading.Barrier(4)
+
+        def first_call():
+            barrier.wait()
+            pools.append(client._hedge_pools())
+
+        threads = [threading.Thread(target=first_call) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertTrue(all(p is pools[0] for p in pools))
+        client.close()
+        self.assertIsNone(client._hedge_executors)
+
+    def test_try_acquire(self):
+        bucket = TokenBucket(1, 2, clock=lambda: 0)
+        self.assertTrue(bucket.try_acquire())
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+        self.assertEqual(bucket.reserve(), 1.0)
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.session = mock.Mock()
+        self.client = Client('KEY', session=self.session, cache=True)
+
+    def _cacheable(self, data):
+        resp = mock_response(data)
+        resp.headers = {'ETag': '"v1"'}
+        return resp
+
+    def test_not_modified_reuses_body(self):
+        """
+        A 304 reply to a revalidation reuses the cached body.
+        """
+        not_modified = self._cacheable(None)
+        not_modified.status_code = 304
+        self.session.request.side_effect = [
+            self._cacheable({'id': 1, 'title': 'TITLE'}), not_modified]
+        self.assertEqual(self.client.get_job(1).title, 'TITLE')
+        self.assertEqual(self.client.get_job(1).title, 'TITLE')
+        _, kwgs = self.session.request.call_args
+        self.assertEqual(kwgs['headers']['If-None-Match'], '"v1"')
+
+    def test_not_modified_refreshes_entry(self):
+        """
+        A 304 reply restarts the TTL of the entry with new validators.
+        """
+        now = [0]
+        self.client = Client('KEY', session=self.session,
+                             cache=ResponseCache(ttl=10,
+                                                 clock=lambda: now[0]))
+        not_modified = mock_response(status_code=304)
+        not_modified.headers = {'ETag': '"v2"'}
+        self.session.request.side_effect = [
+            self._cacheable({'id': 1, 'title': 'TITLE'}), not_modified,
+            not_modified]
+        self.client.get_job(1)
+        now[0] = 9
+        self.client.get_job(1)
+        now[0] = 15
+        self.assertEqual(self.client.get_job(1).title, 'TITLE')
+        _, kwgs = self.session.request.call_args
+        self.assertEqual(kwgs['headers']['If-None-Match'], '"v2"')
+
+    def test_changes_invalidate(self):
+        """
+        Changes to a resource invalidate related cached responses.
+        """
+        self.session.request.side_effect = [
+            self._cacheable({'id': 1}), self._cacheable({'id': 2}),
+            mock_response({})]
+        self.client.get_job(1)
+        self.client.get_unit(Job(id=1), 2)
+        self.assertEqual(len(self.client.cache), 2)
+        self.client.cancel_unit(1, 2)
+        self.assertEqual(len(self.client.cache), 0)
+
+    def test_ttl_and_lru_eviction(self):
+        """
+        Entries expire after TTL and the least recently used are evicted.
+        """
+        now = [0]
+        cache = ResponseCache(maxsize=2, ttl=10, clock=lambda: now[0])
+        cache.set('a', b'a')
+        cache.set('b', b'b')
+        cache.get('a')
+        cache.set('c', b'c')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a').content, b'a')
+        now[0] = 10
+        self.assertIsNone(cache.get('a'))
+
+
+class TestCoalescing(unittest.TestCase):
+
+    def test_concurrent_calls_coalesced(self):
+        """
+        Concurrent identical GET calls share a single request and result.
+        """
+        release = threading.Event()
+
+        def request(**kwgs):
+            release.wait(5)
+            return mock_response({'done': False})
+
+        session = mock.Mock()
+        session.request.side_effect = request
+        client = Client('KEY', session=session, coalesce=True)
+        job = Job(client=client, id=1)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(job.ping()))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+
+        while client.single_flight.coalesced < 4:
+            time.sleep(0.01)
+
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(session.request.call_count, 1)
+        self.assertTrue(all(r is results[0] for r in results))
+        self.assertEqual(client.single_flight.stats(),
+                         dict(calls=1, coalesced=4))
+
+    def test_aborted_leader(self):
+        """
+        Waiters fail, if the leading call is aborted by a BaseException.
+        """
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        errors = []
+
+        def leader():
+            started.set()
+            release.wait(5)
+            raise KeyboardInterrupt
+
+        def lead():
+            try:
+                flight.do('key', leader)
+
+            except KeyboardInterrupt:
+                pass
+
+        def wait():
+            try:
+                errors.append(flight.do('key', lambda: 'not called'))
+
+            except RuntimeError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=lead)]
+        threads[0].start()
+        started.wait(5)
+        threads.append(threading.Thread(target=wait))
+        threads[1].start()
+        while flight.coalesced < 1:
+            time.sleep(0.01)
+
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertIsInstance(errors[0], RuntimeError)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import sys
+import types
+import unittest
+from crowdflower.codec import CODECS, JsonCodec, get_codec
+
+try:
+    from unittest import mock
+
+except ImportError:
+    import mock
+
+
+class TestCodecs(unittest.TestCase):
+
+    def test_round_trip(self):
+        """
+        Installed codecs decode bytes and encode to UTF-8 bytes.
+        """
+        obj = {u'text': u'äö', u'n': [1, 2.5, None, True]}
+        for name in CODECS:
+            try:
+                codec = get_codec(name)
+
+            except ValueError:
+                continue
+
+            data = codec.dumps(obj)
+            self.assertIsInstance(data, bytes, name)
+            self.assertEqual(codec.loads(data), obj, name)
+            self.assertEqual(codec.loads(data.decode('utf-8')), obj, name)
+
+    def test_default_codec(self):
+        """
+        Default codec is the most preferred installed one.
+        """
+        ujson = types.ModuleType('ujson')
+        ujson.loads = ujson.dumps = lambda *args, **kwgs: None
+        # None in sys.modules makes importing raise ImportError
+        with mock.patch.dict(sys.modules, orjson=None, simdjson=None,
+                             ujson=ujson):
+            self.assertEqual(get_codec().name, 'ujson')
+
+        with mock.patch.dict(sys.modules, orjson=None, simdjson=None,
+                             ujson=None):
+            self.assertIs(type(get_codec()), JsonCodec)
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            get_codec('nosuchcodec')
@@ -0,0 +1,111 @@
+import unittest
+from inspect import getmembers
+from crowdflower.base import Attribute, RoAttribute, compact
+from crowdflower.client import Client
+from crowdflower.job import Job
+from crowdflower.judgment import Judgment, CompactJudgment, \
+    CompactJudgmentAggregate
+from crowdflower.unit import Unit, CompactUnit
+
+
+data = {'id': 1,
+        'job_id': 2,
+        'state': 'finalized',
+        'agreement': 0.5,
+        'created_at': '2015-06-24T12:44:51+00:00',
+        'updated_at': '2015-06-27T09:06:16+00:00',
+        'judgments_count': 3,
+        'data': {'text': 'TEXT'},
+        'difficulty': 0,
+        'missed_count': 0,
+        'results': {'sentiment': {'agg': 'pos'}}}
+
+
+class TestCompactResources(unittest.TestCase):
+
+    def setUp(self):
+        self.client = Client('KEY')
+        self.addCleanup(self.client.close)
+        self.job = Job(client=self.client, id=2)
+
+    def test_attributes(self):
+        """
+        Compact resources provide the same attributes and item access.
+        """
+        unit = Unit(self.job, client=self.client, **data)
+        compact = CompactUnit.from_json(self.job, dict(data))
+        for name, _ in getmembers(
+                Unit, lambda x: isinstance(x, Attribute)):
+            self.assertEqual(getattr(compact, name), getattr(unit, name))
+            self.assertEqual(compact[name], unit[name])
+
+        self.assertEqual(compact.get_aggregate('sentiment'), 'pos')
+
+    def test_no_instance_dict(self):
+        """
+        Compact resources have no __dict__ and share changes until changed.
+        """
+        first = CompactUnit(self.job, **data)
+        second = CompactUnit(self.job, **data)
+        self.assertFalse(hasattr(first, '__dict__'))
+        self.assertIs(first._changes, second._changes)
+        self.assertIs(first.client, self.client)
+
+    def test_rw_attributes(self):
+        """
+        Changes to compact resources are kept per instance.
+        """
+        first = CompactUnit(self.job, **data)
+        second = CompactUnit(self.job, **data)
+        first.state = 'canceled'
+        self.assertEqual(first.state, 'canceled')
+        self.assertEqual(second.state, 'finalized')
+        self.assertEqual(first._changes, {'state': 'canceled'})
+
+    def test_ro_attributes(self):
+        """
+        RO attributes of compact resources cannot be set.
+        """
+        judgment = CompactJudgment(self.job, id=1, worker_trust=0.9)
+        for name, _ in getmembers(
+                Judgment, lambda x: type(x) is RoAttribute):
+            with self.assertRaises(AttributeError):
+                setattr(judgment, name, "FAIL")
+
+    def test_aggregate_judgments_cache(self):
+        """
+        Compact aggregates can hold their judgments.
+        """
+        aggregate = CompactJudgmentAggregate(self.job, _ids=[])
+        aggregate._judgments = []
+        self.assertEqual(aggregate.judgments, [])
+
+    def test_inherited_attributes(self):
+        """
+        Attributes and methods inherited from bases are kept.
+        """
+        class Mixin(object):
+            def describe(self):
+                return 'unit {}'.format(self.id)
+
+        class Base(Unit):
+            reviewed = Attribute()
+
+        class Derived(Mixin, Base):
+            pass
+
+        CompactDerived = compact(Derived)
+        unit = CompactDerived(self.job, id=5, reviewed=True, state='new')
+        self.assertTrue(unit.reviewed)
+        self.assertEqual(unit.state, 'new')
+        self.assertFalse(hasattr(unit, '__dict__'))
+        self.assertEqual(unit.describe(), 'unit 5')
+
+    def test_client_assignment(self):
+        """
+        The client of a compact resource comes from its job.
+        """
+        unit = CompactUnit(self.job, **data)
+        self.assertIs(unit.client, self.client)
+        with self.assertRaises(AttributeError):
+            unit.client = Client('OTHER')
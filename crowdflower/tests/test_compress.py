@@ -0,0 +1,97 @@
+import gzip
+import io
+import json
+import os
+import tempfile
+import unittest
+from crowdflower.client import Client, _replayable
+from crowdflower.compress import GzipBody, compress_level, gzip_bytes
+from crowdflower.transport import MemoryTransport
+
+
+def _gunzip(data):
+    return gzip.GzipFile(fileobj=io.BytesIO(data)).read()
+
+
+class TestGzipBody(unittest.TestCase):
+
+    data = b''.join(json.dumps({'id': i, 'text': 'Row {}'.format(i)})
+                    .encode('utf-8') + b'\n' for i in range(1000))
+
+    def test_bytes(self):
+        body = GzipBody(self.data, chunk_size=1000)
+        self.assertTrue(body.replayable)
+        self.assertTrue(_replayable(body))
+        compressed = b''.join(body)
+        self.assertEqual(_gunzip(compressed), self.data)
+        self.assertEqual(body.bytes_in, len(self.data))
+        self.assertEqual(body.bytes_out, len(compressed))
+        self.assertLess(body.bytes_out, body.bytes_in // 4)
+        # Iterating again compresses again
+        self.assertEqual(b''.join(body), compressed)
+
+    def test_file(self):
+        body = GzipBody(io.BytesIO(self.data), chunk_size=1000)
+        self.assertFalse(_replayable(body))
+        self.assertEqual(_gunzip(b''.join(body)), self.data)
+
+    def test_chunks(self):
+        chunks = (self.data[i:i + 10] for i in range(0, len(self.data), 10))
+        body = GzipBody(chunks)
+        self.assertFalse(body.replayable)
+        compressed = list(body)
+        self.assertTrue(all(compressed))
+        self.assertEqual(_gunzip(b''.join(compressed)), self.data)
+
+    def test_gzip_bytes(self):
+        self.assertEqual(_gunzip(gzip_bytes(self.data, 1)), self.data)
+        self.assertEqual(_gunzip(gzip_bytes(u'\xe4')), u'\xe4'.encode('utf-8'))
+
+    def test_compress_level(self):
+        self.assertIsNone(compress_level(False))
+        self.assertIsNone(compress_level(None))
+        self.assertEqual(compress_level(True), 6)
+        self.assertEqual(compress_level(9), 9)
+        self.assertRaises(ValueError, compress_level, 10)
+
+
+class TestClientCompress(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = MemoryTransport()
+        self.transport.add_json(
+            'POST', Client.API_URL.format(path='jobs/upload.json'), {'id': 1})
+        self.transport.add_json(
+            'POST', Client.API_URL.format(path='jobs/1/upload.json'),
+            {'id': 1})
+
+    def test_upload_job(self):
+        client = Client('KEY', transport=self.transport, compress=True)
+        rows = [{'id': i} for i in range(100)]
+        client.upload_job(rows)
+
+        request, = self.transport.requests
+        self.assertEqual(request.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            [json.loads(line) for line in
+             _gunzip(request.body).decode('utf-8').splitlines()], rows)
+
+    def test_upload_job_file(self):
+        client = Client('KEY', transport=self.transport, compress=1)
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(b'a,b\n1,2\n')
+
+        client.upload_job_file(path, job_id=1)
+        request, = self.transport.requests
+        self.assertEqual(request.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(_gunzip(request.body), b'a,b\n1,2\n')
+
+    def test_disabled(self):
+        client = Client('KEY', transport=self.transport)
+        client.upload_job([{'id': 1}])
+
+        request, = self.transport.requests
+        self.assertNotIn('Content-Encoding', request.headers)
+        self.assertEqual(json.loads(request.body.decode('utf-8')), {'id': 1})
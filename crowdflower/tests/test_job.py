@@ -111,3 +111,14 @@ class TestJobAttributes(unittest.TestCase):
             self.assertEqual(job._changes[name], v)
             with self.assertRaises(AttributeError):
                 getattr(job, name)
+
+    def test_changed_attribute_missing_from_json(self):
+        """
+        Attributes set, but missing from JSON data, can be read.
+        """
+        job = Job(client=None, id=1)
+        job.title = 'TITLE'
+        self.assertEqual(job.title, 'TITLE')
+        self.assertEqual(job['title'], 'TITLE')
+        with self.assertRaises(KeyError):
+            job.instructions
@@ -0,0 +1,123 @@
+import datetime
+import unittest
+from crowdflower.client import Client
+from crowdflower.job import Job
+from crowdflower.store import Store, _parse_timestamp
+from crowdflower.tests.helpers import mock_response
+
+try:
+    from unittest import mock
+
+except ImportError:
+    import mock
+
+
+class TestStore(unittest.TestCase):
+
+    def setUp(self):
+        self.aggregates = {
+            '1': {'_ids': [10, 11], '_state': 'finalized',
+                  '_updated_at': '2015-06-27T09:00:00+00:00'},
+            '2': {'_ids': [12], '_state': 'judgable',
+                  '_updated_at': '2015-06-27T10:00:00+00:00'},
+        }
+        self.session = mock.Mock()
+        self.session.request.side_effect = self._request
+        self.client = Client('KEY', session=self.session)
+        self.job = Job(client=self.client, id=1, state='running')
+        self.store = Store(client=self.client)
+        self.addCleanup(self.store.close)
+
+    def _request(self, **kwgs):
+        path = kwgs['url'].split('/v1/', 1)[1]
+        first_page = kwgs.get('params', {}).get('page') == 1
+
+        if path == 'jobs/1/units.json':
+            return mock_response({'1': {}, '2': {}, '3': {}}
+                             if first_page else {})
+
+        if path == 'jobs/1/judgments.json':
+            return mock_response(self.aggregates if first_page else {})
+
+        if path == 'jobs/1.json':
+            return mock_response({'id': 1, 'state': 'finished'})
+
+        kind, id_ = path[:-len('.json')].split('/')[2:]
+        id_ = int(id_)
+        if kind == 'units':
+            return mock_response({'id': id_, 'state': 'finalized'})
+
+        return mock_response({'id': id_, 'unit_id': 1 if id_ < 12 else 2,
+                          'worker_id': id_ % 2})
+
+    def _fetched(self):
+        return sorted(c[1]['url'].split('/v1/', 1)[1]
+                      for c in self.session.request.call_args_list
+                      if '.json' in c[1]['url'] and
+                      not c[1].get('params', {}).get('page'))
+
+    def test_sync(self):
+        """
+        Sync mirrors the job, refreshed, and its units, aggregates and
+        judgments.
+        """
+        counts = self.store.sync(self.job, concurrency=2)
+        self.assertEqual(counts, {'units': 3, 'judgment_aggregates': 2,
+                                  'judgments': 3})
+        self.assertEqual(self.store.get_job(1).state, 'finished')
+        self.assertEqual(sorted(u.id for u in self.store.get_units(1)),
+                         [1, 2, 3])
+        self.assertEqual(
+            [a.ids for a in self.store.get_judgmentaggregates(
+                1, state='judgable')], [[12]])
+        self.assertEqual(
+            sorted(j.id for j in self.store.get_judgments(1, unit_id=1)),
+            [10, 11])
+        self.assertEqual(
+            sorted(j.id for j in self.store.get_judgments(1, worker_id=0)),
+            [10, 12])
+
+    def test_incremental_sync(self):
+        """
+        Only units with newer aggregates and judgments not yet stored are
+        fetched on later syncs.
+        """
+        self.store.sync(self.job)
+        self.session.request.reset_mock()
+        self.aggregates['2'] = {'_ids': [12, 13], '_state': 'finalized',
+                                '_updated_at': '2015-06-28T10:00:00+00:00'}
+        counts = self.store.sync(self.job)
+        self.assertEqual(counts, {'units': 1, 'judgment_aggregates': 1,
+                                  'judgments': 1})
+        self.assertEqual(self._fetched(), ['jobs/1.json',
+                                           'jobs/1/judgments/13.json',
+                                           'jobs/1/units/2.json'])
+        self.assertEqual(self.store.connection.execute(
+            "SELECT count(*) FROM judgments").fetchone()[0], 4)
+
+    def test_timestamp_offsets(self):
+        """
+        Timestamps are compared as points in time, not as strings.
+        """
+        self.store.sync(self.job)
+        self.session.request.reset_mock()
+        # 2015-06-27T09:30:00+00:00, earlier than the last sync
+        self.aggregates['1']['_updated_at'] = '2015-06-27T11:30:00+02:00'
+        # 2015-06-27T11:00:00+00:00, later than the last sync
+        self.aggregates['2']['_updated_at'] = '2015-06-27T06:00:00-05:00'
+        counts = self.store.sync(self.job)
+        self.assertEqual(counts['judgment_aggregates'], 1)
+        self.assertEqual(self._fetched(), ['jobs/1.json',
+                                           'jobs/1/units/2.json'])
+
+    def test_parse_timestamp(self):
+        self.assertEqual(
+            _parse_timestamp('2015-06-27T11:30:00.5+02:00'),
+            datetime.datetime(2015, 6, 27, 9, 30, 0, 500000))
+        self.assertEqual(_parse_timestamp('2015-06-27T09:30:00Z'),
+                         datetime.datetime(2015, 6, 27, 9, 30))
+        self.assertIsNone(_parse_timestamp('yesterday'))
+
+    def test_missing_job(self):
+        with self.assertRaises(KeyError):
+            self.store.get_job(2)
@@ -0,0 +1,271 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import requests.exceptions
+from zipfile import ZipFile
+from crowdflower.client import ApiError, Client
+from crowdflower.transport import (
+    MemoryTransport, RecordingTransport, Urllib3Transport)
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients timing out on purpose break pipes
+        pass
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        if self.headers.get('Transfer-Encoding') == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline(), 16)
+                if not size:
+                    self.rfile.readline()
+                    break
+
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+
+            return b''.join(chunks)
+
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def _send(self, body, content_type='application/json', status=200,
+              encoding=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        if encoding is not None:
+            self.send_header('Content-Encoding', encoding)
+
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.startswith('/v1/jobs/1.json'):
+            self._send(json.dumps({'id': 1, 'title': 'Job'}).encode('utf-8'))
+
+        elif self.path.startswith('/v1/jobs/1.csv'):
+            buf = io.BytesIO()
+            with ZipFile(buf, 'w') as zf:
+                zf.writestr('job_1.json', '{"id": 1}\n{"id": 2}')
+
+            self._send(buf.getvalue(), 'application/zip')
+
+        elif self.path.startswith('/v1/jobs/2.json'):
+            # Compressed, if the client accepts gzip
+            body = json.dumps({'id': 2, 'title': 'x' * 10000})
+            if 'gzip' in self.headers.get('Accept-Encoding', ''):
+                buf = io.BytesIO()
+                with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+                    f.write(body.encode('utf-8'))
+
+                self._send(buf.getvalue(), encoding='gzip')
+
+            else:
+                self._send(body.encode('utf-8'))
+
+        elif self.path.startswith('/v1/slow.json'):
+            time.sleep(0.5)
+            self._send(b'{}')
+
+        else:
+            self._send(b'{"error": {"message": "Not found"}}', status=404)
+
+    def do_POST(self):
+        body = self._read_body()
+        self._send(json.dumps({
+            'id': 1, 'units_count': body.count(b'\n'),
+            'chunked': self.headers.get('Transfer-Encoding') == 'chunked',
+        }).encode('utf-8'))
+
+
+class TestUrllib3Transport(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = _Server(('127.0.0.1', 0), _Handler)
+        thread = threading.Thread(target=cls.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        cls.url = 'http://{}:{}/v1/{{path}}'.format(
+            *cls.server.server_address[:2])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.client = Client('KEY', transport=Urllib3Transport(),
+                             retries=0)
+        self.client.API_URL = self.url
+        self.addCleanup(self.client.close)
+
+    def test_get(self):
+        job = self.client.get_job(1)
+        self.assertEqual(job.title, 'Job')
+
+    def test_error(self):
+        with self.assertRaises(ApiError) as cm:
+            self.client.call('jobs/3.json')
+
+        self.assertEqual(cm.exception.response.status_code, 404)
+
+    def test_chunked_upload(self):
+        """
+        Iterables of rows are sent chunked.
+        """
+        job = self.client.upload_job([{'a': 1}, {'a': 2}], 1)
+        self.assertEqual(job.id, 1)
+
+        resp = self.client.transport.request(
+            'POST', self.url.format(path='jobs/1/upload.json'),
+            data=(row for row in [b'a\n', b'b\n', b'c\n']))
+        self.assertEqual(resp.json(), {'id': 1, 'units_count': 3,
+                                       'chunked': True})
+
+    def test_streamed_report(self):
+        job = self.client.get_job(1)
+        rows = list(self.client.iter_report(job))
+        self.assertEqual([row['id'] for row in rows], [1, 2])
+
+    def test_gzip_response(self):
+        """
+        Compressed responses are negotiated and decompressed, also when
+        streamed.
+        """
+        job = self.client.get_job(2)
+        self.assertEqual(job.title, 'x' * 10000)
+
+        resp = self.client.transport.request(
+            'GET', self.url.format(path='jobs/2.json'), stream=True)
+        self.assertEqual(resp.headers['Content-Encoding'], 'gzip')
+        self.assertLess(int(resp.headers['Content-Length']), 1000)
+        chunks = list(resp.iter_content(1024))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(json.loads(b''.join(chunks).decode('utf-8'))['id'],
+                         2)
+
+    def test_gzip_response_metrics(self):
+        """
+        Compressed responses are counted both decompressed and as
+        received.
+        """
+        client = Client('KEY', transport=Urllib3Transport(), retries=0,
+                        metrics=True)
+        client.API_URL = self.url
+        self.addCleanup(client.close)
+        client.get_job(2)
+        job = client.metrics.as_dict()['jobs/{id}']['GET']
+        self.assertGreater(job['bytes_in'], 10000)
+        self.assertLess(job['wire_bytes_in'], 1000)
+
+    def test_compressed_upload_metrics(self):
+        """
+        Chunked compressed uploads are counted as sent.
+        """
+        client = Client('KEY', transport=Urllib3Transport(), retries=0,
+                        compress=True, metrics=True)
+        client.API_URL = self.url
+        self.addCleanup(client.close)
+        rows = [{'id': i} for i in range(1000)]
+        client.upload_job(iter(rows))
+        upload = client.metrics.as_dict()['jobs/upload']['POST']
+        self.assertGreater(upload['bytes_out'], 0)
+        self.assertLess(upload['bytes_out'], len(rows) * len('{"id": 0}'))
+
+    def test_timeout(self):
+        with self.assertRaises(requests.exceptions.Timeout):
+            self.client.transport.request(
+                'GET', self.url.format(path='slow.json'), timeout=0.05)
+
+    def test_connection_error(self):
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.client.transport.request(
+                'GET', 'http://127.0.0.1:1/v1/jobs.json', timeout=1)
+
+
+class TestMemoryTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = MemoryTransport()
+        self.client = Client('KEY', transport=self.transport)
+
+    def test_replay(self):
+        """
+        Responses are matched ignoring the API key and replayed in order,
+        repeating the last one.
+        """
+        url = Client.API_URL.format(path='jobs/1.json')
+        self.transport.add_json('GET', url, {'id': 1, 'state': 'running'})
+        self.transport.add_json('GET', url, {'id': 1, 'state': 'finished'})
+
+        states = [self.client.get_job(1).state for _ in range(3)]
+        self.assertEqual(states, ['running', 'finished', 'finished'])
+        self.assertEqual(len(self.transport.requests), 3)
+        self.assertEqual(self.transport.requests[0].method, 'GET')
+
+    def test_query(self):
+        url = Client.API_URL.format(path='jobs.json')
+        self.transport.add_json('GET', url, [{'id': 1}],
+                                query={'page': 1, 'limit': 100})
+        self.transport.add_json('GET', url, [],
+                                query={'page': 2, 'limit': 100})
+
+        self.assertEqual([job.id for job in self.client.get_jobs()], [1])
+
+    def test_request_body(self):
+        url = Client.API_URL.format(path='jobs/upload.json')
+        self.transport.add_json('POST', url, {'id': 2})
+
+        self.client.upload_job([{'a': 1}, {'a': 2}])
+        body = self.transport.requests[0].body
+        self.assertEqual(body.count(b'\n'), 2)
+
+    def test_missing(self):
+        client = Client('KEY', transport=self.transport, retries=0)
+        with self.assertRaises(ApiError) as cm:
+            client.get_job(1)
+
+        self.assertIsNone(cm.exception.response)
+        self.assertEqual(len(self.transport.requests), 1)
+
+    def test_record_and_replay(self):
+        url = Client.API_URL.format(path='jobs/1.json')
+        self.transport.add_json('GET', url, {'id': 1, 'title': 'Job'})
+        recorder = RecordingTransport(self.transport)
+        Client('KEY', transport=recorder).get_job(1)
+
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'traffic.json')
+        recorder.save(path)
+
+        replay = MemoryTransport.load(path)
+        job = Client('KEY', transport=replay).get_job(1)
+        self.assertEqual(job.title, 'Job')
@@ -0,0 +1,181 @@
+import itertools
+import time
+import unittest
+from crowdflower.watch import JobWatcher, wait_until_complete
+
+try:
+    from unittest import mock
+
+except ImportError:
+    import mock
+
+
+class _Clock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _job(id_, statuses):
+    job = mock.Mock()
+    job.id = id_
+    job.ping.side_effect = statuses
+    return job
+
+
+def _status(done, needed):
+    return {'all_judgments': done, 'needed_judgments': needed}
+
+
+class TestJobWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = _Clock()
+
+    def test_events(self):
+        """
+        Progress and completion callbacks receive events with rates.
+        """
+        watcher = JobWatcher(min_interval=1, max_rate=10, clock=self.clock)
+        job = _job(1, [_status(0, 100), _status(50, 50), _status(100, 0)])
+        progress, complete = [], []
+        watcher.watch(job, on_progress=progress.append,
+                      on_complete=complete.append)
+
+        while len(watcher):
+            delay = watcher.poll()
+            if delay is not None:
+                self.clock.now += delay
+
+        self.assertEqual([e.complete for e in progress], [False, False, True])
+        self.assertIsNone(progress[0].rate)
+        self.assertEqual(len(complete), 1)
+        self.assertIs(complete[0].job, job)
+        self.assertEqual(watcher.pings, 3)
+
+    def test_adaptive_interval(self):
+        """
+        Intervals follow the judgment rate and back off when stalled.
+        """
+        watcher = JobWatcher(min_interval=1, max_interval=1000, max_rate=10,
+                             clock=self.clock)
+        job = _job(1, [_status(0, 1000), _status(100, 900),
+                       _status(100, 900), _status(100, 900)])
+        watcher.watch(job)
+        delays = []
+        for _ in range(4):
+            delay = watcher.poll()
+            delays.append(delay)
+            self.clock.now += delay
+
+        # 100 judgments/s and 900 needed: poll again in 4.5 s, then the
+        # smoothed rate halves on each stalled poll
+        self.assertEqual(delays, [1, 4.5, 9, 18])
+
+    def test_bounded_rate(self):
+        """
+        Total ping rate stays under max_rate with many jobs.
+        """
+        watcher = JobWatcher(min_interval=1, max_rate=5, concurrency=10,
+                             clock=self.clock)
+        jobs = [_job(i, itertools.repeat(_status(0, 10)))
+                for i in range(50)]
+        for job in jobs:
+            watcher.watch(job)
+
+        while self.clock.now < 100:
+            self.clock.now += watcher.poll()
+
+        self.assertLessEqual(watcher.pings, 5 * 100 + 10)
+
+    def test_wait_until_complete(self):
+        """
+        Waiting returns complete and pending jobs.
+        """
+        done = _job(1, [_status(5, 0)])
+        stuck = _job(2, itertools.repeat(_status(0, 5)))
+        complete, pending = wait_until_complete(
+            [done, stuck], timeout=0.1, min_interval=0.01, max_rate=100)
+        self.assertEqual(complete, {done})
+        self.assertEqual(pending, {stuck})
+
+    def test_background(self):
+        """
+        A background watcher serves waits from other threads.
+        """
+        watcher = JobWatcher(min_interval=0.01, max_rate=100)
+        watcher.start()
+        self.addCleanup(watcher.stop)
+        job = _job(1, [_status(0, 5), _status(5, 0)])
+        complete, pending = watcher.wait_until_complete([job], timeout=5)
+        self.assertEqual(complete, {job})
+        self.assertFalse(pending)
+
+    def test_callback_errors(self):
+        """
+        Failing callbacks and completion checks are logged and do not
+        stop polling.
+        """
+        def fail(event):
+            raise ValueError("callback")
+
+        watcher = JobWatcher(min_interval=1, max_rate=10, clock=self.clock)
+        job = _job(1, [_status(0, 10), _status(10, 0)])
+        complete = []
+        watcher.watch(job, on_progress=fail)
+        watcher.watch(job, on_complete=fail)
+        watcher.watch(job, on_complete=complete.append)
+
+        with mock.patch('crowdflower.watch._log') as log:
+            while len(watcher):
+                self.clock.now += watcher.poll() or 0
+
+        self.assertEqual(len(complete), 1)
+        self.assertEqual(log.exception.call_count, 3)
+
+        def is_complete(status):
+            raise KeyError('needed_judgments')
+
+        watcher = JobWatcher(min_interval=1, max_rate=10, clock=self.clock,
+                             is_complete=is_complete)
+        watcher.watch(_job(2, itertools.repeat(_status(0, 10))))
+        with mock.patch('crowdflower.watch._log') as log:
+            watcher.poll()
+
+        self.assertEqual(len(watcher), 1)
+        self.assertEqual(log.exception.call_count, 1)
+
+    def test_wait_timeout_unwatches(self):
+        """
+        Timed out waits stop watching the pending jobs they started
+        watching, and remove their callbacks from others.
+        """
+        watcher = JobWatcher(min_interval=0.01, max_rate=100)
+        stuck = _job(1, itertools.repeat(_status(0, 5)))
+        other = _job(2, itertools.repeat(_status(0, 5)))
+        on_complete = mock.Mock()
+        watcher.watch(other, on_complete=on_complete)
+
+        complete, pending = watcher.wait_until_complete(
+            [stuck, other], timeout=0.05)
+        self.assertEqual(pending, {stuck, other})
+        self.assertEqual(len(watcher), 1)
+        self.assertEqual(watcher._watches[other].on_complete, [on_complete])
+
+    def test_wait_duplicates(self):
+        """
+        Duplicate jobs are waited for once.
+        """
+        watcher = JobWatcher(min_interval=0.01, max_rate=100)
+        watcher.start()
+        self.addCleanup(watcher.stop)
+        job = _job(1, [_status(0, 5), _status(5, 0)])
+        started = time.time()
+        complete, pending = watcher.wait_until_complete([job, job],
+                                                        timeout=5)
+        self.assertLess(time.time() - started, 1)
+        self.assertEqual(complete, {job})
+        self.assertFalse(pending)
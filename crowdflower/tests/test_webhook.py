@@ -0,0 +1,65 @@
+import asyncio
+import unittest
+
+try:
+    from crowdflower.client import Client
+    from crowdflower.judgment import Judgment
+    from crowdflower.unit import Unit
+    from crowdflower.webhook import WebhookReceiver, post_payload
+
+except (ImportError, SyntaxError):
+    WebhookReceiver = None
+
+
+@unittest.skipIf(WebhookReceiver is None, "aiohttp not installed")
+class TestWebhookReceiver(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.client = Client('KEY')
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def test_receive(self):
+        """
+        Signed payloads are parsed to models and iterated in order.
+        """
+        async def go():
+            async with WebhookReceiver(self.client, port=0) as receiver:
+                statuses = [
+                    await post_payload(receiver.url, 'new_judgments', [
+                        {'id': 1, 'job_id': 5, 'unit_id': 2},
+                        {'id': 2, 'job_id': 5, 'unit_id': 2},
+                    ], key='KEY'),
+                    await post_payload(receiver.url, 'unit_complete',
+                                       {'id': 2, 'job_id': 5}, key='KEY'),
+                    await post_payload(receiver.url, 'new_judgments',
+                                       [{'id': 3}], key='WRONG'),
+                ]
+
+            return statuses, [item async for item in receiver]
+
+        statuses, items = self.run_async(go())
+        self.assertEqual(statuses, [200, 200, 403])
+        self.assertEqual([type(i) for i in items], [Judgment, Judgment, Unit])
+        self.assertEqual([i.id for i in items], [1, 2, 2])
+        self.assertIs(items[0].job, items[2].job)
+        self.assertEqual(items[0].job.id, 5)
+        self.assertIs(items[0].client, self.client)
+
+    def test_backpressure(self):
+        """
+        Requests are rejected with 503 while the queue stays full.
+        """
+        async def go():
+            async with WebhookReceiver(self.client, port=0, maxsize=1,
+                                       put_timeout=0.05) as receiver:
+                return [await post_payload(receiver.url, 'job_complete',
+                                           {'id': i}, key='KEY')
+                        for i in range(2)]
+
+        self.assertEqual(self.run_async(go()), [200, 503])
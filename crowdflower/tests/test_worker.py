@@ -0,0 +1,147 @@
+import os
+import tempfile
+import unittest
+from crowdflower.bulk import Journal
+from crowdflower.client import Client
+from crowdflower.job import Job
+from crowdflower.tests.helpers import mock_response
+
+try:
+    from unittest import mock
+
+except ImportError:
+    import mock
+
+
+class TestWorkerCommands(unittest.TestCase):
+
+    def setUp(self):
+        self.session = mock.Mock()
+        self.session.request.return_value = mock_response({})
+        self.job = Job(client=Client('KEY', session=self.session), id=1)
+        self.worker = self.job.get_worker(2)
+
+    def test_bind_arguments(self):
+        """
+        Arguments are bound to POST data with defaults.
+        """
+        self.worker.bonus(100)
+        self.worker.flag(persist=True, flag='spam')
+        (_, bonus), (_, flag) = self.session.request.call_args_list
+        self.assertEqual(bonus['data'], {'amount': 100, 'reason': None})
+        self.assertEqual(flag['data'], {'flag': 'spam', 'persist': True})
+        self.assertEqual(flag['method'], 'put')
+
+    def test_bind_errors(self):
+        """
+        Invalid arguments raise a TypeError before sending.
+        """
+        for args, kwgs in [((), {}), ((1, 2, 3), {}), ((1,), {'amount': 1}),
+                           ((1,), {'foo': 1})]:
+            with self.assertRaises(TypeError):
+                self.worker.bonus(*args, **kwgs)
+
+        self.assertFalse(self.session.request.called)
+
+
+class TestBulkWorkerActions(unittest.TestCase):
+
+    def setUp(self):
+        self.session = mock.Mock()
+        self.client = Client('KEY', session=self.session)
+        self.job = Job(client=self.client, id=1)
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        os.remove(self.path)
+        self.addCleanup(lambda: os.path.exists(self.path) and
+                        os.remove(self.path))
+
+    def test_actions(self):
+        """
+        Actions are run concurrently with per item results.
+        """
+        self.session.request.return_value = mock_response({'ok': True})
+        workers = [self.job.get_worker(i) for i in range(5)]
+        results = self.client.bulk_workers(
+            [(w, 'bonus', (100,)) for w in workers] +
+            [(workers[0], 'notify', {'message': 'Hi'}),
+             (workers[0], 'bonus', ()),
+             (workers[0], 'nope', ())],
+            concurrency=3)
+        self.assertEqual(self.session.request.call_count, 6)
+        self.assertEqual([r.state for r in results],
+                         ['done'] * 6 + ['failed'] * 2)
+        self.assertIsInstance(results[6].error, TypeError)
+        self.assertIsInstance(results[7].error, AttributeError)
+
+    def test_resume(self):
+        """
+        Resuming skips done actions and does not repeat unknown ones.
+        """
+        workers = [self.job.get_worker(i) for i in range(4)]
+        actions = [(w, 'bonus', (100, 'Thanks')) for w in workers]
+        # Paying the same worker twice is intended
+        actions.append(actions[0])
+        self.session.request.side_effect = [
+            mock_response({}), mock_response({}),
+            mock_response({'error': 'FAIL'}),
+        ]
+        with mock.patch('crowdflower.bulk.bounded_map',
+                        lambda fn, items, c: map(fn, items[:3])):
+            self.client.bulk_workers(actions, journal=self.path)
+
+        # Simulate a crash after sending the fourth bonus
+        with Journal(self.path) as journal:
+            journal.record('1/3/bonus/{"amount": 100, "reason": "Thanks"}#0',
+                           'started')
+
+        self.session.request.reset_mock()
+        self.session.request.side_effect = None
+        self.session.request.return_value = mock_response({})
+        results = self.client.bulk_workers(actions, journal=self.path)
+        self.assertEqual([r.state for r in results],
+                         ['skipped', 'skipped', 'done', 'unknown', 'done'])
+        # The failed and the repeated bonus are sent
+        self.assertEqual(self.session.request.call_count, 2)
+
+        self.session.request.reset_mock()
+        results = self.client.bulk_workers(actions, journal=self.path,
+                                           retry_unknown=True)
+        self.assertEqual([r.state for r in results],
+                         ['skipped', 'skipped', 'skipped', 'done', 'skipped'])
+        self.assertEqual(self.session.request.call_count, 1)
+
+    def test_unknown_outcome(self):
+        """
+        Non idempotent actions failing with a server error or without
+        a response are in unknown state, client errors failed.
+        """
+        workers = [self.job.get_worker(i) for i in range(3)]
+        self.session.request.side_effect = [
+            mock_response({'error': 'Bad request'}, 400),
+            mock_response({'error': 'Internal error'}, 500),
+            IOError('Connection reset'),
+        ]
+        client = Client('KEY', session=self.session, retries=0)
+        with mock.patch('crowdflower.bulk.bounded_map',
+                        lambda fn, items, c: map(fn, items)):
+            results = client.bulk_workers(
+                [(w, 'bonus', (100,)) for w in workers])
+
+        self.assertEqual([r.state for r in results],
+                         ['failed', 'unknown', 'unknown'])
+
+    def test_bound_arguments_sent(self):
+        """
+        Arguments bound when preparing are sent as is, without binding
+        them again.
+        """
+        self.session.request.return_value = mock_response({})
+        worker = self.job.get_worker(1)
+        callargs = {'amount': 100, 'reason': 'Hi'}
+        with mock.patch('crowdflower.worker.Worker.bonus.bind',
+                        return_value=callargs):
+            results = self.client.bulk_workers([(worker, 'bonus', (1,))])
+
+        self.assertEqual(results[0].state, 'done')
+        self.assertIs(self.session.request.call_args[1]['data'], callargs)
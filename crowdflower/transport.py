@@ -0,0 +1,478 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP transports used by :class:`~crowdflower.client.Client`.
+
+A transport sends a single request and returns a response offering the
+subset of the :class:`requests.Response` interface used by the client.
+Connection errors and timeouts are raised as the corresponding
+:mod:`requests.exceptions`, so that the retry policy of the client applies
+to all transports.
+
+- :class:`RequestsTransport`: a pooled :class:`requests.Session`, the
+  default
+- :class:`Urllib3Transport`: :mod:`urllib3` directly, with less per request
+  overhead
+- :class:`MemoryTransport`: replays recorded responses from memory, for
+  deterministic tests and for profiling the CPU cost of the client without
+  a network
+- :class:`RecordingTransport`: records the traffic of another transport for
+  replaying
+
+.. code-block:: python
+
+   >>> recorder = RecordingTransport(Urllib3Transport())
+   >>> Client('yourapikey', transport=recorder).get_job(123)
+   >>> recorder.save('traffic.json')
+   >>> replay = MemoryTransport.load('traffic.json')
+   >>> Client('yourapikey', transport=replay).get_job(123)
+
+"""
+from __future__ import print_function, division, absolute_import
+from collections import deque, namedtuple
+from six.moves.urllib.parse import urlencode, urlsplit, parse_qsl
+from .ratelimit import _clock
+import base64
+import datetime
+import io
+import json
+import threading
+import requests
+import requests.exceptions
+import requests.adapters
+import requests.structures
+import six
+
+__author__ = u'Ilja Everilä <ilja.everila@liilak.com>'
+
+#: The request of a :class:`Response`
+Request = namedtuple('Request', 'method url headers body')
+
+
+def _body_length(body):
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+
+    if isinstance(body, memoryview):
+        return body.nbytes
+
+    return None
+
+
+def _read_body(data):
+    """
+    Read request body ``data`` of any supported kind to bytes.
+    """
+    if data is None:
+        return b''
+
+    if isinstance(data, six.text_type):
+        return data.encode('utf-8')
+
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return bytes(data)
+
+    if isinstance(data, dict):
+        return urlencode(data, doseq=True).encode('ascii')
+
+    if hasattr(data, 'read'):
+        return _read_body(data.read())
+
+    return b''.join(_read_body(chunk) for chunk in data)
+
+
+class Response(object):
+    """
+    Response of :class:`Urllib3Transport` and :class:`MemoryTransport`,
+    implementing the parts of :class:`requests.Response` used by the
+    client.
+    """
+
+    def __init__(self, status_code, headers, content=None, raw=None,
+                 request=None, elapsed=None):
+        self.status_code = status_code
+        self.headers = requests.structures.CaseInsensitiveDict(headers)
+        self.request = request
+        self.url = request and request.url
+        self.elapsed = datetime.timedelta(seconds=elapsed or 0)
+        self._content = content
+        self._raw = raw
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def content(self):
+        if self._content is None:
+            self._content = self._raw.read(decode_content=True)
+            self.close()
+
+        return self._content
+
+    @property
+    def encoding(self):
+        content_type = self.headers.get('Content-Type', '')
+        for param in content_type.split(';')[1:]:
+            name, _, value = param.strip().partition('=')
+            if name.lower() == 'charset':
+                return value.strip('"')
+
+        return 'utf-8'
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, 'replace')
+
+    def json(self, **kwgs):
+        return json.loads(self.text, **kwgs)
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        """
+        Iterate over the body in chunks of ``chunk_size`` bytes, streaming
+        from the connection, if the body has not been read yet.
+        """
+        if self._content is not None:
+            for i in range(0, len(self._content), chunk_size):
+                yield self._content[i:i + chunk_size]
+
+            return
+
+        try:
+            for chunk in self._raw.stream(chunk_size, decode_content=True):
+                yield chunk
+
+        finally:
+            self.close()
+
+    def raise_for_status(self):
+        if 400 <= self.status_code:
+            kind = 'Client' if self.status_code < 500 else 'Server'
+            raise requests.exceptions.HTTPError(
+                "{} {} Error for url: {}".format(
+                    self.status_code, kind, self.url),
+                response=self)
+
+    def close(self):
+        if self._raw is not None:
+            self._raw.release_conn()
+            self._raw = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class Transport(object):
+    """
+    Transport interface. :meth:`request` takes the keyword arguments of
+    :meth:`requests.Session.request` used by the client.
+    """
+
+    def __init__(self):
+        #: Headers sent with every request
+        self.headers = {}
+
+    def request(self, method, url, params=None, data=None, headers=None,
+                files=None, stream=False, timeout=None):
+        """
+        Send a request and return a response.
+        """
+        raise NotImplementedError(
+            "abstract method 'request' not implemented")
+
+    def close(self):
+        """
+        Release resources, such as pooled connections.
+        """
+
+
+class RequestsTransport(Transport):
+    """
+    Transport using a :class:`requests.Session`.
+
+    :param session: Session to use, a pooled one is created by default
+    :type session: requests.Session
+    :param pool_connections: Number of per host connection pools to cache
+    :param pool_maxsize: Maximum number of connections kept alive per host
+    :param pool_block: Block when no free connections are available
+    """
+
+    def __init__(self, session=None, pool_connections=10, pool_maxsize=10,
+                 pool_block=False):
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize,
+                pool_block=pool_block
+            )
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+
+        self.session = session
+
+    @property
+    def headers(self):
+        return self.session.headers
+
+    def request(self, method, url, **kwgs):
+        return self.session.request(method=method, url=url, **kwgs)
+
+    def close(self):
+        self.session.close()
+
+
+class Urllib3Transport(Transport):
+    """
+    Transport using a :class:`urllib3.PoolManager` directly, skipping the
+    per request overhead of :mod:`requests`, such as preparing requests,
+    merging session settings and adapter lookups. Redirects are not
+    followed.
+
+    :param num_pools: Number of per host connection pools to cache
+    :param maxsize: Maximum number of connections kept alive per host
+    :param block: Block when no free connections are available
+    """
+
+    def __init__(self, num_pools=10, maxsize=10, block=False, **pool_kwgs):
+        import urllib3
+        super(Urllib3Transport, self).__init__()
+        self._urllib3 = urllib3
+        self.pool = urllib3.PoolManager(num_pools=num_pools, maxsize=maxsize,
+                                        block=block, **pool_kwgs)
+        # Negotiate compressed responses, like requests does
+        self.headers['Accept-Encoding'] = 'gzip, deflate'
+
+    def _timeout(self, timeout):
+        if timeout is None:
+            return self._urllib3.Timeout(connect=None, read=None)
+
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            return self._urllib3.Timeout(connect=connect, read=read)
+
+        return self._urllib3.Timeout(connect=timeout, read=timeout)
+
+    def _body(self, data, files, headers):
+        """
+        Encode request body, returning it and whether to send it chunked.
+        """
+        if files:
+            fields = list((data or {}).items())
+            for name, value in files.items():
+                if isinstance(value, tuple):
+                    value = tuple(v.read() if hasattr(v, 'read') else v
+                                  for v in value)
+
+                elif hasattr(value, 'read'):
+                    value = (name, value.read())
+
+                fields.append((name, value))
+
+            body, content_type = self._urllib3.encode_multipart_formdata(
+                fields)
+            headers['Content-Type'] = content_type
+            return body, False
+
+        if isinstance(data, dict):
+            headers.setdefault('Content-Type',
+                               'application/x-www-form-urlencoded')
+            return urlencode(data, doseq=True).encode('ascii'), False
+
+        if data is None or isinstance(
+                data, (bytes, bytearray, six.text_type)):
+            return data, False
+
+        if isinstance(data, memoryview):
+            headers['Content-Length'] = str(data.nbytes)
+            return data, False
+
+        # Generators and files of unknown length
+        return data, True
+
+    def request(self, method, url, params=None, data=None, headers=None,
+                files=None, stream=False, timeout=None):
+        exceptions = self._urllib3.exceptions
+
+        if params:
+            url += ('&' if '?' in url else '?') + urlencode(params,
+                                                             doseq=True)
+
+        request_headers = dict(self.headers)
+        request_headers.update(headers or {})
+        body, chunked = self._body(data, files, request_headers)
+        start = _clock()
+
+        try:
+            raw = self.pool.request(
+                method.upper(), url, body=body, headers=request_headers,
+                timeout=self._timeout(timeout), retries=False,
+                redirect=False, preload_content=not stream, chunked=chunked)
+
+        except exceptions.ConnectTimeoutError as e:
+            raise requests.exceptions.ConnectTimeout(e)
+
+        except exceptions.ReadTimeoutError as e:
+            raise requests.exceptions.ReadTimeout(e)
+
+        except exceptions.TimeoutError as e:
+            raise requests.exceptions.Timeout(e)
+
+        except (exceptions.HTTPError, OSError) as e:
+            raise requests.exceptions.ConnectionError(e)
+
+        length = _body_length(body)
+        if length is not None:
+            request_headers.setdefault('Content-Length', str(length))
+
+        request = Request(method.upper(), url, request_headers,
+                          None if chunked else body)
+        return Response(raw.status, raw.headers,
+                        content=None if stream else raw.data,
+                        raw=raw if stream else None, request=request,
+                        elapsed=_clock() - start)
+
+    def close(self):
+        self.pool.clear()
+
+
+def _request_key(method, url, params):
+    """
+    Key matching a request to recordings: method, URL without query and
+    sorted query parameters without the API key.
+    """
+    split = urlsplit(url)
+    query = parse_qsl(split.query) + list((params or {}).items())
+    query = sorted((k, str(v)) for k, v in query if k != 'key')
+    return (method.upper(),
+            split._replace(query='', fragment='').geturl(),
+            urlencode(query))
+
+
+class MemoryTransport(Transport):
+    """
+    Transport replaying recorded responses from memory. Requests are matched
+    by method, URL and query parameters, ignoring the API key. Recorded
+    responses to the same request are replayed in order, after which the
+    last one is repeated. Request bodies are read, as they would be when
+    sent.
+
+    :param recordings: Recordings as created by :class:`RecordingTransport`
+    :param handler: Function called with a :class:`Request` for requests
+                    without recordings, returning a :class:`Response`
+    """
+
+    def __init__(self, recordings=(), handler=None):
+        super(MemoryTransport, self).__init__()
+        self.handler = handler
+        #: Requests sent, as :class:`Request` instances
+        self.requests = []
+        self._responses = {}
+        self._lock = threading.Lock()
+
+        for recording in recordings:
+            self.add(**recording)
+
+    @classmethod
+    def load(cls, path, **kwgs):
+        """
+        Create a transport replaying recordings saved to file ``path``.
+        """
+        with io.open(path, encoding='utf-8') as f:
+            return cls(json.load(f), **kwgs)
+
+    def add(self, method, url, query='', status=200, headers=None,
+            content=''):
+        """
+        Add a recorded response. ``content`` is base64 encoded.
+        """
+        key = _request_key(method, url, dict(parse_qsl(query)))
+        with self._lock:
+            self._responses.setdefault(key, deque()).append(
+                (status, headers or {}, base64.b64decode(content)))
+
+    def add_json(self, method, url, obj, query=None, status=200):
+        """
+        Add a JSON response to ``method`` request to ``url``.
+        """
+        self.add(method, url, urlencode(sorted((query or {}).items())),
+                 status, {'Content-Type': 'application/json'},
+                 base64.b64encode(json.dumps(obj).encode('utf-8')))
+
+    def request(self, method, url, params=None, data=None, headers=None,
+                files=None, stream=False, timeout=None):
+        start = _clock()
+        body = _read_body(data)
+        request_headers = dict(self.headers)
+        request_headers.update(headers or {})
+        request_headers['Content-Length'] = str(len(body))
+        request = Request(method.upper(), url, request_headers, body)
+        key = _request_key(method, url, params)
+
+        with self._lock:
+            self.requests.append(request)
+            responses = self._responses.get(key)
+            recorded = None
+            if responses:
+                recorded = responses.popleft() if len(responses) > 1 \
+                    else responses[0]
+
+        if recorded is None:
+            if self.handler is None:
+                raise requests.exceptions.ConnectionError(
+                    "no recorded response to {} {} {}".format(*key))
+
+            return self.handler(request)
+
+        status, headers, content = recorded
+        return Response(status, headers, content=content, request=request,
+                        elapsed=_clock() - start)
+
+
+#: Headers describing the encoding of the body on the wire, which do not
+#: apply to the decoded content of recordings
+_UNRECORDED_HEADERS = frozenset(['content-encoding', 'content-length',
+                                 'transfer-encoding', 'connection'])
+
+
+class RecordingTransport(Transport):
+    """
+    Transport recording the traffic of another ``transport``, for replaying
+    with :class:`MemoryTransport`. Response bodies are read as a whole.
+    """
+
+    def __init__(self, transport):
+        self.transport = transport
+        #: Recorded responses
+        self.recordings = []
+        self._lock = threading.Lock()
+
+    @property
+    def headers(self):
+        return self.transport.headers
+
+    def request(self, method, url, params=None, **kwgs):
+        resp = self.transport.request(method, url, params=params, **kwgs)
+        content = resp.content
+        method, url, query = _request_key(method, url, params)
+        recording = dict(method=method, url=url, query=query,
+                         status=resp.status_code,
+                         headers={k: v for k, v in resp.headers.items()
+                                  if k.lower() not in _UNRECORDED_HEADERS},
+                         content=base64.b64encode(content).decode('ascii'))
+        with self._lock:
+            self.recordings.append(recording)
+
+        return resp
+
+    def save(self, path):
+        """
+        Save recordings to file ``path`` as JSON.
+        """
+        with io.open(path, 'w', encoding='utf-8') as f:
+            f.write(six.text_type(json.dumps(self.recordings, indent=1)))
+
+    def close(self):
+        self.transport.close()
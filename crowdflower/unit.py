@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function, division, absolute_import
-from .base import Attribute, RoAttribute, JobResource, Promise
+from .base import Attribute, RoAttribute, JobResource, Promise, compact
 
 __author__ = u'Ilja Everilä <ilja.everila@liilak.com>'
 
@@ -73,4 +73,7 @@ class Unit(JobResource):
         """
         Cancel unit.
         """
-        self._client.cancel_unit(self.job_id, self.id)
+        return self._client.cancel_unit(self.job_id, self.id)
+
+
+CompactUnit = compact(Unit)
@@ -0,0 +1,406 @@
+# -*- coding: utf-8 -*-
+"""
+Progress watcher polling many jobs through :meth:`Job.ping
+<crowdflower.job.Job.ping>` on one shared scheduler.
+
+The poll interval of each job adapts to its observed judgment rate: jobs
+close to completion are polled more often, stalled jobs less. The total
+request rate of a watcher is bounded by ``max_rate`` however many jobs
+are watched, by stretching the intervals.
+
+.. code-block:: python
+
+   >>> complete, pending = wait_until_complete(jobs, timeout=3600)
+
+"""
+from __future__ import print_function, division, absolute_import
+from collections import namedtuple
+from heapq import heappush, heappop
+from itertools import count
+from .pool import bounded_map
+from .ratelimit import _clock
+import logging
+import threading
+
+__author__ = u'Ilja Everilä <ilja.everila@liilak.com>'
+
+_log = logging.getLogger(__name__)
+
+#: Progress of a watched job: the latest ``status`` returned by ping, the
+#: estimated judgment ``rate`` per second, or None if not yet known, and
+#: whether the job is ``complete``
+ProgressEvent = namedtuple('ProgressEvent', 'job status rate complete')
+
+
+def _is_complete(status):
+    return status.get('needed_judgments') == 0
+
+
+def _run_callbacks(callbacks, event):
+    for callback in callbacks:
+        try:
+            callback(event)
+
+        except Exception:
+            _log.exception("watch callback %r failed", callback)
+
+
+class _Watch(object):
+
+    __slots__ = ('job', 'on_progress', 'on_complete', 'interval', 'rate',
+                 'judgments', 'polled_at', 'cancelled')
+
+    def __init__(self, job, interval):
+        self.job = job
+        self.on_progress = []
+        self.on_complete = []
+        self.interval = interval
+        self.rate = None
+        self.judgments = None
+        self.polled_at = None
+        self.cancelled = False
+
+
+class JobWatcher(object):
+    """
+    Watch the progress of many jobs. Call :meth:`run` to poll in the
+    calling thread, or :meth:`start` to poll in a background thread.
+    Callbacks are called in the polling thread with a
+    :class:`ProgressEvent`. Exceptions raised by callbacks and
+    ``is_complete`` are logged, and do not stop polling.
+
+    :param min_interval: Minimum seconds between pings of a job
+    :type min_interval: float
+    :param max_interval: Maximum seconds between pings of a job, unless
+                         ``max_rate`` requires more
+    :type max_interval: float
+    :param max_rate: Maximum pings per second in total
+    :type max_rate: float
+    :param concurrency: Maximum number of concurrent pings
+    :type concurrency: int
+    :param is_complete: Function telling if a job is complete from its
+                        ping status, defaults to no needed judgments
+    :param smoothing: Weight of the latest observation in the
+                      exponentially weighted judgment rate
+    :type smoothing: float
+    """
+
+    def __init__(self, min_interval=5.0, max_interval=300.0, max_rate=2.0,
+                 concurrency=4, is_complete=_is_complete, smoothing=0.5,
+                 clock=_clock):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_rate = max_rate
+        self.concurrency = concurrency
+        self.is_complete = is_complete
+        self.smoothing = smoothing
+        #: Number of pings sent
+        self.pings = 0
+        self._clock = clock
+        self._watches = {}
+        self._schedule = []
+        self._seq = count()
+        self._next_start = clock()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def __len__(self):
+        return len(self._watches)
+
+    def watch(self, job, on_progress=None, on_complete=None):
+        """
+        Start watching ``job``, or add callbacks, if already watched.
+
+        :param on_progress: Called with a :class:`ProgressEvent` after each
+                            ping
+        :param on_complete: Called with a :class:`ProgressEvent` when the
+                            job completes, after which it is no longer
+                            watched
+        """
+        with self._lock:
+            watch = self._watches.get(job)
+            if watch is None:
+                watch = self._watches[job] = _Watch(job, self.min_interval)
+                # Spread the first pings of many jobs over time
+                self._next_start = max(self._next_start, self._clock())
+                heappush(self._schedule,
+                         (self._next_start, next(self._seq), watch))
+                self._next_start += 1 / self.max_rate
+
+            if on_progress is not None:
+                watch.on_progress.append(on_progress)
+
+            if on_complete is not None:
+                watch.on_complete.append(on_complete)
+
+        self._wakeup.set()
+
+    def unwatch(self, job):
+        """
+        Stop watching ``job``.
+        """
+        with self._lock:
+            watch = self._watches.pop(job, None)
+            if watch is not None:
+                watch.cancelled = True
+
+    def _remove_callback(self, job, on_complete, unwatch):
+        """
+        Remove ``on_complete`` callback of ``job``, and stop watching it
+        if ``unwatch`` and no callbacks remain.
+        """
+        with self._lock:
+            watch = self._watches.get(job)
+            if watch is None:
+                return
+
+            if on_complete in watch.on_complete:
+                watch.on_complete.remove(on_complete)
+
+            if unwatch and not watch.on_progress and not watch.on_complete:
+                del self._watches[job]
+                watch.cancelled = True
+
+    def _pop_due(self):
+        """
+        Pop at most ``concurrency`` watches that are due.
+        """
+        due = []
+        with self._lock:
+            now = self._clock()
+            while self._schedule and \
+                    len(due) < max(self.concurrency or 1, 1):
+                at, _, watch = self._schedule[0]
+                if watch.cancelled:
+                    heappop(self._schedule)
+
+                elif at <= now:
+                    heappop(self._schedule)
+                    due.append(watch)
+
+                else:
+                    break
+
+        return due
+
+    def _next_delay(self):
+        with self._lock:
+            if not self._schedule:
+                return None
+
+            return max(self._schedule[0][0] - self._clock(), 0.0)
+
+    @staticmethod
+    def _ping(watch):
+        try:
+            return watch.job.ping(), None
+
+        except Exception as e:
+            return None, e
+
+    def _interval(self, watch, status, error):
+        if error is None and watch.rate is None:
+            # Get a second sample soon for estimating the rate
+            interval = self.min_interval
+
+        elif error is None and watch.rate:
+            needed = status.get('needed_judgments') or 0
+            # Poll about twice before the estimated completion
+            interval = needed / watch.rate / 2
+
+        else:
+            # Back off from stalled or failing jobs
+            interval = watch.interval * 2
+
+        # Stretch intervals so that the total rate stays under max_rate
+        floor = max(self.min_interval, len(self._watches) / self.max_rate)
+        return max(min(interval, self.max_interval), floor)
+
+    def _update(self, watch, status, error):
+        now = self._clock()
+
+        if error is None:
+            judgments = status.get('all_judgments')
+            if watch.judgments is not None and judgments is not None and \
+                    now > watch.polled_at:
+                rate = max(judgments - watch.judgments, 0) / \
+                    (now - watch.polled_at)
+                watch.rate = rate if watch.rate is None else \
+                    self.smoothing * rate + \
+                    (1 - self.smoothing) * watch.rate
+
+            watch.judgments = judgments
+            watch.polled_at = now
+
+        else:
+            _log.warning("pinging job %s failed: %s", watch.job.id, error)
+
+        complete = False
+        if error is None:
+            try:
+                complete = self.is_complete(status)
+
+            except Exception:
+                _log.exception("checking completion of job %s failed",
+                               watch.job.id)
+
+        with self._lock:
+            if watch.cancelled:
+                return
+
+            # Copied, as callbacks may be removed from other threads
+            on_progress = list(watch.on_progress)
+            on_complete = list(watch.on_complete)
+
+            if complete:
+                del self._watches[watch.job]
+
+            else:
+                watch.interval = self._interval(watch, status, error)
+                heappush(self._schedule, (now + watch.interval,
+                                          next(self._seq), watch))
+
+        if error is not None:
+            return
+
+        event = ProgressEvent(watch.job, status, watch.rate, complete)
+        _run_callbacks(on_progress, event)
+
+        if complete:
+            _run_callbacks(on_complete, event)
+
+    def poll(self):
+        """
+        Ping the jobs that are due.
+
+        :returns: seconds until the next job is due, or None if no jobs
+                  are watched
+        """
+        due = self._pop_due()
+
+        for watch, (status, error) in zip(
+                due, bounded_map(self._ping, due, self.concurrency)):
+            self.pings += 1
+            self._update(watch, status, error)
+
+        return self._next_delay()
+
+    def run(self, until=None, timeout=None):
+        """
+        Poll until no jobs are watched, ``until()`` returns true, or
+        :meth:`stop` is called.
+
+        :param until: Function to check after each poll
+        :param timeout: Maximum seconds to run
+        :type timeout: float
+        :returns: False if timed out, else True
+        """
+        deadline = None if timeout is None else self._clock() + timeout
+
+        while not self._stopping:
+            if until is not None and until():
+                return True
+
+            delay = self.poll()
+            if delay is None:
+                if until is None or self._thread is None:
+                    return True
+
+                # Running in the background, wait for new jobs
+                delay = self.max_interval
+
+            if deadline is not None:
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    return False
+
+                delay = min(delay, remaining)
+
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+
+        return True
+
+    def start(self):
+        """
+        Poll in a background daemon thread, until :meth:`stop` is called.
+        """
+        if self._thread is not None:
+            return
+
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self.run, kwargs=dict(until=lambda: self._stopping))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the background thread.
+        """
+        thread = self._thread
+        if thread is None:
+            return
+
+        self._stopping = True
+        self._wakeup.set()
+        thread.join()
+        self._thread = None
+
+    def wait_until_complete(self, jobs, timeout=None):
+        """
+        Watch ``jobs`` and wait until they are complete, or ``timeout``
+        seconds have passed. Polls in the calling thread, unless the
+        watcher is running in the background. Pending jobs are no longer
+        watched after a timeout, unless they were watched already.
+
+        :param jobs: Iterable of jobs
+        :param timeout: Maximum seconds to wait
+        :type timeout: float
+        :returns: sets of complete and pending jobs
+        :rtype: tuple
+        """
+        jobs = set(jobs)
+        complete = set()
+        done = threading.Event()
+
+        def on_complete(event):
+            complete.add(event.job)
+            if len(complete) == len(jobs):
+                done.set()
+
+        if not jobs:
+            return complete, set()
+
+        with self._lock:
+            watched = {job for job in jobs if job in self._watches}
+
+        for job in jobs:
+            self.watch(job, on_complete=on_complete)
+
+        if self._thread is not None:
+            done.wait(timeout)
+
+        else:
+            self.run(until=done.is_set, timeout=timeout)
+
+        # Copy, the set may still change in a background thread
+        complete = set(complete)
+        pending = jobs - complete
+        for job in pending:
+            self._remove_callback(job, on_complete, job not in watched)
+
+        return complete, pending
+
+
+def wait_until_complete(jobs, timeout=None, **kwgs):
+    """
+    Wait until ``jobs`` are complete, or ``timeout`` seconds have passed,
+    using a new :class:`JobWatcher` created with ``kwgs``.
+
+    :returns: sets of complete and pending jobs
+    :rtype: tuple
+    """
+    return JobWatcher(**kwgs).wait_until_complete(jobs, timeout)
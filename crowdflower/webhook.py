@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+Asynchronous receiver for CrowdFlower webhooks, for streaming judgments
+instead of polling. Requires `aiohttp <https://aiohttp.readthedocs.io/>`_,
+which can be installed with the ``async`` extra.
+
+CrowdFlower POSTs form encoded ``signal``, ``payload`` and ``signature``
+fields to the :attr:`~crowdflower.job.Job.webhook_uri` of a job. Payloads
+are parsed to :class:`~crowdflower.judgment.Judgment`,
+:class:`~crowdflower.unit.Unit` and :class:`~crowdflower.job.Job` objects
+and queued in batches, one per request, to a bounded queue. When the queue
+is full, requests are held until the consumer catches up, or answered
+with *503 Service Unavailable* after ``put_timeout``, so that CrowdFlower
+retries them later.
+
+.. code-block:: python
+
+   async with WebhookReceiver(client, port=8080) as receiver:
+       async for judgment in receiver:
+           print(judgment.worker_id, judgment.data)
+
+"""
+from __future__ import print_function, division, absolute_import
+from collections import namedtuple
+from .client import _make_codec
+from .job import Job
+from .judgment import Judgment
+from .unit import Unit
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import aiohttp
+from aiohttp import web
+
+__author__ = u'Ilja Everilä <ilja.everila@liilak.com>'
+
+_log = logging.getLogger(__name__)
+
+#: Objects parsed from a single webhook request
+WebhookBatch = namedtuple('WebhookBatch', 'signal items')
+
+
+def sign_payload(payload, key):
+    """
+    Compute the CrowdFlower webhook signature of ``payload``: the SHA1 hex
+    digest of the payload concatenated with the API ``key``.
+    """
+    return hashlib.sha1((payload + key).encode('utf-8')).hexdigest()
+
+
+class WebhookReceiver(object):
+    """
+    Asyncio HTTP server receiving CrowdFlower webhooks. Iterating over the
+    receiver asynchronously generates the parsed objects, :meth:`batches`
+    generates them a request at a time. Iteration ends after the receiver
+    has been stopped and the queue drained.
+
+    :param client: :class:`~crowdflower.client.Client` to bind parsed
+                   objects to. Its API key is used to verify signatures,
+                   unless ``key`` is given.
+    :type client: crowdflower.client.Client
+    :param host: Interface to listen on
+    :type host: str
+    :param port: Port to listen on, 0 picks a free port
+    :type port: int
+    :param path: URL path of the webhook
+    :type path: str
+    :param maxsize: Maximum number of queued batches
+    :type maxsize: int
+    :param put_timeout: Seconds to hold a request while the queue is full
+                        before answering with 503, None holds it until
+                        there is room
+    :type put_timeout: float
+    :param key: API key for verifying payload signatures, False disables
+                verification
+    :type key: str
+    :param codec: JSON codec for payloads, see :func:`~.codec.get_codec`
+    """
+
+    #: Signals and the model classes their payloads are parsed to, other
+    #: signals queue the payload JSON as is
+    SIGNALS = {
+        'new_judgments': Judgment,
+        'unit_complete': Unit,
+        'job_complete': Job,
+    }
+
+    def __init__(self, client=None, host='127.0.0.1', port=8080, path='/',
+                 maxsize=100, put_timeout=None, key=None, codec=None):
+        if key is None and client is not None:
+            key = client._key
+
+        self.client = client
+        self.host = host
+        self.port = port
+        self.path = path
+        self.put_timeout = put_timeout
+        self._key = key or None
+        self._codec = _make_codec(codec)
+        self._queue = asyncio.Queue(maxsize)
+        self._stopped = asyncio.Event()
+        self._jobs = {}
+        self._runner = None
+        self.url = None
+
+    async def start(self):
+        """
+        Start listening. The webhook URL is available as :attr:`url`.
+        """
+        app = web.Application()
+        app.router.add_post(self.path, self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = 'http://{}:{}{}'.format(host, port, self.path)
+
+    async def stop(self):
+        """
+        Stop listening. Already queued batches can still be consumed.
+        """
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+        self._stopped.set()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    def _job(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            job = self._jobs[job_id] = Job(id=job_id, client=self.client)
+
+        return job
+
+    def parse(self, signal, payload):
+        """
+        Parse JSON ``payload`` of ``signal`` to a :class:`WebhookBatch`.
+
+        :raises ValueError: if the payload is not valid JSON
+        """
+        data = self._codec.loads(payload)
+        cls = self.SIGNALS.get(signal)
+
+        if cls is None:
+            return WebhookBatch(signal, [data])
+
+        if isinstance(data, dict):
+            data = [data]
+
+        if cls is Job:
+            items = [Job(client=self.client, **d) for d in data]
+
+        else:
+            items = [cls(self._job(d.get('job_id')), client=self.client, **d)
+                     for d in data]
+
+        return WebhookBatch(signal, items)
+
+    async def _handle(self, request):
+        form = await request.post()
+        signal = form.get('signal')
+        payload = form.get('payload')
+
+        if signal is None or payload is None:
+            raise web.HTTPBadRequest(text="missing signal or payload")
+
+        if self._key is not None and not hmac.compare_digest(
+                sign_payload(payload, self._key),
+                form.get('signature', '')):
+            raise web.HTTPForbidden(text="invalid signature")
+
+        try:
+            batch = self.parse(signal, payload)
+
+        except ValueError:
+            raise web.HTTPBadRequest(text="invalid payload")
+
+        try:
+            await asyncio.wait_for(self._queue.put(batch), self.put_timeout)
+
+        except asyncio.TimeoutError:
+            _log.warning("webhook queue full, rejecting '%s'", signal)
+            raise web.HTTPServiceUnavailable(text="queue full")
+
+        return web.Response(text="OK")
+
+    async def batches(self):
+        """
+        Generate received :class:`WebhookBatch` instances.
+        """
+        while not (self._stopped.is_set() and self._queue.empty()):
+            get = asyncio.ensure_future(self._queue.get())
+            stopped = asyncio.ensure_future(self._stopped.wait())
+            await asyncio.wait([get, stopped],
+                               return_when=asyncio.FIRST_COMPLETED)
+            stopped.cancel()
+
+            if get.done():
+                yield get.result()
+
+            else:
+                get.cancel()
+
+    async def __aiter__(self):
+        async for batch in self.batches():
+            for item in batch.items:
+                yield item
+
+
+async def post_payload(url, signal, payload, key=None, session=None):
+    """
+    POST a fake webhook ``payload``, for testing receivers locally.
+
+    :param url: Webhook URL
+    :param signal: Webhook signal, such as ``'new_judgments'``
+    :param payload: JSON payload, given as a string or as data to encode
+    :param key: API key to sign the payload with
+    :param session: :class:`aiohttp.ClientSession` to use
+    :returns: HTTP status of the response
+    :rtype: int
+    """
+    if not isinstance(payload, str):
+        payload = json.dumps(payload)
+
+    form = {'signal': signal, 'payload': payload}
+    if key is not None:
+        form['signature'] = sign_payload(payload, key)
+
+    if session is None:
+        async with aiohttp.ClientSession() as session:
+            return await post_payload(url, signal, payload, key, session)
+
+    async with session.post(url, data=form) as resp:
+        return resp.status
@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function, division, absolute_import
-from inspect import getcallargs
 from .base import RoAttribute, JobResource
 from functools import wraps, partial
 
@@ -12,23 +11,79 @@ def _path(client, worker, command):
     return client.jobs[worker.job.id].workers[worker.id][command]
 
 
+def _make_binder(f):
+    """
+    Precompute argument binding of command ``f``, taking ``self`` and
+    positional or keyword arguments with optional defaults. Returns
+    a function binding ``args`` and ``kwgs`` to a dictionary of arguments,
+    without introspecting ``f`` on every call like
+    :func:`inspect.getcallargs`.
+    """
+    code = f.__code__
+    names = code.co_varnames[1:code.co_argcount]
+    defaults = f.__defaults__ or ()
+    required = names[:len(names) - len(defaults)]
+    default_args = dict(zip(names[len(required):], defaults))
+    accepted = frozenset(names)
+
+    def bind(args, kwgs):
+        if len(args) > len(names):
+            raise TypeError("{}() takes {} arguments ({} given)".format(
+                f.__name__, len(names), len(args)))
+
+        callargs = dict(default_args)
+        callargs.update(zip(names, args))
+
+        for name, value in kwgs.items():
+            if name not in accepted:
+                raise TypeError(
+                    "{}() got an unexpected keyword argument '{}'".format(
+                        f.__name__, name))
+
+            if name in names[:len(args)]:
+                raise TypeError(
+                    "{}() got multiple values for argument '{}'".format(
+                        f.__name__, name))
+
+            callargs[name] = value
+
+        for name in required:
+            if name not in callargs:
+                raise TypeError(
+                    "{}() missing required argument '{}'".format(
+                        f.__name__, name))
+
+        return callargs
+
+    return bind
+
+
 def _command(f, method='post', pathfun=_path):
     """
     Helper function for handling :class:`Worker` commands.
     """
+    bind = _make_binder(f)
 
-    @wraps(f)
-    def cmd(self, *args, **kwgs):
+    def call(self, callargs):
         """
-        Self is :class:`Worker` instance.
+        Send the command with arguments ``callargs`` already bound with
+        ``bind``.
         """
-        callargs = getcallargs(f, self, *args, **kwgs)
-        del callargs['self']
         return pathfun(self._client, self, f.__name__)(
             data=callargs,
             method=method
         )
 
+    @wraps(f)
+    def cmd(self, *args, **kwgs):
+        """
+        Self is :class:`Worker` instance.
+        """
+        return call(self, bind(args, kwgs))
+
+    cmd.bind = bind
+    cmd.call = call
+    cmd.method = method
     return cmd
 
 # http://success.crowdflower.com/customer/portal/articles/1553902-api-request-examples#header_4
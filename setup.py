@@ -21,8 +21,14 @@ setup(
     packages=find_packages(),
     install_requires=[
         'six',
-        'requests'
+        'requests',
+        'futures; python_version < "3"'
     ],
+    extras_require={
+        'async': ['aiohttp>=3.0'],
+        'fast': ['orjson'],
+        'aggregate': ['numpy'],
+    },
     tests_require=tests_require,
     test_suite="crowdflower",
     include_package_data=True,